@@ -0,0 +1 @@
+"""Helpers shared by the benchmark_ingestion, benchmark_search and benchmark_sagemaker tools."""
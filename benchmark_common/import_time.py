@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Startup latency of the benchmark CLIs.
+
+Every tool is started with --help in a fresh interpreter, which measures the imports
+it pays before doing any work. This matters for tools spawned many times, e.g. the
+bulk.py ranks of run_bulk.py and the Locust workers. A tool slower than its budget
+fails the run, and the heaviest top-level imports (from python -X importtime) are
+listed to show which import to make lazy.
+
+Usage:
+python -m benchmark_common.import_time
+python -m benchmark_common.import_time --tool search_relevance.py --repeat 10
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# (directory, script, startup budget in ms)
+TOOLS = [
+    ("benchmark_ingestion", "bulk.py", 500),
+    ("benchmark_ingestion", "run_bulk.py", 500),
+    ("benchmark_ingestion", "fetch_index_to_jsonl.py", 500),
+    ("benchmark_ingestion", "search_relevance.py", 500),
+    ("benchmark_ingestion", "pruning_sweep.py", 500),
+    ("benchmark_search", "osb_results.py", 500),
+    ("benchmark_search", "saturation_finder.py", 500),
+    ("benchmark_sagemaker", "automated_benchmark.py", 500),
+    ("benchmark_sagemaker", "mock_sagemaker_endpoint.py", 500),
+    # locust and gevent are needed by every code path of the locustfile
+    ("benchmark_sagemaker", "locust_benchmark_sm.py", 2000),
+]
+
+
+def parse_importtime(stderr):
+    """
+    Top-level imports of a `python -X importtime` run.
+
+    Returns:
+        list: (cumulative ms, module) sorted by cumulative time, slowest first
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # skips the header, nested imports are indented below their parent
+        if not cumulative.strip().isdigit() or name.startswith("  "):
+            continue
+        imports.append((int(cumulative) / 1000, name.strip()))
+    return sorted(imports, reverse=True)
+
+
+def measure_startup(directory, script, repeat=5):
+    """
+    Start a tool with --help `repeat` times.
+
+    Returns:
+        tuple: (median wall time in ms, top-level imports of the last run, error)
+    """
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", script, "--help"],
+            cwd=ROOT / directory,
+            capture_output=True,
+            text=True,
+        )
+        times.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()
+            return None, [], error[-1] if error else f"exit {result.returncode}"
+    return statistics.median(times), parse_importtime(result.stderr), None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Startup latency of the benchmark CLIs"
+    )
+    parser.add_argument(
+        "--tool",
+        action="append",
+        default=None,
+        help="Only measure this script, can be repeated (default: all tools)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Starts per tool (default: 5)"
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=5,
+        help="Slowest imports listed per tool (default: 5)",
+    )
+    parser.add_argument(
+        "--budget-scale",
+        type=float,
+        default=1.0,
+        help="Multiply every startup budget, e.g. 2 on slow CI hosts (default: 1)",
+    )
+    args = parser.parse_args()
+
+    failed = []
+    for directory, script, budget_ms in TOOLS:
+        if args.tool and script not in args.tool:
+            continue
+        budget_ms *= args.budget_scale
+        startup_ms, imports, error = measure_startup(directory, script, args.repeat)
+        if error is not None:
+            print(f"{directory}/{script}: FAILED to start: {error}")
+            failed.append(script)
+            continue
+        status = "OK" if startup_ms <= budget_ms else "SLOW"
+        print(
+            f"{directory}/{script}: {startup_ms:.0f}ms (budget {budget_ms:.0f}ms) {status}"
+        )
+        for cumulative_ms, module in imports[: args.top]:
+            print(f"    {cumulative_ms:8.1f}ms  {module}")
+        if status == "SLOW":
+            failed.append(script)
+
+    if failed:
+        print(f"\n{len(failed)} tools failed or over budget: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
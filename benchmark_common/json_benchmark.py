@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the JSON paths of the benchmark tools, stdlib json vs jsoncodec.
+
+Each case mirrors one hot path with a synthetic document of realistic shape, or with
+the first line of --corpus-file (a corpus JSONL) for the corpus cases.
+
+Usage:
+python -m benchmark_common.json_benchmark
+python -m benchmark_common.json_benchmark --corpus-file nfcorpus.jsonl --seconds 2
+"""
+
+import argparse
+import json
+import random
+import string
+import time
+
+from benchmark_common import jsoncodec
+
+
+def random_text(rng, words):
+    return " ".join(
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10)))
+        for _ in range(words)
+    )
+
+
+def sparse_vector(rng, tokens):
+    return {
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8))): round(
+            rng.random() * 3, 4
+        )
+        for _ in range(tokens)
+    }
+
+
+def build_cases(corpus_line=None, seed=0):
+    """
+    Returns:
+        list: (path, operation, stdlib function, codec function, argument)
+    """
+    rng = random.Random(seed)
+    document = {
+        "id": "doc-1",
+        "text": random_text(rng, 200),
+        "text_sparse": sparse_vector(rng, 200),
+    }
+    if corpus_line is not None:
+        document = json.loads(corpus_line)
+    document_line = json.dumps(document).encode("utf-8")
+    search_response = json.dumps(
+        {
+            "took": 12,
+            "timed_out": False,
+            "hits": {
+                "total": {"value": 10000, "relation": "gte"},
+                "max_score": 12.5,
+                "hits": [
+                    {
+                        "_index": "test-index",
+                        "_id": str(i),
+                        "_score": 12.5 - i,
+                        "_source": {"id": f"doc-{i}", "text": random_text(rng, 150)},
+                    }
+                    for i in range(15)
+                ],
+            },
+        }
+    ).encode("utf-8")
+    query_line = json.dumps(
+        {
+            "text": random_text(rng, 8),
+            "sparse_embedding": sparse_vector(rng, 40),
+            "dense_embedding": [rng.uniform(-1, 1) for _ in range(768)],
+        }
+    )
+    payload = [random_text(rng, 180) for _ in range(8)]
+    sparse_response = json.dumps([sparse_vector(rng, 128) for _ in range(8)]).encode(
+        "utf-8"
+    )
+
+    def stdlib_dumpb(obj):
+        return json.dumps(obj).encode("utf-8")
+
+    return [
+        ("bulk.py corpus line", "decode", json.loads, jsoncodec.loads, document_line),
+        (
+            "fetch_index_to_jsonl.py hit",
+            "encode",
+            stdlib_dumpb,
+            jsoncodec.dumpb,
+            document,
+        ),
+        (
+            "search_relevance.py response",
+            "decode",
+            json.loads,
+            jsoncodec.loads,
+            search_response,
+        ),
+        ("workload.py query line", "decode", json.loads, jsoncodec.loads, query_line),
+        ("SageMaker request payload", "encode", stdlib_dumpb, jsoncodec.dumpb, payload),
+        (
+            "SageMaker sparse response",
+            "decode",
+            json.loads,
+            jsoncodec.loads,
+            sparse_response,
+        ),
+    ]
+
+
+def ops_per_second(function, argument, seconds):
+    """Calls per second of function(argument), measured for about `seconds`"""
+    calls = 0
+    batch = 10
+    start = time.perf_counter()
+    while True:
+        for _ in range(batch):
+            function(argument)
+        calls += batch
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return calls / elapsed
+        batch *= 2
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="JSON micro-benchmark, stdlib json vs jsoncodec"
+    )
+    parser.add_argument(
+        "--corpus-file",
+        default=None,
+        help="Corpus JSONL, its first line replaces the synthetic document",
+    )
+    parser.add_argument(
+        "--seconds",
+        type=float,
+        default=1.0,
+        help="Measurement time per case and codec (default: 1)",
+    )
+    args = parser.parse_args()
+
+    corpus_line = None
+    if args.corpus_file:
+        with open(args.corpus_file, "rb") as f:
+            corpus_line = f.readline()
+
+    print(f"jsoncodec backend: {jsoncodec.BACKEND}")
+    print("Path | Operation | Size | stdlib ops/s | codec ops/s | Speedup")
+    print("-" * 80)
+    for path, operation, stdlib, codec, argument in build_cases(corpus_line):
+        size = len(argument) if operation == "decode" else len(codec(argument))
+        stdlib_ops = ops_per_second(stdlib, argument, args.seconds)
+        codec_ops = ops_per_second(codec, argument, args.seconds)
+        print(
+            f"{path} | {operation} | {size / 1024:.1f}KB | {stdlib_ops:,.0f} | "
+            f"{codec_ops:,.0f} | {codec_ops / stdlib_ops:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Fast JSON encoding and decoding for the hot I/O paths of the benchmark tools.
+
+Uses orjson when installed, pysimdjson for decoding when only that is installed, and
+the standard library otherwise. All backends write compact JSON (the standard library
+escapes non-ASCII characters, which is faster for it) and, like orjson, expect str
+dict keys. Set BENCHMARK_JSON_BACKEND=json to force the standard library, e.g. to
+compare against it.
+"""
+
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+BACKENDS = ["orjson", "simdjson", "json"]
+
+
+def _select_backend():
+    requested = os.environ.get("BENCHMARK_JSON_BACKEND")
+    available = {"orjson": orjson is not None, "simdjson": simdjson is not None}
+    if requested:
+        if requested not in BACKENDS:
+            raise ValueError(
+                f"BENCHMARK_JSON_BACKEND must be one of {', '.join(BACKENDS)}"
+            )
+        if not available.get(requested, True):
+            raise ValueError(f"JSON backend {requested} is not installed")
+        return requested
+    for backend in BACKENDS:
+        if available.get(backend, True):
+            return backend
+
+
+BACKEND = _select_backend()
+
+if BACKEND == "orjson":
+
+    def loads(data):
+        """Decode a JSON document from str or bytes"""
+        return orjson.loads(data)
+
+    def dumpb(obj, default=None):
+        """Encode an object as compact UTF-8 JSON bytes"""
+        return orjson.dumps(obj, default=default)
+
+    def dumps(obj, default=None):
+        """Encode an object as a compact JSON str"""
+        return orjson.dumps(obj, default=default).decode()
+
+else:
+    if BACKEND == "simdjson":
+
+        def loads(data):
+            """Decode a JSON document from str or bytes"""
+            return simdjson.loads(data)
+
+    else:
+
+        def loads(data):
+            """Decode a JSON document from str or bytes"""
+            return json.loads(data)
+
+    def dumps(obj, default=None):
+        """Encode an object as a compact JSON str"""
+        return json.dumps(obj, default=default, separators=(",", ":"))
+
+    def dumpb(obj, default=None):
+        """Encode an object as compact UTF-8 JSON bytes"""
+        return dumps(obj, default).encode("utf-8")
+
+
+def load(f):
+    """Decode the JSON document of a file opened in text or binary mode"""
+    return loads(f.read())
+
+
+def opensearch_serializer():
+    """
+    opensearch-py serializer using this codec, pass it as OpenSearch(serializer=...).
+
+    orjson encodes dates, datetimes and UUIDs itself (as RFC 3339 strings, like
+    isoformat()) and only hands decimals and other types to the opensearch-py default.
+    The standard library hands dates, decimals and UUIDs all to that default.
+    Request and response bodies are timed as the json_encode and json_decode stages.
+    """
+    from opensearchpy.exceptions import SerializationError
+    from opensearchpy.serializer import JSONSerializer
+
+    from benchmark_common.profiling import stage
+
+    class CodecSerializer(JSONSerializer):
+        def loads(self, s):
+            try:
+                with stage("json_decode"):
+                    return loads(s)
+            except (ValueError, TypeError) as e:
+                raise SerializationError(s, e)
+
+        def dumps(self, data):
+            if isinstance(data, str):
+                return data
+            try:
+                with stage("json_encode"):
+                    return dumps(data, default=self.default)
+            except (ValueError, TypeError) as e:
+                raise SerializationError(data, e)
+
+    return CodecSerializer()
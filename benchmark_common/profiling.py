@@ -0,0 +1,208 @@
+"""
+Stage timers and optional per-process profiles for the benchmark tools.
+
+Code paths are wrapped in named stages, e.g. `with stage("decode"):`, and the time
+spent in each stage is summed per process and printed at the end of a run with
+`print_stage_report`. Nested stages are exclusive: time spent in an inner stage is
+not counted again in the outer one. Each thread (or greenlet under gevent) keeps its
+own stage stack, so stage totals of concurrent clients add up to more than the wall
+time.
+
+BENCHMARK_PROFILE=cprofile or sample additionally profiles the whole process and
+writes the profile to BENCHMARK_PROFILE_DIR (default: profiles) when it exits, one
+file per process, e.g. per bulk.py rank or Locust worker:
+- cprofile: deterministic cProfile stats (.prof) of the main thread, open with
+  snakeviz or pstats. Use it for Locust, whose greenlets all run on the main thread
+- sample: stacks of all threads sampled every BENCHMARK_PROFILE_INTERVAL_MS (default:
+  5), written in the collapsed format of flamegraph.pl and speedscope (.folded). Use it
+  for thread pools, e.g. search_relevance.py, it does not see greenlets
+"""
+
+import atexit
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+PROFILE_MODES = ["cprofile", "sample"]
+
+
+class _Stage:
+    __slots__ = ("timer", "name", "start", "inner")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.inner = 0.0
+        self.timer._stack().append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        stack = self.timer._stack()
+        stack.pop()
+        if stack:
+            stack[-1].inner += elapsed
+        self.timer.add(self.name, elapsed - self.inner)
+        return False
+
+
+class StageTimer:
+    """Exclusive time and number of calls per named stage"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.totals = defaultdict(float)
+        self.calls = defaultdict(int)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def stage(self, name):
+        """Context manager adding the time spent in the block to stage `name`"""
+        return _Stage(self, name)
+
+    def add(self, name, seconds, calls=1):
+        with self._lock:
+            self.totals[name] += seconds
+            self.calls[name] += calls
+
+    def report(self, title="Stage breakdown"):
+        """Stage table sorted by total time, the share is of the summed stage time"""
+        wall = time.perf_counter() - self.started
+        with self._lock:
+            stages = sorted(self.totals.items(), key=lambda item: -item[1])
+            calls = dict(self.calls)
+        measured = sum(total for _, total in stages)
+        lines = [
+            f"\n{title} (wall time {wall:.2f}s, pid {os.getpid()}):",
+            "Stage | Calls | Total s | Mean ms | Share",
+            "-" * 60,
+        ]
+        for name, total in stages:
+            lines.append(
+                f"{name} | {calls[name]} | {total:.3f} | "
+                f"{total / calls[name] * 1000:.3f} | "
+                f"{total / measured * 100 if measured else 0:.1f}%"
+            )
+        return "\n".join(lines)
+
+
+timer = StageTimer()
+
+
+def stage(name):
+    """Time a block as stage `name` of the process-wide timer"""
+    return timer.stage(name)
+
+
+def print_stage_report(title="Stage breakdown"):
+    if timer.totals:
+        print(timer.report(title))
+
+
+class StackSampler:
+    """Samples the stacks of all threads from a daemon thread"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_name} ({Path(code.co_filename).name}:"
+                        f"{code.co_firstlineno})"
+                    )
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def enable_profiling(name, mode, output_dir="profiles", interval_ms=5):
+    """
+    Profile this process until it exits.
+
+    Args:
+        name: Tool name, the profile is written to <output_dir>/<name>_<pid>.<ext>
+        mode: cprofile or sample
+        output_dir: Directory of the profile files
+        interval_ms: Sampling interval of the sample mode
+
+    Returns:
+        Path: File the profile will be written to
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Profile mode must be one of {', '.join(PROFILE_MODES)}")
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    extension = "prof" if mode == "cprofile" else "folded"
+    path = Path(output_dir) / f"{name}_{os.getpid()}.{extension}"
+
+    if mode == "cprofile":
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+        def write():
+            profiler.disable()
+            profiler.dump_stats(path)
+
+    else:
+        profiler = StackSampler(interval_ms / 1000)
+        profiler.start()
+
+        def write():
+            profiler.stop()
+            profiler.write(path)
+
+    def write_at_exit():
+        write()
+        print(f"Profile written to {path}")
+
+    atexit.register(write_at_exit)
+    return path
+
+
+def profile_from_env(name):
+    """Enable profiling when BENCHMARK_PROFILE is set, see the module docstring"""
+    mode = os.environ.get("BENCHMARK_PROFILE")
+    if not mode:
+        return None
+    return enable_profiling(
+        name,
+        mode,
+        os.environ.get("BENCHMARK_PROFILE_DIR", "profiles"),
+        float(os.environ.get("BENCHMARK_PROFILE_INTERVAL_MS", 5)),
+    )
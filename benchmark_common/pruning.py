@@ -0,0 +1,46 @@
+"""
+Neural sparse query pruning, shared by the pruning sweep (benchmark_ingestion) and the
+search workload (benchmark_search) so both prune queries identically.
+"""
+
+PRUNE_TYPES = ["none", "top_k", "max_ratio", "abs_value", "alpha_mass"]
+
+
+def prune_query_tokens(query_tokens, prune_type, prune_value):
+    """
+    Prune a sparse query vector
+
+    Args:
+        query_tokens: Dict of {token: weight}
+        prune_type: One of none, top_k, max_ratio, abs_value, alpha_mass
+            - top_k: keep the `prune_value` highest weighted tokens
+            - max_ratio: keep tokens with weight >= prune_value * max weight
+            - abs_value: keep tokens with weight >= prune_value
+            - alpha_mass: keep the highest weighted tokens until they hold
+              prune_value of the total weight
+        prune_value: Parameter of the pruning strategy
+
+    Returns:
+        dict: Pruned {token: weight}
+    """
+    if prune_type == "none" or not query_tokens:
+        return query_tokens
+    if prune_type == "abs_value":
+        return {t: w for t, w in query_tokens.items() if w >= prune_value}
+    if prune_type == "max_ratio":
+        threshold = max(query_tokens.values()) * prune_value
+        return {t: w for t, w in query_tokens.items() if w >= threshold}
+
+    ranked = sorted(query_tokens.items(), key=lambda item: item[1], reverse=True)
+    if prune_type == "top_k":
+        return dict(ranked[: int(prune_value)])
+    if prune_type == "alpha_mass":
+        budget = sum(w for _, w in ranked) * prune_value
+        pruned, mass = {}, 0.0
+        for token, weight in ranked:
+            if mass >= budget:
+                break
+            pruned[token] = weight
+            mass += weight
+        return pruned
+    raise ValueError(f"Invalid prune type: {prune_type}")
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Local SQLite store of benchmark results, shared by all tools of the repository.
+
+Every run records the tool, its configuration, the environment and the git commit of
+the checkout, its summary metrics and optionally the raw samples behind them (e.g.
+per-second throughput or per-request latencies). `compare` flags the metrics of a
+run that are significantly worse than in a baseline run, and reports metrics that got
+worse but have no samples to test as untested.
+
+Usage:
+python -m benchmark_common.results_store --db results.db list
+python -m benchmark_common.results_store --db results.db show 3
+python -m benchmark_common.results_store --db results.db compare 3 5
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+DEFAULT_DB = "benchmark_results.db"
+
+HIGHER = "higher"
+LOWER = "lower"
+
+# better direction of the metrics the tools record, matched against the whole metric
+# name without its "<test>/" prefix. Other metrics (e.g. request counts) are not
+# compared
+METRIC_DIRECTIONS = [
+    (r"rps|docs_per_sec|achieved_qps|throughput|max_sustainable_throughput", HIGHER),
+    (r"(NDCG|MAP|Recall|P)@\d+", HIGHER),
+    (r"(latency|lag)_p\d+(_\d+)?_ms|(doc_)?p\d+(_\d+)?_latency_ms", LOWER),
+    (r"errors|retries|error_rate|elapsed_s", LOWER),
+    # opensearch-benchmark results, see osb_results.py
+    (r"(Min|Mean|Median|Max) Throughput", HIGHER),
+    (r"\d+(\.\d+)?th percentile (latency|service time|processing time)", LOWER),
+    (r"error rate", LOWER),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tool TEXT NOT NULL,
+    name TEXT,
+    created_utc TEXT NOT NULL,
+    config TEXT,
+    environment TEXT,
+    git_commit TEXT,
+    git_dirty INTEGER
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    name TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (run_id, name)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    name TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_run_name ON samples (run_id, name);
+"""
+
+
+def git_metadata():
+    """Commit of the repository checkout and whether it has local changes"""
+    root = Path(__file__).resolve().parent.parent
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def environment_metadata():
+    """Host, interpreter and OpenSearch endpoint of the run"""
+    return {
+        "hostname": socket.gethostname(),
+        "platform": platform.platform(),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "hosts": os.environ.get("HOSTS"),
+        "argv": sys.argv,
+    }
+
+
+def metric_direction(metric):
+    """HIGHER or LOWER when that value of the metric is better, None if unknown"""
+    name = metric.rsplit("/", 1)[-1]
+    for pattern, direction in METRIC_DIRECTIONS:
+        if re.fullmatch(pattern, name):
+            return direction
+    return None
+
+
+def sample_name(metric):
+    """
+    Name of the samples behind a metric. The percentiles of a distribution share its
+    samples, e.g. latency_p90_ms and latency_p99_ms are both tested on latency_ms.
+    """
+    name = re.sub(r"(?<![a-z])p\d+(_\d+)?", "", metric)
+    return re.sub(r"_+", "_", name).strip("_").replace("/_", "/")
+
+
+def mann_whitney_u(a, b):
+    """
+    Two-sided Mann-Whitney U test with the normal approximation and tie correction.
+
+    Returns:
+        float: p-value, None with fewer than 5 samples on either side
+    """
+    n1, n2 = len(a), len(b)
+    if n1 < 5 or n2 < 5:
+        return None
+    values = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    rank_sum = 0.0
+    tie_term = 0.0
+    i = 0
+    while i < len(values):
+        j = i
+        while j + 1 < len(values) and values[j + 1][0] == values[i][0]:
+            j += 1
+        # tied values share the average of their 1-based ranks
+        rank = (i + j) / 2 + 1
+        ties = j - i + 1
+        tie_term += ties**3 - ties
+        rank_sum += rank * sum(1 for k in range(i, j + 1) if values[k][1] == 0)
+        i = j + 1
+    n = n1 + n2
+    u = rank_sum - n1 * (n1 + 1) / 2
+    mean = n1 * n2 / 2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    # continuity correction
+    z = (abs(u - mean) - 0.5) / math.sqrt(variance)
+    return min(1.0, math.erfc(max(z, 0.0) / math.sqrt(2)))
+
+
+class ResultsStore:
+    """Runs, metrics and samples in a SQLite database file"""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def add_run(self, tool, config=None, name=None):
+        """
+        Create a run with its configuration, environment and git metadata.
+
+        Args:
+            tool: Tool that produced the run, e.g. search_relevance
+            config: JSON-serializable configuration, e.g. vars(args)
+            name: Optional label of the run
+
+        Returns:
+            int: Run id
+        """
+        commit, dirty = git_metadata()
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (tool, name, created_utc, config, environment, "
+                "git_commit, git_dirty) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    tool,
+                    name,
+                    datetime.utcnow().isoformat() + "Z",
+                    json.dumps(config or {}, default=str),
+                    json.dumps(environment_metadata()),
+                    commit,
+                    None if dirty is None else int(dirty),
+                ),
+            )
+        return cursor.lastrowid
+
+    def add_metrics(self, run_id, metrics, samples=None):
+        """
+        Store the summary metrics of a run and optionally their raw samples.
+
+        Args:
+            run_id: Run id
+            metrics: {name: value}, None values are skipped
+            samples: {name: [values]} used by `compare` for significance tests, named
+                after their metric without percentile, e.g. latency_ms
+        """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO metrics (run_id, name, value) VALUES (?, ?, ?)",
+                [
+                    (run_id, name, float(value))
+                    for name, value in metrics.items()
+                    if isinstance(value, (int, float)) and not isinstance(value, bool)
+                ],
+            )
+            for name, values in (samples or {}).items():
+                self.connection.executemany(
+                    "INSERT INTO samples (run_id, name, value) VALUES (?, ?, ?)",
+                    [(run_id, name, float(value)) for value in values],
+                )
+
+    def runs(self, tool=None, limit=20):
+        query = "SELECT id, tool, name, created_utc, git_commit, git_dirty FROM runs"
+        params = []
+        if tool is not None:
+            query += " WHERE tool = ?"
+            params.append(tool)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return self.connection.execute(query, params).fetchall()
+
+    def run(self, run_id):
+        row = self.connection.execute(
+            "SELECT id, tool, name, created_utc, config, environment, git_commit, "
+            "git_dirty FROM runs WHERE id = ?",
+            (run_id,),
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"No run {run_id} in {self.path}")
+        keys = ["id", "tool", "name", "created_utc", "config", "environment"]
+        run = dict(zip(keys + ["git_commit", "git_dirty"], row))
+        run["config"] = json.loads(run["config"])
+        run["environment"] = json.loads(run["environment"])
+        return run
+
+    def metrics(self, run_id):
+        return dict(
+            self.connection.execute(
+                "SELECT name, value FROM metrics WHERE run_id = ? ORDER BY name",
+                (run_id,),
+            ).fetchall()
+        )
+
+    def samples(self, run_id):
+        samples = {}
+        for name, value in self.connection.execute(
+            "SELECT name, value FROM samples WHERE run_id = ?", (run_id,)
+        ):
+            samples.setdefault(name, []).append(value)
+        return samples
+
+
+def record_run(db_path, tool, config, metrics, samples=None, name=None):
+    """
+    Store a finished run, the one call the tools make.
+
+    Returns:
+        int: Run id
+    """
+    store = ResultsStore(db_path)
+    try:
+        run_id = store.add_run(tool, config, name)
+        store.add_metrics(run_id, metrics, samples)
+    finally:
+        store.close()
+    print(f"Results stored as run {run_id} in {db_path}")
+    return run_id
+
+
+def compare_runs(store, baseline_id, run_id, alpha=0.05, min_change=0.05):
+    """
+    Compare the metrics two runs have in common.
+
+    A metric got worse when it changed in its worse direction (see
+    `metric_direction`) by more than `min_change` (relative). It regresses when both
+    runs also have samples of it (see `sample_name`) and the Mann-Whitney U test
+    rejects equal distributions at `alpha`. The status of each metric is one of:
+    - regression: worse and significant
+    - untested: worse, but without samples the change can't be tested
+    - not significant: worse, but within the noise of the samples
+    - ok: not worse
+    - n/a: no known direction or no relative change (zero baseline)
+
+    Returns:
+        list: One dict per metric with baseline, value, change, p_value, status and
+            regression
+    """
+    baseline, current = store.metrics(baseline_id), store.metrics(run_id)
+    baseline_samples, samples = store.samples(baseline_id), store.samples(run_id)
+    rows = []
+    for name in sorted(set(baseline) & set(current)):
+        before, after = baseline[name], current[name]
+        change = (after - before) / abs(before) if before else None
+        p_value = None
+        key = sample_name(name)
+        if key in baseline_samples and key in samples:
+            p_value = mann_whitney_u(baseline_samples[key], samples[key])
+        direction = metric_direction(name)
+        if direction is None or change is None:
+            status = "n/a"
+        elif (change < -min_change) if direction == HIGHER else (change > min_change):
+            if p_value is None:
+                status = "untested"
+            elif p_value < alpha:
+                status = "regression"
+            else:
+                status = "not significant"
+        else:
+            status = "ok"
+        rows.append(
+            {
+                "metric": name,
+                "baseline": before,
+                "value": after,
+                "change": change,
+                "p_value": p_value,
+                "status": status,
+                "regression": status == "regression",
+            }
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark results store")
+    parser.add_argument(
+        "--db", default=DEFAULT_DB, help=f"SQLite database (default: {DEFAULT_DB})"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="List the latest runs")
+    list_parser.add_argument("--tool", default=None, help="Only runs of this tool")
+    list_parser.add_argument("--limit", type=int, default=20)
+
+    show_parser = subparsers.add_parser("show", help="Show a run and its metrics")
+    show_parser.add_argument("run_id", type=int)
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="Flag regressions of a run against a baseline run"
+    )
+    compare_parser.add_argument("baseline_id", type=int)
+    compare_parser.add_argument("run_id", type=int)
+    compare_parser.add_argument(
+        "--alpha",
+        type=float,
+        default=0.05,
+        help="Significance level of the Mann-Whitney U test (default: 0.05)",
+    )
+    compare_parser.add_argument(
+        "--min-change",
+        type=float,
+        default=0.05,
+        help="Smallest relative change reported as a regression (default: 0.05)",
+    )
+    args = parser.parse_args()
+
+    store = ResultsStore(args.db)
+    if args.command == "list":
+        print("Run | Tool | Name | Created | Commit")
+        print("-" * 70)
+        for run_id, tool, name, created, commit, dirty in store.runs(
+            args.tool, args.limit
+        ):
+            commit = (commit or "unknown")[:10] + ("+dirty" if dirty else "")
+            print(f"{run_id} | {tool} | {name or ''} | {created} | {commit}")
+
+    elif args.command == "show":
+        print(json.dumps(store.run(args.run_id), indent=2))
+        for name, value in store.metrics(args.run_id).items():
+            print(f"{name}: {value:.4f}")
+
+    else:
+        for run_id in (args.baseline_id, args.run_id):
+            run = store.run(run_id)
+            print(
+                f"Run {run_id}: {run['tool']} {run['created_utc']} {run['git_commit']}"
+            )
+        rows = compare_runs(
+            store, args.baseline_id, args.run_id, args.alpha, args.min_change
+        )
+        print("\nMetric | Baseline | Run | Change | p-value | Status")
+        print("-" * 80)
+        for row in rows:
+            change = "n/a"
+            if row["change"] is not None:
+                change = f"{row['change'] * 100:+.1f}%"
+            p_value = f"{row['p_value']:.4f}" if row["p_value"] is not None else "n/a"
+            status = row["status"]
+            if status in ("regression", "untested"):
+                status = status.upper()
+            print(
+                f"{row['metric']} | {row['baseline']:.4f} | {row['value']:.4f} | "
+                f"{change} | {p_value} | {status}"
+            )
+        regressions = sum(row["regression"] for row in rows)
+        untested = sum(row["status"] == "untested" for row in rows)
+        print(
+            f"\n{regressions} regressions and {untested} untested changes for the "
+            f"worse in {len(rows)} metrics"
+        )
+        store.close()
+        sys.exit(1 if regressions else 0)
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
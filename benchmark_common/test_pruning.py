@@ -0,0 +1,26 @@
+import pytest
+
+from benchmark_common.pruning import prune_query_tokens
+
+
+TOKENS = {"a": 3.0, "b": 2.0, "c": 1.0, "d": 0.5}
+
+
+@pytest.mark.parametrize(
+    "prune_type, prune_value, expected",
+    [
+        ("none", 0, TOKENS),
+        ("top_k", 2, {"a": 3.0, "b": 2.0}),
+        ("max_ratio", 0.5, {"a": 3.0, "b": 2.0}),
+        ("abs_value", 1.0, {"a": 3.0, "b": 2.0, "c": 1.0}),
+        # a and b hold 5 of 6.5, the budget of 0.7 * 6.5 = 4.55 is reached after b
+        ("alpha_mass", 0.7, {"a": 3.0, "b": 2.0}),
+    ],
+)
+def test_prune_query_tokens(prune_type, prune_value, expected):
+    assert prune_query_tokens(TOKENS, prune_type, prune_value) == expected
+
+
+def test_prune_query_tokens_rejects_unknown_type():
+    with pytest.raises(ValueError):
+        prune_query_tokens(TOKENS, "bottom_k", 2)
@@ -0,0 +1,112 @@
+import pytest
+
+from benchmark_common.results_store import (
+    HIGHER,
+    LOWER,
+    ResultsStore,
+    compare_runs,
+    mann_whitney_u,
+    metric_direction,
+    sample_name,
+)
+
+
+def test_mann_whitney_u_separated_samples():
+    # U = 0 for n1 = n2 = 10: z = (50 - 0.5) / sqrt(175), as scipy's asymptotic test
+    p_value = mann_whitney_u(list(range(1, 11)), list(range(11, 21)))
+    assert p_value == pytest.approx(1.8267e-4, rel=1e-3)
+
+
+def test_mann_whitney_u_same_samples():
+    assert mann_whitney_u([1, 2, 3, 4, 5], [5, 4, 3, 2, 1]) == pytest.approx(1.0)
+    # all values tied, there is nothing to rank
+    assert mann_whitney_u([7] * 5, [7] * 6) == 1.0
+
+
+def test_mann_whitney_u_needs_five_samples_per_side():
+    assert mann_whitney_u([1, 2, 3, 4], [5, 6, 7, 8, 9]) is None
+
+
+@pytest.mark.parametrize(
+    "metric, direction",
+    [
+        ("docs_per_sec", HIGHER),
+        ("1kb_5docs_16users/rps", HIGHER),
+        ("NDCG@10", HIGHER),
+        ("P@10", HIGHER),
+        ("search/Mean Throughput", HIGHER),
+        ("latency_p99_ms", LOWER),
+        ("1kb_5docs_16users/p99_9_latency_ms", LOWER),
+        ("search/99.9th percentile latency", LOWER),
+        ("search/error rate", LOWER),
+        ("errors", LOWER),
+        ("requests", None),
+        ("target_qps", None),
+        ("Store size", None),
+    ],
+)
+def test_metric_direction(metric, direction):
+    assert metric_direction(metric) == direction
+
+
+def test_sample_name_strips_percentiles():
+    assert sample_name("latency_p90_ms") == "latency_ms"
+    assert sample_name("1kb_5docs_16users/p99_9_latency_ms") == (
+        "1kb_5docs_16users/latency_ms"
+    )
+    assert sample_name("rps") == "rps"
+
+
+def test_compare_runs(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"))
+    baseline = store.add_run("search_relevance")
+    store.add_metrics(
+        baseline,
+        {
+            "latency_p90_ms": 10.0,
+            "achieved_qps": 100.0,
+            "NDCG@10": 0.40,
+            "errors": 0,
+            "requests": 100,
+        },
+        {"latency_ms": [9, 10, 10, 11, 10, 9, 11, 10]},
+    )
+    run = store.add_run("search_relevance")
+    store.add_metrics(
+        run,
+        {
+            "latency_p90_ms": 20.0,
+            "achieved_qps": 120.0,
+            "NDCG@10": 0.30,
+            "errors": 0,
+            "requests": 50,
+        },
+        {"latency_ms": [19, 20, 20, 21, 20, 19, 21, 20]},
+    )
+    statuses = {
+        row["metric"]: row["status"] for row in compare_runs(store, baseline, run)
+    }
+    store.close()
+    assert statuses == {
+        "latency_p90_ms": "regression",
+        "achieved_qps": "ok",
+        "NDCG@10": "untested",
+        "errors": "n/a",
+        "requests": "n/a",
+    }
+
+
+def test_compare_runs_noisy_change_is_not_significant(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"))
+    samples = [[5, 50, 8, 40, 12, 30], [6, 45, 9, 42, 11, 60]]
+    runs = []
+    for values in samples:
+        run = store.add_run("search_relevance")
+        store.add_metrics(
+            run, {"latency_p50_ms": sorted(values)[3]}, {"latency_ms": values}
+        )
+        runs.append(run)
+    (row,) = compare_runs(store, *runs)
+    store.close()
+    assert row["change"] > 0.05
+    assert (row["status"], row["regression"]) == ("not significant", False)
@@ -1,9 +1,14 @@
-import json
 import time
 import argparse
 import os
+import sys
+from pathlib import Path
 from utils import get_os_client
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from benchmark_common import jsoncodec
+from benchmark_common.profiling import print_stage_report, profile_from_env, stage
+
 
 def export_to_jsonl(client, index_name, output_file, scroll_time="5m", batch_size=1000):
     """
@@ -19,12 +24,13 @@ def export_to_jsonl(client, index_name, output_file, scroll_time="5m", batch_siz
     # Initialize scroll
     try:
         # Get the initial scroll ID
-        result = client.search(
-            index=index_name,
-            scroll=scroll_time,
-            size=batch_size,
-            body={"query": {"match_all": {}}},
-        )
+        with stage("scroll_request"):
+            result = client.search(
+                index=index_name,
+                scroll=scroll_time,
+                size=batch_size,
+                body={"query": {"match_all": {}}},
+            )
         scroll_id = result["_scroll_id"]
         hits = result["hits"]["hits"]
 
@@ -39,12 +45,15 @@ def export_to_jsonl(client, index_name, output_file, scroll_time="5m", batch_siz
         os.makedirs(os.path.dirname(output_file), exist_ok=True)
 
         # Open file and write documents
-        with open(output_file, "w", encoding="utf-8") as f:
+        with open(output_file, "wb") as f:
             while hits:
                 # Process current batch
                 for hit in hits:
                     # Write document to file
-                    f.write(json.dumps(hit["_source"]) + "\n")
+                    with stage("encode"):
+                        line = jsoncodec.dumpb(hit["_source"]) + b"\n"
+                    with stage("write"):
+                        f.write(line)
                     processed_docs += 1
 
                 # Print progress
@@ -58,7 +67,8 @@ def export_to_jsonl(client, index_name, output_file, scroll_time="5m", batch_siz
                     )
 
                 # Get next batch of results
-                result = client.scroll(scroll_id=scroll_id, scroll=scroll_time)
+                with stage("scroll_request"):
+                    result = client.scroll(scroll_id=scroll_id, scroll=scroll_time)
                 scroll_id = result["_scroll_id"]
                 hits = result["hits"]["hits"]
 
@@ -70,6 +80,7 @@ def export_to_jsonl(client, index_name, output_file, scroll_time="5m", batch_siz
         print(f"Total time: {elapsed_time:.2f} seconds")
         print(f"Average speed: {docs_per_second:.2f} docs/sec")
         print(f"Output file: {output_file}")
+        print_stage_report()
 
     except Exception as e:
         print(f"Error during export: {e}")
@@ -103,6 +114,7 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
     print(args)
+    profile_from_env("fetch_index_to_jsonl")
 
     try:
         # Initialize OpenSearch client
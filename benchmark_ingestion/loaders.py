@@ -0,0 +1,207 @@
+import csv
+import sys
+from array import array
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from benchmark_common import jsoncodec
+
+
+def _file_format(path):
+    """Infer the file format (json, jsonl or tsv) from the file extension"""
+    lowered = path.lower()
+    if lowered.endswith(".jsonl"):
+        return "jsonl"
+    if lowered.endswith(".tsv"):
+        return "tsv"
+    if lowered.endswith(".json"):
+        return "json"
+    raise ValueError(f"Unsupported file format: {path}")
+
+
+def iter_queries(queries_file):
+    """
+    Stream queries from a JSON, JSONL or TSV file
+
+    Supported formats:
+        .json: {"query_id": "query text", ...}
+        .jsonl: one {"_id": ..., "text": ...} object per line (BEIR format)
+        .tsv: query_id<TAB>query_text per line, optional header row
+
+    Args:
+        queries_file: Path to queries file
+
+    Yields:
+        tuple: (query_id, query_text)
+    """
+    file_format = _file_format(queries_file)
+    with open(queries_file, "r", encoding="utf-8") as f:
+        if file_format == "json":
+            yield from jsoncodec.load(f).items()
+        elif file_format == "jsonl":
+            for line in f:
+                if not line.strip():
+                    continue
+                item = jsoncodec.loads(line)
+                yield str(item.get("_id", item.get("id"))), item["text"]
+        else:
+            for row in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+                if len(row) < 2 or row[0] in ("_id", "query-id", "id"):
+                    continue
+                yield row[0], row[1]
+
+
+def iter_qrels(qrels_file):
+    """
+    Stream relevance judgements from a JSON, JSONL or TSV file
+
+    Supported formats:
+        .json: {"query_id": {"doc_id": score, ...}, ...}
+        .jsonl: one {"query-id": ..., "corpus-id": ..., "score": ...} object per line
+        .tsv: query-id<TAB>corpus-id<TAB>score per line, optional header row (BEIR format)
+
+    Args:
+        qrels_file: Path to qrels file
+
+    Yields:
+        tuple: (query_id, doc_id, score)
+    """
+    file_format = _file_format(qrels_file)
+    with open(qrels_file, "r", encoding="utf-8") as f:
+        if file_format == "json":
+            for query_id, docs in jsoncodec.load(f).items():
+                for doc_id, score in docs.items():
+                    yield query_id, doc_id, int(score)
+        elif file_format == "jsonl":
+            for line in f:
+                if not line.strip():
+                    continue
+                item = jsoncodec.loads(line)
+                yield str(item["query-id"]), str(item["corpus-id"]), int(item["score"])
+        else:
+            for row in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+                if len(row) < 3 or row[0] == "query-id":
+                    continue
+                yield row[0], row[1], int(row[2])
+
+
+class CompactQrels:
+    """
+    Columnar, memory-compact relevance judgements
+
+    Query and document ids are interned to integers and the judgements are kept
+    in three parallel integer arrays sorted by query, so memory grows with the
+    number of judged pairs instead of with per-query Python dicts. Use
+    `to_dict()` to materialize the nested dict format expected by BEIR for the
+    subset of queries that is actually evaluated.
+    """
+
+    def __init__(self):
+        self._query_ids = {}
+        self._query_names = []
+        self._doc_ids = {}
+        self._doc_names = []
+        self._query_col = array("i")
+        self._doc_col = array("i")
+        self._score_col = array("i")
+        self._starts = None
+
+    @classmethod
+    def from_file(cls, qrels_file):
+        """Build compact qrels by streaming a qrels file"""
+        qrels = cls()
+        for query_id, doc_id, score in iter_qrels(qrels_file):
+            qrels.add(query_id, doc_id, score)
+        qrels.finalize()
+        return qrels
+
+    @staticmethod
+    def _intern(ids, names, key):
+        idx = ids.get(key)
+        if idx is None:
+            idx = len(names)
+            ids[key] = idx
+            names.append(key)
+        return idx
+
+    def add(self, query_id, doc_id, score):
+        """Append a single judgement. Call `finalize()` after the last one."""
+        self._query_col.append(
+            self._intern(self._query_ids, self._query_names, query_id)
+        )
+        self._doc_col.append(self._intern(self._doc_ids, self._doc_names, doc_id))
+        self._score_col.append(score)
+        self._starts = None
+
+    def finalize(self):
+        """Sort the judgements by query and build the per-query start offsets"""
+        # counting sort, the interned query ids are dense integers
+        starts = array("l", [0] * (len(self._query_names) + 1))
+        for query_idx in self._query_col:
+            starts[query_idx + 1] += 1
+        for i in range(len(self._query_names)):
+            starts[i + 1] += starts[i]
+
+        size = len(self._query_col)
+        cursor = array("l", starts)
+        doc_col = array("i", bytes(4 * size))
+        score_col = array("i", bytes(4 * size))
+        for query_idx, doc_idx, score in zip(
+            self._query_col, self._doc_col, self._score_col
+        ):
+            pos = cursor[query_idx]
+            doc_col[pos] = doc_idx
+            score_col[pos] = score
+            cursor[query_idx] = pos + 1
+
+        query_col = array("i")
+        for query_idx in range(len(self._query_names)):
+            query_col.extend([query_idx] * (starts[query_idx + 1] - starts[query_idx]))
+
+        self._query_col, self._doc_col, self._score_col = query_col, doc_col, score_col
+        self._starts = starts
+        return self
+
+    def __len__(self):
+        return len(self._query_names)
+
+    def __contains__(self, query_id):
+        return query_id in self._query_ids
+
+    def __iter__(self):
+        return iter(self._query_names)
+
+    @property
+    def num_judgements(self):
+        return len(self._query_col)
+
+    def get(self, query_id, default=None):
+        """Return {doc_id: score} for a single query"""
+        if self._starts is None:
+            self.finalize()
+        query_idx = self._query_ids.get(query_id)
+        if query_idx is None:
+            return default
+        start, end = self._starts[query_idx], self._starts[query_idx + 1]
+        return {
+            self._doc_names[self._doc_col[i]]: self._score_col[i]
+            for i in range(start, end)
+        }
+
+    def to_dict(self, query_ids=None):
+        """
+        Materialize nested {query_id: {doc_id: score}} dicts
+
+        Args:
+            query_ids: Only include these queries. Defaults to all queries.
+
+        Returns:
+            dict: qrels in the format expected by BEIR
+        """
+        if query_ids is None:
+            query_ids = self._query_names
+        return {
+            query_id: self.get(query_id)
+            for query_id in query_ids
+            if query_id in self._query_ids
+        }
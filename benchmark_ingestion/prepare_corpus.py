@@ -0,0 +1,285 @@
+"""
+Convert a BEIR corpus (or a local JSONL/Parquet corpus) into ingestion-ready JSONL.
+
+The Arrow dataset is read in batches and documents are built with Arrow compute
+functions, so no Python code runs per row except the JSON encoding. Worker processes
+convert contiguous parts of the corpus in parallel and the parts are joined into
+--num_shards output files, each with its .offset file for run_bulk.py. Queries and
+qrels of the judged queries are written by the main process while the workers run.
+
+Usage:
+python prepare_corpus.py --dataset nfcorpus --workers 8
+python prepare_corpus.py --dataset msmarco --num_shards 16 --compress
+python prepare_corpus.py --dataset my-corpus --data_files corpus.jsonl --skip_queries
+"""
+
+import argparse
+import csv
+import gzip
+import math
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from benchmark_common import jsoncodec
+
+
+def load_corpus(dataset, data_files=None):
+    """
+    Load the corpus as a memory-mapped Arrow dataset, downloading it on first use.
+
+    Args:
+        dataset: BEIR dataset name, e.g. nfcorpus
+        data_files: Local .jsonl/.json/.parquet corpus used instead of BeIR/<dataset>
+    """
+    import datasets
+
+    if data_files:
+        builder = "parquet" if data_files.endswith(".parquet") else "json"
+        return datasets.load_dataset(builder, data_files=data_files, split="train")
+    return datasets.load_dataset(
+        f"BeIR/{dataset}", "corpus", split="corpus", trust_remote_code=True
+    )
+
+
+def build_documents(batch, id_column="_id", title_column="title", text_column="text"):
+    """
+    Build the documents of an Arrow batch: text is "<title> <text>", documents with
+    blank text are dropped.
+
+    Returns:
+        tuple: (ids list, texts list)
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    text = pc.fill_null(batch.column(text_column), "")
+    if title_column in batch.column_names:
+        title = pc.fill_null(batch.column(title_column), "")
+        text = pc.binary_join_element_wise(title, text, " ")
+    keep = pc.not_equal(pc.utf8_trim_whitespace(text), "")
+    ids = pc.cast(batch.column(id_column), pa.string())
+    return pc.filter(ids, keep).to_pylist(), pc.filter(text, keep).to_pylist()
+
+
+def shard_file_name(output, shard, num_shards, compress):
+    """<output>.jsonl for a single shard, <output>-00003-of-00016.jsonl otherwise"""
+    name = output if num_shards == 1 else f"{output}-{shard:05d}-of-{num_shards:05d}"
+    return f"{name}.jsonl" + (".gz" if compress else "")
+
+
+def convert_part(task):
+    """
+    Convert one contiguous part of the corpus, runs in a worker process.
+
+    Returns:
+        tuple: (part index, documents written, documents dropped)
+    """
+    args, part, num_parts, part_file = task
+    corpus = load_corpus(args.dataset, args.data_files)
+    corpus = corpus.shard(num_parts, part, contiguous=True).with_format("arrow")
+
+    written = 0
+    dropped = 0
+    position = 0
+    opener = gzip.open if args.compress else open
+    with opener(part_file, "wb") as f, open(part_file + ".offset", "w") as offsets:
+        for batch in corpus.iter(batch_size=args.batch_size):
+            ids, texts = build_documents(
+                batch, args.id_column, args.title_column, args.text_column
+            )
+            dropped += batch.num_rows - len(ids)
+            lines = []
+            line_offsets = []
+            for doc_id, text in zip(ids, texts):
+                line = jsoncodec.dumpb({"id": doc_id, "text": text}) + b"\n"
+                line_offsets.append(f"{position}\n")
+                position += len(line)
+                lines.append(line)
+            f.write(b"".join(lines))
+            offsets.write("".join(line_offsets))
+            written += len(lines)
+    return part, written, dropped
+
+
+def join_parts(part_files, shard_file, write_offsets):
+    """
+    Concatenate part files into a shard and shift their line offsets. Concatenated
+    gzip files are a valid multi-member gzip file.
+    """
+    if len(part_files) == 1:
+        os.replace(part_files[0], shard_file)
+        if write_offsets:
+            os.replace(part_files[0] + ".offset", offset_file_name(shard_file))
+        else:
+            os.remove(part_files[0] + ".offset")
+        return
+
+    base = 0
+    with open(shard_file, "wb") as out:
+        offsets_out = open(offset_file_name(shard_file), "w") if write_offsets else None
+        try:
+            for part_file in part_files:
+                with open(part_file, "rb") as f:
+                    shutil.copyfileobj(f, out, 16 * 1024 * 1024)
+                if offsets_out is not None:
+                    with open(part_file + ".offset", "r") as f:
+                        offsets_out.writelines(f"{int(line) + base}\n" for line in f)
+                    base += os.path.getsize(part_file)
+                os.remove(part_file)
+                os.remove(part_file + ".offset")
+        finally:
+            if offsets_out is not None:
+                offsets_out.close()
+
+
+def offset_file_name(shard_file):
+    """run_bulk.py reads <file_name>.offset next to <file_name>.jsonl"""
+    return shard_file[: -len(".jsonl")] + ".offset"
+
+
+def write_queries_and_qrels(dataset, output, qrels_split="test"):
+    """
+    Write the judged queries as JSONL and the qrels as TSV (BEIR format), both
+    streamed by loaders.py.
+
+    Returns:
+        tuple: (queries file, qrels file, number of queries, number of judgements)
+    """
+    import datasets
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    qrels = datasets.load_dataset(
+        f"BeIR/{dataset}-qrels", split=qrels_split, trust_remote_code=True
+    ).with_format("arrow")[:]
+    queries = datasets.load_dataset(
+        f"BeIR/{dataset}", "queries", split="queries", trust_remote_code=True
+    ).with_format("arrow")[:]
+
+    # query ids are strings in some BEIR datasets and integers in others
+    query_ids = pc.cast(qrels.column("query-id"), pa.string())
+    corpus_ids = pc.cast(qrels.column("corpus-id"), pa.string())
+    judged = pc.is_in(
+        pc.cast(queries.column("_id"), pa.string()), value_set=pc.unique(query_ids)
+    )
+    queries = queries.filter(judged)
+
+    queries_file = f"{output}-queries.jsonl"
+    with open(queries_file, "wb") as f:
+        ids = pc.cast(queries.column("_id"), pa.string()).to_pylist()
+        texts = queries.column("text").to_pylist()
+        f.writelines(
+            jsoncodec.dumpb({"_id": query_id, "text": text}) + b"\n"
+            for query_id, text in zip(ids, texts)
+        )
+
+    qrels_file = f"{output}-qrels.tsv"
+    with open(qrels_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+        writer.writerow(["query-id", "corpus-id", "score"])
+        writer.writerows(
+            zip(
+                query_ids.to_pylist(),
+                corpus_ids.to_pylist(),
+                qrels.column("score").to_pylist(),
+            )
+        )
+    return queries_file, qrels_file, len(ids), qrels.num_rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert a BEIR corpus into sharded ingestion JSONL"
+    )
+    parser.add_argument(
+        "--dataset", type=str, required=True, help="BEIR dataset name, e.g. nfcorpus"
+    )
+    parser.add_argument(
+        "--data_files",
+        type=str,
+        default=None,
+        help="Local .jsonl/.parquet corpus to convert instead of BeIR/<dataset>",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Output file prefix, defaults to the dataset name",
+    )
+    parser.add_argument(
+        "--num_shards", type=int, default=1, help="Number of output JSONL files"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Worker processes converting the corpus",
+    )
+    parser.add_argument(
+        "--batch_size", type=int, default=10000, help="Rows per Arrow batch"
+    )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="Write gzip JSONL, without offset files as run_bulk.py cannot seek in it",
+    )
+    parser.add_argument("--id_column", type=str, default="_id", help="Id column")
+    parser.add_argument(
+        "--title_column",
+        type=str,
+        default="title",
+        help="Title column, prepended to the text if present",
+    )
+    parser.add_argument("--text_column", type=str, default="text", help="Text column")
+    parser.add_argument(
+        "--skip_queries", action="store_true", help="Do not write queries and qrels"
+    )
+    parser.add_argument(
+        "--qrels_split", type=str, default="test", help="Split of the BEIR qrels"
+    )
+    args = parser.parse_args()
+    print(args)
+
+    output = args.output or args.dataset
+    start = time.perf_counter()
+
+    # download and build the Arrow cache once, the workers memory-map it
+    corpus = load_corpus(args.dataset, args.data_files)
+    print(f"Loaded {corpus.num_rows} corpus rows")
+
+    # every shard is joined from the same number of contiguous parts
+    parts_per_shard = max(1, math.ceil(args.workers / args.num_shards))
+    num_parts = args.num_shards * parts_per_shard
+    part_files = [f"{output}.part{part:05d}" for part in range(num_parts)]
+    tasks = [(args, part, num_parts, part_files[part]) for part in range(num_parts)]
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(min(args.workers, num_parts)) as pool:
+        pending = pool.map_async(convert_part, tasks)
+        if not args.skip_queries and not args.data_files:
+            queries_file, qrels_file, num_queries, num_qrels = write_queries_and_qrels(
+                args.dataset, output, args.qrels_split
+            )
+            print(f"Wrote {num_queries} queries to {queries_file}")
+            print(f"Wrote {num_qrels} judgements to {qrels_file}")
+        results = pending.get()
+
+    written = sum(result[1] for result in results)
+    dropped = sum(result[2] for result in results)
+    for shard in range(args.num_shards):
+        shard_file = shard_file_name(output, shard, args.num_shards, args.compress)
+        first = shard * parts_per_shard
+        shard_parts = part_files[first : first + parts_per_shard]
+        join_parts(shard_parts, shard_file, write_offsets=not args.compress)
+        print(f"Wrote {shard_file}")
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Converted {written} documents ({dropped} with blank text dropped) in "
+        f"{elapsed:.1f}s, {written / elapsed:.0f} docs/sec"
+    )
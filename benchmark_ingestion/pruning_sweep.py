@@ -0,0 +1,281 @@
+import argparse
+import csv
+import os
+import sys
+from pathlib import Path
+
+from tqdm import tqdm
+from dotenv import load_dotenv
+
+from utils import get_os_client
+from loaders import CompactQrels
+from query_driver import print_summary
+from search_relevance import evaluate_results, run_searches, stream_judged_queries
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from benchmark_common import jsoncodec
+from benchmark_common.pruning import PRUNE_TYPES, prune_query_tokens
+
+load_dotenv()
+
+
+def parse_strategies(spec):
+    """
+    Parse a sweep specification like "top_k:5,10,20;max_ratio:0.1,0.3"
+
+    Returns:
+        list: [(prune_type, prune_value)] including the unpruned baseline
+
+    Raises:
+        ValueError: Unknown prune type or malformed setting, before anything runs
+    """
+    settings = [("none", 0)]
+    for part in spec.split(";"):
+        if not part.strip():
+            continue
+        prune_type, _, values = part.partition(":")
+        prune_type = prune_type.strip()
+        if prune_type not in PRUNE_TYPES[1:]:
+            raise ValueError(
+                f"Invalid prune type {prune_type!r}, must be one of "
+                f"{', '.join(PRUNE_TYPES[1:])}"
+            )
+        if not values.strip():
+            raise ValueError(f"No values for prune type {prune_type}")
+        for value in values.split(","):
+            settings.append((prune_type, float(value)))
+    return settings
+
+
+def encode_queries(client, model_id, queries, batch_size=32):
+    """
+    Encode query texts to sparse vectors with the ml-commons predict API
+
+    Args:
+        client: OpenSearch client
+        model_id: Sparse encoding model id
+        queries: List of (query_id, query_text)
+        batch_size: Number of texts per predict request
+
+    Returns:
+        dict: {query_id: {token: weight}}
+    """
+    encoded = {}
+    for i in tqdm(range(0, len(queries), batch_size), desc="Encoding queries"):
+        batch = queries[i : i + batch_size]
+        response = client.transport.perform_request(
+            method="POST",
+            url=f"/_plugins/_ml/_predict/sparse_encoding/{model_id}",
+            body={"text_docs": [query_text for _, query_text in batch]},
+        )
+        for (query_id, _), result in zip(batch, response["inference_results"]):
+            encoded[query_id] = result["output"][0]["dataAsMap"]["response"][0]
+    return encoded
+
+
+def load_query_tokens(client, model_id, queries, query_tokens_file):
+    """
+    Load query sparse vectors from the cache file, encoding and caching them if missing
+
+    The cache is a JSONL file with one {"_id": ..., "sparse_embedding": {...}} per line,
+    the same field the benchmark_search datasets use.
+    """
+    if os.path.exists(query_tokens_file):
+        encoded = {}
+        with open(query_tokens_file, "r", encoding="utf-8") as f:
+            for line in f:
+                item = jsoncodec.loads(line)
+                encoded[item["_id"]] = item["sparse_embedding"]
+        return encoded
+
+    if model_id is None:
+        raise ValueError(
+            f"{query_tokens_file} does not exist, --model_id is needed to encode the queries"
+        )
+    encoded = encode_queries(client, model_id, queries)
+    with open(query_tokens_file, "w", encoding="utf-8") as f:
+        for query_id, tokens in encoded.items():
+            item = {"_id": query_id, "sparse_embedding": tokens}
+            f.write(jsoncodec.dumps(item) + "\n")
+    return encoded
+
+
+def pareto_frontier(rows, latency_key, quality_key):
+    """
+    Mark the settings for which no other setting is both faster and better
+
+    Settings without a latency (every query pruned to nothing or every request
+    failed) can't be placed on the frontier and are marked as not on it.
+
+    Args:
+        rows: List of result dicts
+        latency_key: Key of the latency to minimize
+        quality_key: Key of the quality metric to maximize
+
+    Returns:
+        list: The frontier rows, ordered by latency
+    """
+    frontier = []
+    best_quality = float("-inf")
+    for row in rows:
+        row["pareto"] = False
+    measured = [row for row in rows if row[latency_key] is not None]
+    for row in sorted(measured, key=lambda r: (r[latency_key], -r[quality_key])):
+        row["pareto"] = row[quality_key] > best_quality
+        if row["pareto"]:
+            frontier.append(row)
+            best_quality = row[quality_key]
+    return frontier
+
+
+def write_rows(output, rows):
+    with open(output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def run_sweep(client, args, query_tokens, qrels):
+    """Run every pruning setting for both quality and latency"""
+    rows = []
+    for prune_type, prune_value in parse_strategies(args.strategies):
+        print(f"\nPruning setting: {prune_type}={prune_value}")
+        pruned = [
+            (query_id, prune_query_tokens(tokens, prune_type, prune_value))
+            for query_id, tokens in query_tokens.items()
+        ]
+        # OpenSearch rejects empty query_tokens, such queries score zero without a request
+        empty = [query_id for query_id, tokens in pruned if not tokens]
+        results, summary = run_searches(
+            client,
+            args.index_name,
+            [(query_id, tokens) for query_id, tokens in pruned if tokens],
+            args.embedding_field,
+            args.max_workers,
+            query_type="neural_sparse_tokens",
+            target_qps=args.target_qps,
+            timeout=args.timeout,
+        )
+        print_summary(summary)
+        if empty:
+            print(f"{len(empty)} queries pruned to no tokens are scored as zero")
+        results.update((query_id, {}) for query_id in empty)
+        ndcg, _, recall, _ = evaluate_results(qrels, results, [10])
+        rows.append(
+            {
+                "prune_type": prune_type,
+                "prune_value": prune_value,
+                "avg_tokens": sum(len(tokens) for _, tokens in pruned) / len(pruned),
+                "empty_queries": len(empty),
+                "ndcg@10": ndcg["NDCG@10"],
+                "recall@10": recall["Recall@10"],
+                "achieved_qps": summary["achieved_qps"],
+                "latency_p50_ms": summary["latency_p50_ms"],
+                "latency_p90_ms": summary["latency_p90_ms"],
+                "latency_p99_ms": summary["latency_p99_ms"],
+                "errors": summary["errors"],
+            }
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Sweep neural sparse query pruning settings for quality and latency"
+    )
+    parser.add_argument(
+        "--queries_file", type=str, required=True, help="Path to queries file"
+    )
+    parser.add_argument(
+        "--qrels_file", type=str, required=True, help="Path to qrels file"
+    )
+    parser.add_argument(
+        "--index_name", type=str, required=True, help="Name of the index to search"
+    )
+    parser.add_argument(
+        "--query_tokens_file",
+        type=str,
+        required=True,
+        help="JSONL cache of query sparse vectors, created with --model_id if missing",
+    )
+    parser.add_argument(
+        "--model_id", type=str, default=None, help="Sparse encoding model id"
+    )
+    parser.add_argument(
+        "--strategies",
+        type=str,
+        default="top_k:5,10,20,40;max_ratio:0.1,0.2,0.4;alpha_mass:0.5,0.7,0.9",
+        help='Pruning settings, e.g. "top_k:5,10;max_ratio:0.1;abs_value:0.5;alpha_mass:0.8"',
+    )
+    parser.add_argument(
+        "--embedding_field",
+        type=str,
+        default="embedding",
+        help="Field name for embedding",
+    )
+    parser.add_argument(
+        "--max_workers",
+        type=int,
+        default=20,
+        help="Maximum number of in-flight queries",
+    )
+    parser.add_argument(
+        "--target_qps",
+        type=float,
+        default=None,
+        help="Queries started per second, runs as fast as possible if not set",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=30, help="Per-request timeout in seconds"
+    )
+    parser.add_argument(
+        "--latency_metric",
+        type=str,
+        default="latency_p90_ms",
+        choices=["latency_p50_ms", "latency_p90_ms", "latency_p99_ms"],
+        help="Latency used for the Pareto frontier",
+    )
+    parser.add_argument(
+        "--output", type=str, default="pruning_sweep.csv", help="Output CSV file"
+    )
+    parser.add_argument(
+        "--use_aws_auth", action="store_true", help="Whether to use AWS authentication"
+    )
+    parser.add_argument("--region", type=str, default="us-east-1", help="AWS region")
+    args = parser.parse_args()
+    print(args)
+    # fail on a typo now rather than after the settings before it have run
+    parse_strategies(args.strategies)
+
+    client = get_os_client(use_aws_auth=args.use_aws_auth, region=args.region)
+    qrels = CompactQrels.from_file(args.qrels_file)
+    queries = list(stream_judged_queries(args.queries_file, qrels))
+    query_tokens = load_query_tokens(
+        client, args.model_id, queries, args.query_tokens_file
+    )
+    print(f"Loaded sparse vectors for {len(query_tokens)} queries")
+
+    rows = run_sweep(client, args, query_tokens, qrels)
+
+    # save the results before anything else can fail, then again with the frontier
+    write_rows(args.output, rows)
+    frontier = pareto_frontier(rows, args.latency_metric, "ndcg@10")
+    write_rows(args.output, rows)
+    print(f"\nSweep completed! Results saved to: {args.output}")
+
+    unmeasured = [row for row in rows if row[args.latency_metric] is None]
+    if unmeasured:
+        print(
+            f"{len(unmeasured)} settings without {args.latency_metric} left off the "
+            "frontier: "
+            + ", ".join(f"{r['prune_type']}={r['prune_value']}" for r in unmeasured)
+        )
+
+    print("\nPareto frontier:")
+    print(f"Setting | Avg tokens | NDCG@10 | Recall@10 | {args.latency_metric}")
+    print("-" * 60)
+    for row in frontier:
+        print(
+            f"{row['prune_type']}={row['prune_value']} | {row['avg_tokens']:.1f} | "
+            f"{row['ndcg@10']:.4f} | {row['recall@10']:.4f} | {row[args.latency_metric]:.1f}"
+        )
@@ -0,0 +1,170 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# HTTP status codes worth retrying, the cluster is overloaded or restarting
+TRANSIENT_STATUS_CODES = {429, 502, 503, 504}
+
+
+def is_transient_error(e):
+    """Whether a failed request is worth retrying"""
+    from opensearchpy.exceptions import ConnectionError, TransportError
+
+    # ConnectionError (and ConnectionTimeout) subclass TransportError, check them first
+    if isinstance(e, (ConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(e, TransportError):
+        return e.status_code in TRANSIENT_STATUS_CODES
+    return False
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = int(round(pct / 100 * len(sorted_values))) - 1
+    return sorted_values[max(0, min(len(sorted_values) - 1, rank))]
+
+
+class RateControlledDriver:
+    """
+    Open-loop, rate-controlled asyncio driver for blocking request functions
+
+    Requests are started on a fixed schedule of `target_qps` regardless of how
+    fast earlier requests complete, with at most `concurrency` requests in
+    flight. When the concurrency limit is reached the schedule slips and the
+    delay is reported as lag, so an overloaded cluster is visible in the
+    summary instead of silently lowering the offered load. Results are handed
+    to the caller in completion order.
+
+    The request function is blocking (e.g. the opensearch-py client) and runs
+    in a thread pool, so the same client works with or without AWS auth.
+    """
+
+    def __init__(
+        self,
+        request_fn,
+        target_qps=None,
+        concurrency=20,
+        timeout=30,
+        max_retries=3,
+        retry_backoff=0.5,
+    ):
+        """
+        Args:
+            request_fn: Blocking function called with a single item, returns its result
+            target_qps: Requests started per second. None runs closed-loop at max concurrency
+            concurrency: Maximum number of in-flight requests
+            timeout: Per-attempt timeout in seconds
+            max_retries: Retries per request for transient errors
+            retry_backoff: Base of the exponential retry backoff in seconds
+        """
+        self.request_fn = request_fn
+        self.target_qps = target_qps
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+    async def _run_one(self, loop, executor, item):
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(
+                    loop.run_in_executor(executor, self.request_fn, item),
+                    timeout=self.timeout,
+                )
+                return result, (time.perf_counter() - start) * 1000, attempt, None
+            except Exception as e:
+                if attempt >= self.max_retries or not is_transient_error(e):
+                    return None, (time.perf_counter() - start) * 1000, attempt, e
+                attempt += 1
+                backoff = self.retry_backoff * (2 ** (attempt - 1))
+                await asyncio.sleep(backoff * (0.5 + random.random()))
+
+    async def _run(self, items, on_result):
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        stats = {"latencies_ms": [], "lags_ms": [], "errors": 0, "retries": 0}
+        pending = set()
+
+        async def run_and_report(item, scheduled):
+            try:
+                lag_ms = max(0.0, (time.perf_counter() - scheduled) * 1000)
+                result, latency_ms, retries, error = await self._run_one(
+                    loop, executor, item
+                )
+                stats["lags_ms"].append(lag_ms)
+                stats["retries"] += retries
+                if error is None:
+                    stats["latencies_ms"].append(latency_ms)
+                else:
+                    stats["errors"] += 1
+                    print(f"Request failed after {retries + 1} attempts: {error!r}")
+                on_result(item, result, latency_ms, error)
+            finally:
+                semaphore.release()
+
+        # timed out attempts keep their thread until the client gives up, leave headroom
+        with ThreadPoolExecutor(max_workers=self.concurrency * 2) as executor:
+            start = time.perf_counter()
+            for i, item in enumerate(items):
+                scheduled = start
+                if self.target_qps:
+                    scheduled = start + i / self.target_qps
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                await semaphore.acquire()
+                task = loop.create_task(run_and_report(item, scheduled))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending)
+            stats["elapsed_s"] = time.perf_counter() - start
+        return stats
+
+    def run(self, items, on_result):
+        """
+        Drive all items and block until every request has completed
+
+        Args:
+            items: Iterable of request items, consumed lazily on schedule
+            on_result: Called as on_result(item, result, latency_ms, error) in completion order
+
+        Returns:
+            dict: Run summary, see `summarize`
+        """
+        return self.summarize(asyncio.run(self._run(items, on_result)))
+
+    def summarize(self, stats):
+        """Reduce raw run stats to throughput, latency and lag percentiles"""
+        latencies = sorted(stats["latencies_ms"])
+        lags = sorted(stats["lags_ms"])
+        completed = len(latencies) + stats["errors"]
+        elapsed = stats["elapsed_s"]
+        return {
+            "target_qps": self.target_qps,
+            "achieved_qps": completed / elapsed if elapsed > 0 else None,
+            "requests": completed,
+            "errors": stats["errors"],
+            "retries": stats["retries"],
+            "latency_p50_ms": percentile(latencies, 50),
+            "latency_p90_ms": percentile(latencies, 90),
+            "latency_p99_ms": percentile(latencies, 99),
+            # without a schedule there is nothing to lag behind
+            "lag_p99_ms": percentile(lags, 99) if self.target_qps else None,
+        }
+
+
+def print_summary(summary):
+    """Print a run summary produced by `RateControlledDriver.run`"""
+    print("\nLoad Summary:")
+    for key, value in summary.items():
+        if isinstance(value, list):
+            continue
+        if isinstance(value, float):
+            value = f"{value:.2f}"
+        print(f"{key}: {value}")
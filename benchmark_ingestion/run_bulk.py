@@ -4,10 +4,14 @@ import sys
 import time
 import os
 import argparse
+from pathlib import Path
 from dotenv import load_dotenv
 
 from tqdm import tqdm
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from benchmark_common.results_store import record_run
+
 load_dotenv()
 
 
@@ -27,6 +31,7 @@ def create_offset_file(jsonl_file, offset_file):
 
 
 def run_processes(args):
+    """Run one bulk.py process per rank and return their exit statuses"""
     processes = []
 
     # Start child processes
@@ -68,23 +73,24 @@ def run_processes(args):
 
     try:
         # Wait for all processes to complete
+        reported = set()
         while True:
             all_done = True
             for i, proc in enumerate(processes):
                 if proc.poll() is None:  # Process is still running
                     all_done = False
-                else:
+                elif i not in reported:
                     # Process has finished, check return code
+                    reported.add(i)
                     return_code = proc.poll()
                     if return_code != 0:
                         print(f"Process {i} failed with return code {return_code}")
-                        # Get error output
-                        _, stderr = proc.communicate()
-                        print(f"Error output: {stderr}")
 
             if all_done:
-                print("All processes completed successfully")
-                break
+                return_codes = [proc.returncode for proc in processes]
+                if not any(return_codes):
+                    print("All processes completed successfully")
+                return return_codes
 
             time.sleep(1)  # Avoid excessive CPU consumption
 
@@ -129,6 +135,12 @@ if __name__ == "__main__":
         "--use_aws_auth", action="store_true", help="whether to use aws auth"
     )
     parser.add_argument("--region", type=str, default="us-east-1", help="AWS region")
+    parser.add_argument(
+        "--results_db",
+        type=str,
+        default=None,
+        help="Record the run in this results store (SQLite file)",
+    )
 
     args = parser.parse_args()
     print(args)
@@ -138,5 +150,24 @@ if __name__ == "__main__":
     if not os.path.exists(offset_file):
         total_lines = create_offset_file(jsonl_file, offset_file)
         print(f"Created offset file. Total lines: {total_lines}")
-
-    run_processes(args)
+    else:
+        with open(offset_file, "r") as f:
+            total_lines = sum(1 for _ in f)
+
+    start = time.perf_counter()
+    return_codes = run_processes(args)
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for return_code in return_codes if return_code != 0)
+    if failed:
+        # a partial ingestion would record a misleading docs/sec
+        print(f"{failed} of {args.total_ranks} ranks failed, not recording the run")
+        sys.exit(1)
+    print(f"Ingested {total_lines} documents in {elapsed:.1f}s")
+
+    if args.results_db:
+        record_run(
+            args.results_db,
+            "run_bulk",
+            vars(args),
+            {"docs_per_sec": total_lines / elapsed, "elapsed_s": elapsed},
+        )
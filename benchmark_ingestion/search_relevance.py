@@ -1,32 +1,51 @@
-import json
 import argparse
-from concurrent.futures import ThreadPoolExecutor
+import sys
+from pathlib import Path
 from utils import get_os_client
+from loaders import CompactQrels, iter_queries
+from query_driver import RateControlledDriver, print_summary
 from tqdm import tqdm
-from beir.retrieval.evaluation import EvaluateRetrieval
 from dotenv import load_dotenv
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from benchmark_common.profiling import print_stage_report, profile_from_env, stage
+from benchmark_common.results_store import record_run
+
 load_dotenv()
 
 
 def load_queries_and_qrels(queries_file, qrels_file):
     """
-    Load queries and qrels from JSON files
+    Load queries and qrels from JSON, JSONL or TSV files
 
     Args:
-        queries_file: Path to queries JSON file
-        qrels_file: Path to qrels JSON file
+        queries_file: Path to queries file
+        qrels_file: Path to qrels file
 
     Returns:
-        tuple: (queries dict, qrels dict)
+        tuple: (queries dict, CompactQrels)
     """
-    with open(queries_file, "r") as f:
-        queries = json.load(f)
-    with open(qrels_file, "r") as f:
-        qrels = json.load(f)
+    qrels = CompactQrels.from_file(qrels_file)
+    queries = dict(iter_queries(queries_file))
     return queries, qrels
 
 
+def stream_judged_queries(queries_file, qrels):
+    """
+    Lazily yield the (query_id, query_text) pairs that have relevance judgements
+
+    Args:
+        queries_file: Path to queries file
+        qrels: CompactQrels or dict of relevance labels
+
+    Yields:
+        tuple: (query_id, query_text)
+    """
+    for query_id, query_text in iter_queries(queries_file):
+        if query_id in qrels:
+            yield query_id, query_text
+
+
 def create_query_body(
     query_text, query_type="neural_sparse", embedding_field="embedding"
 ):
@@ -34,13 +53,25 @@ def create_query_body(
     Create query body for neural sparse search
 
     Args:
-        query_text: Text to search for
+        query_text: Text to search for, or a {token: weight} dict for neural_sparse_tokens
         embedding_field: Field name for embedding
 
     Returns:
         dict: Query body for OpenSearch
     """
-    if query_type == "neural_sparse":
+    if query_type == "neural_sparse_tokens":
+        return {
+            "query": {
+                "neural_sparse": {
+                    embedding_field: {
+                        "query_tokens": query_text,
+                    }
+                },
+            },
+            "_source": ["id", "text"],
+            "size": 15,
+        }
+    elif query_type == "neural_sparse":
         return {
             "query": {
                 "neural_sparse": {
@@ -67,7 +98,12 @@ def create_query_body(
 
 
 def search_query(
-    client, index_name, query_item, embedding_field, query_type="neural_sparse"
+    client,
+    index_name,
+    query_item,
+    embedding_field,
+    query_type="neural_sparse",
+    request_timeout=None,
 ):
     """
     Execute search query for a single query
@@ -77,65 +113,172 @@ def search_query(
         index_name: Name of the index to search
         query_item: Tuple of (query_id, query_text)
         embedding_field: Field name for embedding
+        request_timeout: Per-request timeout in seconds, defaults to the client timeout
 
     Returns:
         tuple: (query_id, scores dict)
     """
     query_id, query_text = query_item
-    query_body = create_query_body(query_text, query_type, embedding_field)
-    response = client.search(index=index_name, body=query_body)
+    with stage("build_query"):
+        query_body = create_query_body(query_text, query_type, embedding_field)
+    params = {}
+    if request_timeout is not None:
+        params["request_timeout"] = request_timeout
+    with stage("search_request"):
+        response = client.search(index=index_name, body=query_body, **params)
 
-    hits = response["hits"]["hits"]
-    scores = {hit["_source"]["id"]: hit["_score"] for hit in hits}
+    with stage("parse_hits"):
+        hits = response["hits"]["hits"]
+        scores = {hit["_source"]["id"]: hit["_score"] for hit in hits}
     return query_id, scores
 
 
-def evaluate_search_relevance(
+def run_searches(
     client,
     index_name,
     queries,
-    qrels,
     embedding_field,
     max_workers,
     query_type="neural_sparse",
+    target_qps=None,
+    timeout=30,
+    max_retries=3,
 ):
     """
-    Evaluate search relevance using BEIR evaluation metrics
+    Run all queries through the rate-controlled driver
 
     Args:
         client: OpenSearch client
         index_name: Name of the index to search
-        queries: Dictionary of queries
-        qrels: Dictionary of relevance labels
+        queries: Dictionary or iterable of (query_id, query_text) pairs
         embedding_field: Field name for embedding
-        max_workers: Number of concurrent workers
+        max_workers: Maximum number of in-flight queries
+        target_qps: Queries started per second, None for as fast as possible
+        timeout: Per-request timeout in seconds
+        max_retries: Retries per query for transient errors
 
     Returns:
-        tuple: (ndcg, map_, recall, precision)
+        tuple: (results dict, load summary dict). Failed queries have empty results,
+            the summary also holds the latencies_ms of the successful queries
     """
     results = {}
+    latencies = []
+    if isinstance(queries, dict):
+        queries = queries.items()
 
-    # Execute searches in parallel
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [
-            executor.submit(
-                search_query,
-                client,
-                index_name,
-                item,
-                embedding_field,
-                query_type,
-            )
-            for item in queries.items()
-        ]
-        for future in tqdm(futures, total=len(futures), desc="Executing searches"):
-            query_id, response = future.result()
-            results[query_id] = response
+    def request_fn(item):
+        return search_query(
+            client, index_name, item, embedding_field, query_type, timeout
+        )
+
+    driver = RateControlledDriver(
+        request_fn,
+        target_qps=target_qps,
+        concurrency=max_workers,
+        timeout=timeout,
+        max_retries=max_retries,
+    )
+    with tqdm(desc="Executing searches") as progress:
 
-    # Evaluate using BEIR metrics
-    ndcg, map_, recall, precision = EvaluateRetrieval.evaluate(qrels, results, [10])
+        def on_result(item, result, latency_ms, error):
+            if error is None:
+                query_id, scores = result
+                results[query_id] = scores
+                latencies.append(latency_ms)
+            else:
+                # failed queries score zero instead of leaving the evaluation
+                results[item[0]] = {}
+            progress.update(1)
 
-    return ndcg, map_, recall, precision
+        summary = driver.run(queries, on_result)
+    summary["latencies_ms"] = latencies
+    return results, summary
+
+
+def evaluate_results(qrels, results, k_values=(10,)):
+    """
+    Evaluate search results with BEIR metrics, unanswered queries score zero
+
+    Queries that failed or returned no hits have empty results. BEIR (pytrec_eval)
+    may leave queries without ranked documents out of its averages, so they are
+    evaluated separately and the averages are scaled back to all queries. Results
+    of queries without relevance judgements are ignored.
+
+    Args:
+        qrels: CompactQrels or dictionary of relevance labels
+        results: Dictionary of {query_id: {doc_id: score}}
+        k_values: Cutoffs to evaluate
+
+    Returns:
+        tuple: (ndcg, map_, recall, precision)
+    """
+    results = {
+        query_id: scores for query_id, scores in results.items() if query_id in qrels
+    }
+    answered = {query_id: scores for query_id, scores in results.items() if scores}
+    if not answered:
+        return tuple(
+            {f"{name}@{k}": 0.0 for k in k_values}
+            for name in ("NDCG", "MAP", "Recall", "P")
+        )
+    # BEIR pulls in torch and friends, only load it once there is something to evaluate
+    from beir.retrieval.evaluation import EvaluateRetrieval
+
+    with stage("evaluate"):
+        if isinstance(qrels, CompactQrels):
+            qrels = qrels.to_dict(answered.keys())
+        metrics = EvaluateRetrieval.evaluate(qrels, answered, k_values)
+    scale = len(answered) / len(results)
+    return tuple(
+        {name: value * scale for name, value in metric.items()} for metric in metrics
+    )
+
+
+def evaluate_search_relevance(
+    client,
+    index_name,
+    queries,
+    qrels,
+    embedding_field,
+    max_workers,
+    query_type="neural_sparse",
+    target_qps=None,
+    timeout=30,
+    max_retries=3,
+):
+    """
+    Evaluate search relevance using BEIR evaluation metrics
+
+    Args:
+        client: OpenSearch client
+        index_name: Name of the index to search
+        queries: Dictionary or iterable of (query_id, query_text) pairs
+        qrels: CompactQrels or dictionary of relevance labels
+        embedding_field: Field name for embedding
+        max_workers: Maximum number of in-flight queries
+        target_qps: Queries started per second, None for as fast as possible
+        timeout: Per-request timeout in seconds
+        max_retries: Retries per query for transient errors
+
+    Returns:
+        tuple: (ndcg, map_, recall, precision, load summary dict)
+    """
+    results, summary = run_searches(
+        client,
+        index_name,
+        queries,
+        embedding_field,
+        max_workers,
+        query_type,
+        target_qps,
+        timeout,
+        max_retries,
+    )
+    print_summary(summary)
+    if summary["errors"]:
+        print(f"{summary['errors']} failed queries are scored as zero")
+
+    return (*evaluate_results(qrels, results, [10]), summary)
 
 
 if __name__ == "__main__":
@@ -143,10 +286,16 @@ if __name__ == "__main__":
         description="Evaluate search relevance using neural sparse search"
     )
     parser.add_argument(
-        "--queries_file", type=str, required=True, help="Path to queries JSON file"
+        "--queries_file",
+        type=str,
+        required=True,
+        help="Path to queries file (.json, .jsonl or .tsv)",
     )
     parser.add_argument(
-        "--qrels_file", type=str, required=True, help="Path to qrels JSON file"
+        "--qrels_file",
+        type=str,
+        required=True,
+        help="Path to qrels file (.json, .jsonl or .tsv)",
     )
     parser.add_argument(
         "--index_name", type=str, required=True, help="Name of the index to search"
@@ -158,7 +307,25 @@ if __name__ == "__main__":
         help="Field name for embedding",
     )
     parser.add_argument(
-        "--max_workers", type=int, default=20, help="Number of concurrent workers"
+        "--max_workers",
+        type=int,
+        default=20,
+        help="Maximum number of in-flight queries",
+    )
+    parser.add_argument(
+        "--target_qps",
+        type=float,
+        default=None,
+        help="Queries started per second, runs as fast as possible if not set",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=30, help="Per-request timeout in seconds"
+    )
+    parser.add_argument(
+        "--max_retries",
+        type=int,
+        default=3,
+        help="Retries per query for transient errors",
     )
     parser.add_argument(
         "--use_aws_auth", action="store_true", help="Whether to use AWS authentication"
@@ -167,19 +334,28 @@ if __name__ == "__main__":
     parser.add_argument(
         "--query_type", type=str, default="neural_sparse", help="Query type"
     )
+    parser.add_argument(
+        "--results_db",
+        type=str,
+        default=None,
+        help="Record the run in this results store (SQLite file)",
+    )
     args = parser.parse_args()
     print(args)
+    profile_from_env("search_relevance")
 
     try:
         # Initialize OpenSearch client
         client = get_os_client(use_aws_auth=args.use_aws_auth, region=args.region)
 
-        # Load queries and qrels
-        queries, qrels = load_queries_and_qrels(args.queries_file, args.qrels_file)
-        print(f"Loaded {len(queries)} queries and {len(qrels)} qrels")
+        # Load qrels, queries are streamed while the searches are running
+        with stage("load_qrels"):
+            qrels = CompactQrels.from_file(args.qrels_file)
+        print(f"Loaded {qrels.num_judgements} judgements for {len(qrels)} queries")
+        queries = stream_judged_queries(args.queries_file, qrels)
 
         # Evaluate search relevance
-        ndcg, map_, recall, precision = evaluate_search_relevance(
+        ndcg, map_, recall, precision, summary = evaluate_search_relevance(
             client=client,
             index_name=args.index_name,
             queries=queries,
@@ -187,11 +363,26 @@ if __name__ == "__main__":
             embedding_field=args.embedding_field,
             max_workers=args.max_workers,
             query_type=args.query_type,
+            target_qps=args.target_qps,
+            timeout=args.timeout,
+            max_retries=args.max_retries,
         )
 
         # Print results
         print("\nEvaluation Results:")
         print(f"NDCG@10: {ndcg['NDCG@10']}")
+        print_stage_report()
+
+        if args.results_db:
+            latencies = summary.pop("latencies_ms")
+            summary.pop("target_qps")
+            record_run(
+                args.results_db,
+                "search_relevance",
+                vars(args),
+                {**ndcg, **map_, **recall, **precision, **summary},
+                {"latency_ms": latencies},
+            )
 
     except KeyboardInterrupt:
         print("\nEvaluation interrupted by user")
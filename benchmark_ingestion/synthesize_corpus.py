@@ -0,0 +1,346 @@
+"""
+Generate an arbitrarily large synthetic corpus, with matching queries and qrels, from
+the vocabulary and document lengths of a small seed corpus.
+
+Words are drawn from the seed unigram distribution and document lengths from the seed
+length distribution, so term statistics and document sizes look like the seed corpus
+at any scale. To stay fast at 10M-1B documents, documents are composed of chunks of
+--chunk_words words drawn once per worker (--chunk_words 1 draws every word).
+Every shard is generated by one worker process and streamed to disk together with
+its .offset file for run_bulk.py. Queries are built from the words of every n-th
+document, which is their only relevant document in the qrels.
+
+Usage:
+python synthesize_corpus.py --seed_file nfcorpus.jsonl --num_docs 100000000 --num_shards 32
+python synthesize_corpus.py --seed_file nfcorpus.jsonl --num_docs 1000000 --sparse_tokens 128
+"""
+
+import argparse
+import csv
+import gzip
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from bisect import bisect_left
+from collections import Counter
+from itertools import accumulate
+from pathlib import Path
+
+from prepare_corpus import offset_file_name, shard_file_name
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from benchmark_common import jsoncodec
+
+
+class SeedModel:
+    """Unigram word distribution and document lengths of a seed corpus"""
+
+    def __init__(self, vocab, counts, lengths):
+        self.vocab = vocab
+        self.cum_weights = list(accumulate(counts))
+        self.lengths = lengths
+        total = self.cum_weights[-1]
+        # rarer words carry more weight in sparse vectors and queries
+        self.idf = {
+            word: math.log(total / count) + 1.0 for word, count in zip(vocab, counts)
+        }
+
+    @classmethod
+    def from_file(cls, seed_file, text_field="text", max_docs=100000):
+        """
+        Read a seed corpus: a JSONL file with the text in `text_field`, or a plain text
+        file with one document per non-empty line.
+        """
+        counts = Counter()
+        lengths = []
+        with open(seed_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                text = line
+                if seed_file.endswith(".jsonl"):
+                    text = jsoncodec.loads(line).get(text_field) or ""
+                words = text.split()
+                if not words:
+                    continue
+                counts.update(words)
+                lengths.append(len(words))
+                if len(lengths) >= max_docs:
+                    break
+        if not lengths:
+            raise ValueError(f"No documents with text in {seed_file}")
+        vocab, word_counts = zip(*counts.most_common())
+        return cls(list(vocab), list(word_counts), lengths)
+
+    def describe(self):
+        lengths = sorted(self.lengths)
+        return (
+            f"{len(self.vocab)} distinct words, {len(lengths)} documents of "
+            f"{lengths[0]}-{lengths[-1]} words (median {lengths[len(lengths) // 2]})"
+        )
+
+
+def sparse_vector(words, idf, num_tokens, vocab, cum_weights, rng):
+    """
+    Synthetic sparse vector of exactly `num_tokens` tokens (fewer only if the vocabulary
+    is smaller): the document words weighted by (1 + log tf) * idf, plus expansion
+    words from the vocabulary with low weights, as a learned sparse encoder produces.
+    """
+    weights = {
+        word: (1.0 + math.log(tf)) * idf[word] for word, tf in Counter(words).items()
+    }
+    if len(weights) > num_tokens:
+        top = sorted(weights.items(), key=lambda item: -item[1])[:num_tokens]
+        weights = dict(top)
+    attempts = 0
+    while len(weights) < num_tokens and attempts < num_tokens * 10:
+        word = rng.choices(vocab, cum_weights=cum_weights)[0]
+        weights.setdefault(word, idf[word] * rng.uniform(0.05, 0.3))
+        attempts += 1
+    scale = 3.0 / max(weights.values())
+    return {word: round(weight * scale, 4) for word, weight in weights.items()}
+
+
+def build_query(words, idf, query_words, rng):
+    """Distinct words of a document, sampled with a preference for rare words"""
+    distinct = list(dict.fromkeys(words))
+    size = min(len(distinct), rng.randint(*query_words))
+    cum_weights = list(accumulate(idf[word] for word in distinct))
+    chosen = []
+    while len(chosen) < size:
+        word = distinct[bisect_left(cum_weights, rng.random() * cum_weights[-1])]
+        if word not in chosen:
+            chosen.append(word)
+    return chosen
+
+
+def generate_shard(task):
+    """
+    Generate the documents of one shard, runs in a worker process.
+
+    Returns:
+        tuple: (shard, documents written, queries [(query_id, doc_id, words)])
+    """
+    args, model, shard, first_doc, num_docs = task
+    rng = random.Random(args.seed * 1000003 + shard)
+    vocab, cum_weights = model.vocab, model.cum_weights
+    chunks = [
+        tuple(rng.choices(vocab, cum_weights=cum_weights, k=args.chunk_words))
+        for _ in range(args.chunk_pool_size)
+    ]
+    chunk_texts = [" ".join(chunk) for chunk in chunks]
+    query_every = max(1, args.num_docs // args.num_queries) if args.num_queries else 0
+
+    shard_file = shard_file_name(args.output, shard, args.num_shards, args.compress)
+    opener = gzip.open if args.compress else open
+    queries = []
+    position = 0
+    with opener(shard_file, "wb") as f:
+        offsets = None if args.compress else open(offset_file_name(shard_file), "w")
+        try:
+            for start in range(first_doc, first_doc + num_docs, args.batch_size):
+                lines = []
+                line_offsets = []
+                for doc_number in range(
+                    start, min(start + args.batch_size, first_doc + num_docs)
+                ):
+                    length = rng.choice(model.lengths) * args.length_scale
+                    length = max(1, round(length))
+                    full, rest = divmod(length, args.chunk_words)
+                    picked = rng.choices(range(len(chunks)), k=full + (rest > 0))
+                    parts = [chunk_texts[i] for i in picked[:full]]
+                    if rest:
+                        parts.append(" ".join(chunks[picked[-1]][:rest]))
+                    doc_id = f"{args.id_prefix}{doc_number}"
+                    doc = {"id": doc_id, "text": " ".join(parts)}
+
+                    query_number = None
+                    if query_every and doc_number % query_every == 0:
+                        query_number = doc_number // query_every
+                        if query_number >= args.num_queries:
+                            query_number = None
+                    if args.sparse_tokens or query_number is not None:
+                        words = [word for i in picked[:full] for word in chunks[i]]
+                        if rest:
+                            words.extend(chunks[picked[-1]][:rest])
+                    if args.sparse_tokens:
+                        doc[args.sparse_field] = sparse_vector(
+                            words,
+                            model.idf,
+                            args.sparse_tokens,
+                            vocab,
+                            cum_weights,
+                            rng,
+                        )
+                    if query_number is not None:
+                        query = build_query(words, model.idf, args.query_words, rng)
+                        queries.append((f"q{query_number}", doc_id, query))
+
+                    line = jsoncodec.dumpb(doc) + b"\n"
+                    line_offsets.append(f"{position}\n")
+                    position += len(line)
+                    lines.append(line)
+                f.write(b"".join(lines))
+                if offsets is not None:
+                    offsets.write("".join(line_offsets))
+        finally:
+            if offsets is not None:
+                offsets.close()
+    return shard, num_docs, queries
+
+
+def write_queries_and_qrels(output, queries, model, sparse_tokens):
+    """
+    Write the queries as JSONL, usable by search_relevance.py and as the query data set
+    of the search workload, and their qrels as TSV.
+    """
+    rng = random.Random(0)
+    queries_file = f"{output}-queries.jsonl"
+    with open(queries_file, "wb") as f:
+        for query_id, _, words in queries:
+            query = {"_id": query_id, "text": " ".join(words)}
+            if sparse_tokens:
+                query["sparse_embedding"] = sparse_vector(
+                    words, model.idf, len(words), model.vocab, model.cum_weights, rng
+                )
+            f.write(jsoncodec.dumpb(query) + b"\n")
+
+    qrels_file = f"{output}-qrels.tsv"
+    with open(qrels_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+        writer.writerow(["query-id", "corpus-id", "score"])
+        writer.writerows((query_id, doc_id, 1) for query_id, doc_id, _ in queries)
+    return queries_file, qrels_file
+
+
+def parse_range(value):
+    """"3,10" -> (3, 10), "5" -> (5, 5)"""
+    bounds = [int(bound) for bound in value.split(",")]
+    return bounds[0], bounds[-1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic corpus, queries and qrels from a seed corpus"
+    )
+    parser.add_argument(
+        "--seed_file",
+        type=str,
+        required=True,
+        help="Seed corpus JSONL (e.g. from prepare_corpus.py), or text with one "
+        "document per line",
+    )
+    parser.add_argument(
+        "--text_field", type=str, default="text", help="Text field of the seed JSONL"
+    )
+    parser.add_argument(
+        "--max_seed_docs", type=int, default=100000, help="Seed documents to read"
+    )
+    parser.add_argument(
+        "--num_docs", type=int, required=True, help="Number of documents to generate"
+    )
+    parser.add_argument(
+        "--output", type=str, default="synthetic", help="Output file prefix"
+    )
+    parser.add_argument(
+        "--num_shards", type=int, default=1, help="Number of output JSONL files"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Worker processes, each generates whole shards",
+    )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="Write gzip JSONL, without offset files as run_bulk.py cannot seek in it",
+    )
+    parser.add_argument(
+        "--length_scale",
+        type=float,
+        default=1.0,
+        help="Multiply the seed document lengths, e.g. 4 for longer documents",
+    )
+    parser.add_argument(
+        "--chunk_words",
+        type=int,
+        default=16,
+        help="Words per pre-drawn chunk, 1 draws every word independently (slower)",
+    )
+    parser.add_argument(
+        "--chunk_pool_size",
+        type=int,
+        default=65536,
+        help="Distinct chunks per worker",
+    )
+    parser.add_argument(
+        "--sparse_tokens",
+        type=int,
+        default=0,
+        help="Add a synthetic sparse vector of this many tokens to every document",
+    )
+    parser.add_argument(
+        "--sparse_field",
+        type=str,
+        default="text_sparse",
+        help="Document field of the sparse vector",
+    )
+    parser.add_argument(
+        "--num_queries", type=int, default=1000, help="Number of queries, 0 for none"
+    )
+    parser.add_argument(
+        "--query_words",
+        type=parse_range,
+        default=(3, 10),
+        help='Words per query, "min,max" (default: 3,10)',
+    )
+    parser.add_argument(
+        "--id_prefix", type=str, default="doc", help="Prefix of the document ids"
+    )
+    parser.add_argument(
+        "--batch_size", type=int, default=1000, help="Documents per write"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+    print(args)
+
+    start = time.perf_counter()
+    model = SeedModel.from_file(args.seed_file, args.text_field, args.max_seed_docs)
+    print(f"Seed corpus: {model.describe()}")
+
+    # contiguous document ranges of (almost) equal size per shard
+    bounds = [
+        shard * args.num_docs // args.num_shards for shard in range(args.num_shards + 1)
+    ]
+    tasks = [
+        (args, model, shard, bounds[shard], bounds[shard + 1] - bounds[shard])
+        for shard in range(args.num_shards)
+    ]
+
+    context = multiprocessing.get_context("spawn")
+    queries = []
+    written = 0
+    with context.Pool(min(args.workers, args.num_shards)) as pool:
+        for shard, docs, shard_queries in pool.imap_unordered(generate_shard, tasks):
+            written += docs
+            queries.extend(shard_queries)
+            elapsed = time.perf_counter() - start
+            print(
+                f"Shard {shard}: {docs} documents, {written}/{args.num_docs} "
+                f"({written / elapsed:.0f} docs/sec)"
+            )
+
+    if queries:
+        queries.sort(key=lambda query: int(query[0][1:]))
+        queries_file, qrels_file = write_queries_and_qrels(
+            args.output, queries, model, args.sparse_tokens
+        )
+        print(f"Wrote {len(queries)} queries to {queries_file}")
+        print(f"Wrote {len(queries)} judgements to {qrels_file}")
+
+    elapsed = time.perf_counter() - start
+    print(f"Generated {written} documents in {elapsed:.1f}s")
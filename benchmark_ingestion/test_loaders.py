@@ -0,0 +1,80 @@
+import pytest
+
+from loaders import CompactQrels, iter_qrels, iter_queries
+
+QUERIES = [("q1", "what is bm25"), ("q2", "sparse retrieval")]
+QRELS = [("q1", "d1", 1), ("q2", "d3", 2), ("q1", "d2", 0), ("q3", "d1", 1)]
+
+
+def write_queries(tmp_path, file_format):
+    path = tmp_path / f"queries.{file_format}"
+    if file_format == "json":
+        path.write_text('{"q1": "what is bm25", "q2": "sparse retrieval"}')
+    elif file_format == "jsonl":
+        path.write_text(
+            '{"_id": "q1", "text": "what is bm25"}\n\n'
+            '{"id": "q2", "text": "sparse retrieval"}\n'
+        )
+    else:
+        path.write_text("query-id\ttext\nq1\twhat is bm25\nq2\tsparse retrieval\n")
+    return str(path)
+
+
+def write_qrels(tmp_path, file_format):
+    path = tmp_path / f"qrels.{file_format}"
+    if file_format == "json":
+        path.write_text('{"q1": {"d1": 1, "d2": 0}, "q2": {"d3": 2}, "q3": {"d1": 1}}')
+    elif file_format == "jsonl":
+        path.write_text(
+            "".join(
+                '{"query-id": "%s", "corpus-id": "%s", "score": %d}\n' % qrel
+                for qrel in QRELS
+            )
+        )
+    else:
+        path.write_text(
+            "query-id\tcorpus-id\tscore\n"
+            + "".join("%s\t%s\t%d\n" % qrel for qrel in QRELS)
+        )
+    return str(path)
+
+
+@pytest.mark.parametrize("file_format", ["json", "jsonl", "tsv"])
+def test_iter_queries(tmp_path, file_format):
+    assert list(iter_queries(write_queries(tmp_path, file_format))) == QUERIES
+
+
+@pytest.mark.parametrize("file_format", ["json", "jsonl", "tsv"])
+def test_iter_qrels(tmp_path, file_format):
+    assert sorted(iter_qrels(write_qrels(tmp_path, file_format))) == sorted(QRELS)
+
+
+def test_unsupported_file_format():
+    with pytest.raises(ValueError):
+        list(iter_queries("queries.csv"))
+
+
+def test_compact_qrels_match_the_nested_dicts(tmp_path):
+    qrels = CompactQrels.from_file(write_qrels(tmp_path, "tsv"))
+    assert len(qrels) == 3
+    assert qrels.num_judgements == 4
+    assert "q1" in qrels and "q4" not in qrels
+    assert list(qrels) == ["q1", "q2", "q3"]
+    assert qrels.get("q1") == {"d1": 1, "d2": 0}
+    assert qrels.get("q4", {}) == {}
+    assert qrels.to_dict() == {
+        "q1": {"d1": 1, "d2": 0},
+        "q2": {"d3": 2},
+        "q3": {"d1": 1},
+    }
+    assert qrels.to_dict(["q3", "q4"]) == {"q3": {"d1": 1}}
+
+
+def test_compact_qrels_finalize_after_adding():
+    qrels = CompactQrels()
+    for qrel in QRELS:
+        qrels.add(*qrel)
+    # get() sorts the judgements by query on first use
+    assert qrels.get("q1") == {"d1": 1, "d2": 0}
+    qrels.add("q2", "d4", 1)
+    assert qrels.get("q2") == {"d3": 2, "d4": 1}
@@ -0,0 +1,41 @@
+import pytest
+
+from pruning_sweep import parse_strategies, pareto_frontier
+
+
+def test_parse_strategies():
+    assert parse_strategies("top_k:5,10; max_ratio:0.1;") == [
+        ("none", 0),
+        ("top_k", 5.0),
+        ("top_k", 10.0),
+        ("max_ratio", 0.1),
+    ]
+
+
+@pytest.mark.parametrize("spec", ["top_k:5;topk:10", "none:1", "top_k", "top_k:"])
+def test_parse_strategies_rejects_invalid_settings(spec):
+    with pytest.raises(ValueError):
+        parse_strategies(spec)
+
+
+def row(name, latency, ndcg):
+    return {"name": name, "latency_p90_ms": latency, "ndcg@10": ndcg}
+
+
+def test_pareto_frontier():
+    rows = [
+        row("slow_best", 30.0, 0.40),
+        row("fast_worse", 10.0, 0.30),
+        row("dominated", 20.0, 0.25),
+        row("tie_worse", 10.0, 0.20),
+    ]
+    frontier = pareto_frontier(rows, "latency_p90_ms", "ndcg@10")
+    assert [r["name"] for r in frontier] == ["fast_worse", "slow_best"]
+    assert [r["pareto"] for r in rows] == [True, True, False, False]
+
+
+def test_pareto_frontier_skips_settings_without_latency():
+    rows = [row("measured", 10.0, 0.3), row("all_failed", None, 0.0)]
+    frontier = pareto_frontier(rows, "latency_p90_ms", "ndcg@10")
+    assert [r["name"] for r in frontier] == ["measured"]
+    assert rows[1]["pareto"] is False
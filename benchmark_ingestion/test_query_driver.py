@@ -0,0 +1,50 @@
+import threading
+import time
+
+from query_driver import RateControlledDriver, percentile
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([7], 90) == 7
+    assert percentile([], 50) is None
+
+
+def test_driver_completes_every_item():
+    results = {}
+    driver = RateControlledDriver(lambda item: item * 2, concurrency=4)
+    summary = driver.run(
+        range(50), lambda item, result, *_: results.update({item: result})
+    )
+    assert results == {item: item * 2 for item in range(50)}
+    assert summary["requests"] == 50
+    assert summary["errors"] == 0
+    assert summary["lag_p99_ms"] is None
+
+
+def test_driver_starts_requests_at_the_target_rate():
+    driver = RateControlledDriver(lambda item: item, target_qps=100, concurrency=4)
+    start = time.perf_counter()
+    summary = driver.run(range(21), lambda *_: None)
+    # the 21st request is scheduled 200ms after the first one
+    assert time.perf_counter() - start >= 0.2
+    assert summary["achieved_qps"] <= 110
+
+
+def test_driver_bounds_requests_in_flight():
+    lock = threading.Lock()
+    in_flight = [0, 0]
+
+    def request(item):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        time.sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+
+    RateControlledDriver(request, concurrency=3).run(range(30), lambda *_: None)
+    assert in_flight[1] == 3
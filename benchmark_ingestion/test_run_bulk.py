@@ -0,0 +1,34 @@
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import run_bulk
+
+
+@pytest.mark.parametrize("failed_ranks", [set(), {1}])
+def test_run_processes_returns_the_exit_status_of_every_rank(
+    monkeypatch, failed_ranks
+):
+    popen = subprocess.Popen
+
+    def fake_bulk(cmd):
+        # exits with 3 on the failed ranks instead of running bulk.py
+        rank = int(cmd[cmd.index("--rank") + 1])
+        code = 3 if rank in failed_ranks else 0
+        return popen([sys.executable, "-c", f"raise SystemExit({code})"])
+
+    monkeypatch.setattr(subprocess, "Popen", fake_bulk)
+    # keep the Ctrl+C handler of pytest
+    monkeypatch.setattr(run_bulk.signal, "signal", lambda signum, handler: None)
+    args = SimpleNamespace(
+        total_ranks=3,
+        index_name="index",
+        file_name="corpus",
+        bulk_size=10,
+        region="us-east-1",
+        use_aws_auth=False,
+    )
+    return_codes = run_bulk.run_processes(args)
+    assert return_codes == [3 if rank in failed_ranks else 0 for rank in range(3)]
@@ -0,0 +1,34 @@
+import pytest
+
+from loaders import CompactQrels
+from search_relevance import evaluate_results
+
+
+def compact(qrels):
+    compact_qrels = CompactQrels()
+    for query_id, docs in qrels.items():
+        for doc_id, score in docs.items():
+            compact_qrels.add(query_id, doc_id, score)
+    return compact_qrels.finalize()
+
+
+QRELS = {"q1": {"d1": 1}, "q2": {"d2": 1}}
+
+
+@pytest.mark.parametrize("qrels", [QRELS, compact(QRELS)])
+def test_unanswered_and_unjudged_queries(qrels):
+    pytest.importorskip("beir")
+    # q1 is perfect, q2 failed and scores zero, q3 has no judgements and is ignored
+    results = {"q1": {"d1": 1.0}, "q2": {}, "q3": {"d3": 1.0}}
+    ndcg, _, recall, _ = evaluate_results(qrels, results, [10])
+    assert ndcg["NDCG@10"] == pytest.approx(0.5)
+    assert recall["Recall@10"] == pytest.approx(0.5)
+
+
+def test_no_answered_judged_query_scores_zero():
+    results = {"q2": {}, "q3": {"d3": 1.0}}
+    ndcg, map_, recall, precision = evaluate_results(QRELS, results, [10])
+    assert ndcg == {"NDCG@10": 0.0}
+    assert map_ == {"MAP@10": 0.0}
+    assert recall == {"Recall@10": 0.0}
+    assert precision == {"P@10": 0.0}
@@ -1,5 +1,9 @@
 import os
-from opensearchpy import OpenSearch
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from benchmark_common.jsoncodec import opensearch_serializer
 
 
 def get_aws_auth(region="us-east-1", service="aoss"):
@@ -30,6 +34,9 @@ def get_os_client(use_aws_auth=False, region="us-east-1", timeout=1000):
     Returns:
         OpenSearch client instance
     """
+    # imported here, so tools that only parse arguments or files start fast
+    from opensearchpy import OpenSearch
+
     if use_aws_auth:
         from opensearchpy import RequestsHttpConnection
 
@@ -41,10 +48,13 @@ def get_os_client(use_aws_auth=False, region="us-east-1", timeout=1000):
             verify_certs=True,
             connection_class=RequestsHttpConnection,
             timeout=timeout,
+            serializer=opensearch_serializer(),
         )
     else:
         client = OpenSearch(
-            hosts=os.environ.get("HOSTS", "localhost:9200"), timeout=timeout
+            hosts=os.environ.get("HOSTS", "localhost:9200"),
+            timeout=timeout,
+            serializer=opensearch_serializer(),
         )
 
     return client
@@ -7,71 +7,379 @@ python automated_benchmark.py --endpoint-name your-endpoint --params "[(1,2),(2,
 """
 
 import argparse
+import bisect
 import json
+import math
 import os
+import shlex
 import subprocess
+import sys
 import time
 import csv
 from pathlib import Path
-import numpy as np
 import ast
 from datetime import datetime
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from benchmark_common.results_store import record_run
 
-def parse_metrics_file(metrics_file):
+
+PERCENTILES = [50, 90, 99, 99.9]
+
+
+def merge_histograms(*histograms):
+    """
+    Merge Locust response time histograms ({response_time_ms: count}).
+
+    Histograms of different workers or runs of the same test can be merged before
+    computing percentiles, which is exact unlike averaging per-run percentiles.
+    """
+    merged = {}
+    for histogram in histograms:
+        for time_ms, count in histogram.items():
+            time_ms = float(time_ms)
+            merged[time_ms] = merged.get(time_ms, 0) + int(count)
+    return merged
+
+
+def histogram_percentiles(histogram, percentiles=PERCENTILES):
+    """
+    Compute percentiles directly from a {response_time_ms: count} histogram.
+
+    Uses the same linear interpolation as np.percentile on the expanded samples, in
+    memory proportional to the number of distinct response times.
+
+    Returns:
+        dict: {percentile: value}, empty if the histogram has no samples
+    """
+    values = sorted((float(t), int(c)) for t, c in histogram.items() if int(c) > 0)
+    total = sum(count for _, count in values)
+    if total == 0:
+        return {}
+
+    # cumulative[i] is the number of samples with a value <= values[i]
+    cumulative = []
+    running = 0
+    for _, count in values:
+        running += count
+        cumulative.append(running)
+
+    def value_at(rank):
+        return values[bisect.bisect_right(cumulative, rank)][0]
+
+    result = {}
+    for pct in percentiles:
+        position = pct / 100 * (total - 1)
+        lower = math.floor(position)
+        lower_value = value_at(lower)
+        upper_value = value_at(min(lower + 1, total - 1))
+        result[pct] = lower_value + (upper_value - lower_value) * (position - lower)
+    return result
+
+
+def latency_summary(histogram):
+    """P50/P90/P99/P99.9 and max latency of a histogram, with CSV-friendly keys."""
+    percentiles = histogram_percentiles(histogram)
+    if not percentiles:
+        return None
+    summary = {
+        f"p{pct:g}_latency_ms".replace(".", "_"): value
+        for pct, value in percentiles.items()
+    }
+    summary["max_latency_ms"] = max(float(t) for t, c in histogram.items() if c)
+    return summary
+
+
+def load_timeseries(timeseries_file):
+    """
+    Load the per-second series written by locust_benchmark_sm.py --timeseries-file.
+
+    The first and last seconds are partial and dropped.
+
+    Returns:
+        list: One dict per second with second (since the first one), requests,
+            failures and response_times (a histogram)
+    """
+    with open(timeseries_file, "r") as f:
+        data = json.load(f)
+    if not data:
+        return []
+    first = min(int(key) for key in data)
+    last = max(int(key) for key in data)
+    empty = {"requests": 0, "failures": 0, "response_times": {}}
+    return [
+        {"second": second - first, **data.get(str(second), empty)}
+        for second in range(first + 1, last)
+    ]
+
+
+def mser_truncation(values, batch_size=5):
+    """
+    Warm-up length of a series with the MSER-5 rule.
+
+    Picks the number of leading batch means to drop that minimizes the variance of the
+    mean of the remaining ones, searched over the first half of the series.
+
+    Returns:
+        int: Number of leading values to drop
+    """
+    batches = [
+        sum(values[i : i + batch_size]) / batch_size
+        for i in range(0, len(values) - batch_size + 1, batch_size)
+    ]
+    if len(batches) < 2:
+        return 0
+    best, best_statistic = 0, math.inf
+    for drop in range(len(batches) // 2 + 1):
+        rest = batches[drop:]
+        mean = sum(rest) / len(rest)
+        statistic = sum((x - mean) ** 2 for x in rest) / len(rest) ** 2
+        if statistic < best_statistic:
+            best, best_statistic = drop, statistic
+    return best * batch_size
+
+
+def steady_state_series(series):
+    """
+    Add per-second RPS and latency percentiles to a series and mark its steady state.
+
+    The warm-up ends when both the RPS and the P90 latency have stabilized (MSER-5),
+    e.g. after the user ramp, endpoint autoscaling or model warm-up.
+
+    Returns:
+        list: The series rows with rps, p50/p90/p99_latency_ms and steady columns
+    """
+    rows = []
+    for second in series:
+        percentiles = histogram_percentiles(second["response_times"], [50, 90, 99])
+        rows.append(
+            {
+                "second": second["second"],
+                "rps": second["requests"],
+                "failures": second["failures"],
+                "p50_latency_ms": percentiles.get(50),
+                "p90_latency_ms": percentiles.get(90),
+                "p99_latency_ms": percentiles.get(99),
+                "response_times": second["response_times"],
+            }
+        )
+    # seconds without a successful request carry the previous latency forward
+    p90 = []
+    for row in rows:
+        if row["p90_latency_ms"] is not None:
+            p90.append(row["p90_latency_ms"])
+        else:
+            p90.append(p90[-1] if p90 else 0.0)
+    warmup = max(mser_truncation([row["rps"] for row in rows]), mser_truncation(p90))
+    for i, row in enumerate(rows):
+        row["steady"] = i >= warmup
+    return rows
+
+
+def parse_metrics_file(metrics_file, timeseries_file=None):
     """
-    Parse the metrics JSON file and return RPS as well as P90 latency.
+    Parse the metrics JSON file and return RPS as well as the latency summary.
+
+    The stats of all entries in the file are merged, so the file of a distributed run
+    and of a single process are handled the same way. With a per-second series, RPS and
+    latency are measured over its steady state only; without, over the run after a fixed
+    5 second warm-up (latency over the whole run).
+
+    Returns:
+        tuple: (rps, latency summary, series rows or None)
     """
+    if timeseries_file is not None and Path(timeseries_file).exists():
+        rows = steady_state_series(load_timeseries(timeseries_file))
+        window = [row for row in rows if row["steady"]]
+        if not window:
+            return None, None, None
+        rps = sum(row["rps"] for row in window) / len(window)
+        latency = latency_summary(
+            merge_histograms(*(row["response_times"] for row in window))
+        )
+        if latency is not None:
+            latency["steady_start_s"] = window[0]["second"]
+            latency["steady_duration_s"] = len(window)
+        return rps, latency, rows
+
+    rps, latency = parse_summary_metrics_file(metrics_file)
+    return rps, latency, None
+
+
+def parse_summary_metrics_file(metrics_file):
+    """RPS after a fixed 5 second warm-up and latency of the whole run"""
     try:
         with open(metrics_file, "r") as f:
             data = json.load(f)
+        # the TTFB and Decode events of the client are not endpoint requests
+        data = [m for m in data if m.get("method") == "InvokeEndpoint"]
 
         if not data or len(data) == 0:
             return None, None
 
-        metrics = data[0]  # take the first element
-
         # Calculate RPS (exclude first 5 seconds, then sum all values divided by run_time)
-        rps_per_sec = metrics.get("num_reqs_per_sec", {})
+        start_time = min(metrics.get("start_time", 0) for metrics in data)
+        last_request = max(
+            metrics.get("last_request_timestamp") or 0 for metrics in data
+        )
+        rps_per_sec = {}
+        for metrics in data:
+            for key, value in metrics.get("num_reqs_per_sec", {}).items():
+                rps_per_sec[key] = rps_per_sec.get(key, 0) + int(value)
         if not rps_per_sec:
             return None, None
 
         # Filter out data points within 5 seconds of start time
-        for key, value in list(rps_per_sec.items()):
-            if float(key) - metrics.get("start_time", 0) <= 5:
-                del rps_per_sec[key]
-            else:
-                rps_per_sec[key] = int(value)
-
-        rps_values = list(rps_per_sec.values())
-        run_time = metrics.get("last_request_timestamp") - metrics.get("start_time")
+        rps_values = [
+            value for key, value in rps_per_sec.items() if float(key) - start_time > 5
+        ]
+        run_time = last_request - start_time
         rps = sum(rps_values) / run_time
 
-        # Calculate P90 latency
-        response_times = metrics.get("response_times", {})
-        if not response_times:
-            return rps, None
+        # Calculate latency percentiles from the response time histogram
+        response_times = merge_histograms(
+            *(metrics.get("response_times", {}) for metrics in data)
+        )
+        return rps, latency_summary(response_times)
 
-        # Expand response-time histogram into raw samples
-        all_response_times = []
-        for time_ms, count in response_times.items():
-            all_response_times.extend([float(time_ms)] * count)
+    except Exception as e:
+        print(f"Error parsing metrics file: {e}")
+        return None, None
 
-        if not all_response_times:
-            return rps, None
 
-        p90_latency = np.percentile(all_response_times, 90)
+def parse_document_metrics(metrics_file):
+    """
+    Per-document throughput and latency of a client-side batching run.
 
-        return rps, p90_latency
+    Computed over the whole run from the "Document" entries, which are only present
+    with --client-batch-max-docs.
 
-    except Exception as e:
-        print(f"Error parsing metrics file: {e}")
-        return None, None
+    Returns:
+        dict: docs_per_sec and doc_p50/p90/p99_latency_ms, empty without documents
+    """
+    with open(metrics_file, "r") as f:
+        data = [m for m in json.load(f) if m.get("method") == "Document"]
+    documents = sum(m.get("num_requests", 0) for m in data)
+    if not documents:
+        return {}
+    start_time = min(m.get("start_time", 0) for m in data)
+    last_request = max(m.get("last_request_timestamp") or 0 for m in data)
+    percentiles = histogram_percentiles(
+        merge_histograms(*(m.get("response_times", {}) for m in data)), [50, 90, 99]
+    )
+    return {
+        "docs_per_sec": documents / max(last_request - start_time, 1),
+        **{f"doc_p{pct}_latency_ms": value for pct, value in percentiles.items()},
+    }
+
+
+def monitor_cpu(processes, until, interval=1.0):
+    """
+    Sample the CPU usage of load generator processes until `until` exits.
+
+    Returns:
+        list: Average CPU usage in percent of each process over the run
+    """
+    import psutil
+
+    monitored = [psutil.Process(process.pid) for process in processes]
+    totals = [0.0] * len(monitored)
+    samples = 0
+    for process in monitored:
+        process.cpu_percent(None)
+    while until.poll() is None:
+        time.sleep(interval)
+        for i, process in enumerate(monitored):
+            try:
+                totals[i] += process.cpu_percent(None)
+            except psutil.NoSuchProcess:
+                pass
+        samples += 1
+    return [total / samples if samples else 0.0 for total in totals]
+
+
+def run_locust_processes(cmd, run_args, workers, log_file):
+    """
+    Run locust as a single process, or as a master with `workers` local worker processes.
 
+    A gevent process is single threaded, so a single process tops out at one core of
+    request generation. The master merges the stats of its workers into the JSON file.
 
-def run_locust_test(endpoint_name, size_per_doc, request_size, users, run_time=30):
+    Args:
+        cmd: locust command with the options of every process
+        run_args: Options of the process running the test (--headless, --json-file)
+        workers: Number of worker processes, 0 for a single process
+        log_file: File the output of all processes is written to
+
+    Returns:
+        tuple: (return code, average CPU usage of each load generating process)
+    """
+    with open(log_file, "w") as log:
+        if workers == 0:
+            process = subprocess.Popen(
+                cmd + run_args, stdout=log, stderr=subprocess.STDOUT
+            )
+            cpu = monitor_cpu([process], process)
+            return process.wait(), cpu
+
+        master = subprocess.Popen(
+            cmd + run_args + ["--master", "--expect-workers", str(workers)],
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        worker_cmd = cmd + ["--worker", "--master-host", "127.0.0.1"]
+        worker_processes = [
+            subprocess.Popen(worker_cmd, stdout=log, stderr=subprocess.STDOUT)
+            for _ in range(workers)
+        ]
+        try:
+            cpu = monitor_cpu(worker_processes, master)
+            return master.wait(), cpu
+        finally:
+            # workers quit with the master, don't leave any behind on errors
+            for process in worker_processes:
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+
+def client_stats(workers, cpu, cpu_saturation_pct):
+    """Load generator columns of a result, warns when a generator process is CPU bound"""
+    busiest = max(cpu, default=0.0)
+    saturated = busiest >= cpu_saturation_pct
+    if saturated:
+        print(
+            f"Warning: a load generator process averaged {busiest:.0f}% CPU, the RPS "
+            "may be limited by the client, add --workers"
+        )
+    return {
+        "locust_workers": workers,
+        "client_cpu_pct": busiest,
+        "client_cpu_saturated": saturated,
+    }
+
+
+def run_locust_test(
+    endpoint_name,
+    size_per_doc,
+    request_size,
+    users,
+    run_time=30,
+    locust_args=None,
+    workers=0,
+    cpu_saturation_pct=90,
+):
     """
     Run a single locust test.
+
+    `locust_args` are extra command line options passed to locust_benchmark_sm.py,
+    e.g. the payload pool options. With `workers` > 0 the test runs distributed over a
+    master and that many local worker processes.
+
+    Returns:
+        tuple: (rps, metrics, start time, end time). The metrics are the latency
+            summary, steady state window, load generator stats and series file
     """
     docs_per_request = request_size // size_per_doc
 
@@ -89,31 +397,41 @@ def run_locust_test(endpoint_name, size_per_doc, request_size, users, run_time=3
         "locust",
         "-f",
         "locust_benchmark_sm.py",
-        "--headless",
         "--size-per-doc",
         str(size_per_doc),
         "--request-size",
         str(request_size),
         "--endpoint-name",
         endpoint_name,
+    ]
+    cmd.extend(locust_args or [])
+    timeseries_file = metrics_file + "_timeseries.json"
+    run_args = [
+        "--headless",
         "--json-file",
         metrics_file,
+        "--timeseries-file",
+        timeseries_file,
     ]
 
     print(
         f"Running test: {size_per_doc}KB/doc, {docs_per_request} docs/request, {users} users"
+        + (f", {workers} workers" if workers else "")
     )
-    print(f"Command: {' '.join(cmd)}")
+    print(f"Command: {' '.join(cmd + run_args)}")
 
     start_utc = datetime.utcnow().isoformat() + "Z"
 
     try:
         # Execute the locust command
-        result = subprocess.run(cmd, capture_output=True, text=True, cwd=".")
+        returncode, cpu = run_locust_processes(
+            cmd, run_args, workers, metrics_file + ".log"
+        )
 
-        if result.returncode != 0:
-            print(f"Locust test failed: {result.stderr}")
+        if returncode != 0:
+            print(f"Locust test failed, see {metrics_file}.log")
             return None, None, start_utc, datetime.utcnow().isoformat() + "Z"
+        client = client_stats(workers, cpu, cpu_saturation_pct)
 
         # Wait a bit to ensure the file is flushed to disk
         time.sleep(1)
@@ -121,10 +439,37 @@ def run_locust_test(endpoint_name, size_per_doc, request_size, users, run_time=3
         # Parse test results
         full_metrics_path = Path(metrics_file + ".json")
         if full_metrics_path.exists():
-            rps, p90_latency = parse_metrics_file(str(full_metrics_path))
+            rps, latency, series = parse_metrics_file(
+                str(full_metrics_path), timeseries_file
+            )
             end_utc = datetime.utcnow().isoformat() + "Z"
-            print(f"Result: RPS={rps:.2f}, P90 latency={p90_latency:.2f}ms")
-            return rps, p90_latency, start_utc, end_utc
+            if rps is None or latency is None:
+                print(f"No requests recorded in {full_metrics_path}")
+                return None, None, start_utc, end_utc
+            metrics = {
+                **latency,
+                **parse_document_metrics(str(full_metrics_path)),
+                **client,
+            }
+            if series is not None:
+                metrics["timeseries_file"] = metrics_file + "_timeseries.csv"
+                write_series(metrics["timeseries_file"], series)
+                print(
+                    f"Steady state: {latency['steady_duration_s']}s from second "
+                    f"{latency['steady_start_s']}"
+                )
+            print(
+                f"Result: RPS={rps:.2f}, P50 latency={latency['p50_latency_ms']:.2f}ms, "
+                f"P90 latency={latency['p90_latency_ms']:.2f}ms, "
+                f"P99 latency={latency['p99_latency_ms']:.2f}ms, "
+                f"client CPU={client['client_cpu_pct']:.0f}%"
+            )
+            if "docs_per_sec" in metrics:
+                print(
+                    f"Documents: {metrics['docs_per_sec']:.2f}/s, "
+                    f"P90 latency={metrics['doc_p90_latency_ms']:.2f}ms"
+                )
+            return rps, metrics, start_utc, end_utc
         else:
             print(f"Metrics file does not exist: {full_metrics_path}")
             return None, None, start_utc, datetime.utcnow().isoformat() + "Z"
@@ -134,6 +479,54 @@ def run_locust_test(endpoint_name, size_per_doc, request_size, users, run_time=3
         return None, None, start_utc, datetime.utcnow().isoformat() + "Z"
 
 
+SERIES_FIELDS = [
+    "second",
+    "rps",
+    "failures",
+    "p50_latency_ms",
+    "p90_latency_ms",
+    "p99_latency_ms",
+    "steady",
+]
+
+
+def write_series(series_file, rows):
+    """Write per-second series rows to a CSV file for plotting"""
+    with open(series_file, "w", newline="") as csvfile:
+        writer = csv.DictWriter(
+            csvfile, fieldnames=SERIES_FIELDS, extrasaction="ignore"
+        )
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+
+
+def slo_key(slo_percentile):
+    """CSV/latency summary key of an SLO percentile, e.g. 99.9 -> p99_9_latency_ms"""
+    return f"p{slo_percentile:g}_latency_ms".replace(".", "_")
+
+
+def rps_plateaued(previous, current, min_rps_gain):
+    """
+    Whether RPS stopped growing with the number of users.
+
+    The relative RPS gain is compared to the relative increase in users, so a small
+    step (e.g. 96 -> 100 users) is not mistaken for saturation: the endpoint is
+    saturated when RPS grew by less than `min_rps_gain` of the linear scaling, e.g.
+    less than 10% when the users doubled.
+    """
+    user_growth = current["users"] / previous["users"] - 1
+    gain = (current["rps"] - previous["rps"]) / previous["rps"]
+    if gain < min_rps_gain * user_growth:
+        print(
+            f"RPS gain {gain * 100:.1f}% < {min_rps_gain * 100:.0f}% of the "
+            f"{user_growth * 100:.0f}% user increase "
+            f"({previous['users']} -> {current['users']} users), endpoint saturated"
+        )
+        return True
+    return False
+
+
 def test_parameter_set(
     endpoint_name,
     size_per_doc,
@@ -141,45 +534,155 @@ def test_parameter_set(
     start_users=4,
     step_size=4,
     run_time=30,
+    strategy="adaptive",
+    slo_percentile=90,
+    slo_ms=400,
+    min_rps_gain=0.1,
+    max_users=1024,
+    locust_args=None,
+    workers=0,
+    cpu_saturation_pct=90,
 ):
     """
-    Test a single parameter set, increasing the number of users until the RPS gain is below 10 %.
+    Test a single parameter set, searching for the number of users with the max RPS under the SLO.
+
+    Stops increasing users when the SLO percentile latency exceeds `slo_ms` or when the
+    RPS stops growing with the users (see `rps_plateaued`, the endpoint is saturated).
+
+    - linear: start at `start_users` and add `step_size` users per run.
+    - adaptive: double the users until a stop condition is hit, then bisect between the
+      last passing and the first violating user count down to `step_size` users.
     """
     print(f"\nStarting parameter set test: ({size_per_doc}KB, {docs_per_request} docs)")
 
     results = []
-    current_users = start_users
+    request_size = size_per_doc * docs_per_request
+    latency_key = slo_key(slo_percentile)
 
-    while True:
-        request_size = size_per_doc * docs_per_request
-        rps, p90_latency, start_utc, end_utc = run_locust_test(
-            endpoint_name, size_per_doc, request_size, current_users, run_time
+    def measure(users):
+        """Run one test, return its result or None if it failed"""
+        rps, metrics, start_utc, end_utc = run_locust_test(
+            endpoint_name,
+            size_per_doc,
+            request_size,
+            users,
+            run_time,
+            locust_args,
+            workers,
+            cpu_saturation_pct,
         )
+        if rps is None or metrics is None:
+            print(f"Test failed with {users} users")
+            return None
+        result = {
+            "size_per_doc_kb": size_per_doc,
+            "docs_per_request": docs_per_request,
+            "users": users,
+            "rps": rps,
+            **metrics,
+            "within_slo": metrics[latency_key] <= slo_ms,
+            "start_time_utc": start_utc,
+            "end_time_utc": end_utc,
+        }
+        results.append(result)
+        if not result["within_slo"]:
+            print(
+                f"P{slo_percentile:g} latency ({metrics[latency_key]:.1f}ms) > {slo_ms}ms"
+            )
+        return result
+
+    last_pass = None
+    first_fail_users = None
+    current_users = start_users
 
-        if rps is None or p90_latency is None:
-            print(f"Test failed, end test with {current_users} users")
+    # ramp: linear steps or doubling until the SLO is violated or RPS stops growing
+    while current_users <= max_users:
+        result = measure(current_users)
+        if result is None or not result["within_slo"]:
+            first_fail_users = current_users
+            break
+        if last_pass is not None and rps_plateaued(last_pass, result, min_rps_gain):
+            return results
+        last_pass = result
+        if strategy == "linear":
+            current_users += step_size
+        else:
+            current_users *= 2
+
+    if strategy == "linear" or last_pass is None or first_fail_users is None:
+        return results
+
+    # bisection between the last passing and the first violating number of users
+    low, high = last_pass["users"], first_fail_users
+    while high - low > step_size:
+        middle = (low + high) // 2
+        result = measure(middle)
+        if result is None or not result["within_slo"]:
+            high = middle
+            continue
+        if rps_plateaued(last_pass, result, min_rps_gain):
             break
+        last_pass = result
+        low = middle
 
-        results.append(
-            {
-                "size_per_doc_kb": size_per_doc,
-                "docs_per_request": docs_per_request,
-                "users": current_users,
-                "rps": rps,
-                "p90_latency_ms": p90_latency,
-                "start_time_utc": start_utc,
-                "end_time_utc": end_utc,
-            }
-        )
+    return results
 
-        # Stop if P90 latency exceeds 400ms
-        if p90_latency > 400:
-            print(f"P90 latency ({p90_latency:.1f}ms) > 400ms, stopping user increase")
-            break
 
-        current_users += step_size
+def save_timeseries(output, results):
+    """Combine the per-second series of all tests into one CSV next to the summary"""
+    tests = [r for r in results if r.get("timeseries_file")]
+    if not tests:
+        return
+    series_file = str(Path(output).with_suffix("")) + "_timeseries.csv"
+    with open(series_file, "w", newline="") as csvfile:
+        columns = ["size_per_doc_kb", "docs_per_request", "users"]
+        writer = csv.DictWriter(csvfile, fieldnames=columns + SERIES_FIELDS)
+        writer.writeheader()
+        for result in tests:
+            with open(result["timeseries_file"], "r", newline="") as f:
+                for row in csv.DictReader(f):
+                    writer.writerow({**{c: result[c] for c in columns}, **row})
+    print(f"Per-second series saved to: {series_file}")
+
+
+STORED_METRICS = [
+    "rps",
+    "p50_latency_ms",
+    "p90_latency_ms",
+    "p99_latency_ms",
+    "p99_9_latency_ms",
+    "docs_per_sec",
+    "doc_p50_latency_ms",
+    "doc_p90_latency_ms",
+    "doc_p99_latency_ms",
+]
+
+
+def store_results(db_path, args, results):
+    """
+    Record all tests as one run of the results store.
 
-    return results
+    Metrics are keyed by test, e.g. 1kb_5docs_16users/rps, and the RPS of every
+    second of the steady state is kept as samples for the significance test.
+    """
+    metrics = {}
+    samples = {}
+    for result in results:
+        test = (
+            f"{result['size_per_doc_kb']}kb_{result['docs_per_request']}docs_"
+            f"{result['users']}users"
+        )
+        for key in STORED_METRICS:
+            if result.get(key) is not None:
+                metrics[f"{test}/{key}"] = result[key]
+        if result.get("timeseries_file"):
+            with open(result["timeseries_file"], "r", newline="") as f:
+                samples[f"{test}/rps"] = [
+                    float(row["rps"])
+                    for row in csv.DictReader(f)
+                    if row["steady"] == "True"
+                ]
+    record_run(db_path, "automated_benchmark", vars(args), metrics, samples)
 
 
 def main():
@@ -201,7 +704,42 @@ def main():
         help="Starting number of users (default: 4)",
     )
     parser.add_argument(
-        "--step-size", type=int, default=4, help="User increment step size (default: 4)"
+        "--step-size",
+        type=int,
+        default=4,
+        help="User increment of the linear strategy and resolution of the adaptive one (default: 4)",
+    )
+    parser.add_argument(
+        "--search-strategy",
+        choices=["adaptive", "linear"],
+        default="adaptive",
+        help="adaptive: double users then bisect, linear: add --step-size users per run (default: adaptive)",
+    )
+    parser.add_argument(
+        "--max-users",
+        type=int,
+        default=1024,
+        help="Upper bound of the number of users (default: 1024)",
+    )
+    parser.add_argument(
+        "--slo-percentile",
+        type=float,
+        choices=PERCENTILES,
+        default=90,
+        help="Latency percentile of the SLO (default: 90)",
+    )
+    parser.add_argument(
+        "--slo-ms",
+        type=float,
+        default=400,
+        help="Latency SLO in milliseconds (default: 400)",
+    )
+    parser.add_argument(
+        "--min-rps-gain",
+        type=float,
+        default=0.1,
+        help="Stop adding users when RPS grows by less than this fraction of the "
+        "relative user increase (default: 0.1)",
     )
     parser.add_argument(
         "--run-time",
@@ -209,13 +747,39 @@ def main():
         default=30,
         help="Run time of each test in seconds (default: 30)",
     )
+    parser.add_argument(
+        "--locust-args",
+        default="",
+        help='Extra options for locust_benchmark_sm.py, e.g. "--corpus-file corpus.jsonl --doc-length-dist lognormal"',
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Local Locust worker processes behind a master, -1 for one per CPU core, "
+        "0 for a single process (default: 0)",
+    )
+    parser.add_argument(
+        "--cpu-saturation-pct",
+        type=float,
+        default=90,
+        help="Average CPU usage of a load generator process that flags the client as "
+        "saturated (default: 90)",
+    )
     parser.add_argument(
         "--output",
         default="benchmark_results.csv",
         help="Output CSV file name (default: benchmark_results.csv)",
     )
+    parser.add_argument(
+        "--results-db",
+        default=None,
+        help="Also record the run in this results store (SQLite file)",
+    )
 
     args = parser.parse_args()
+    if args.workers < 0:
+        args.workers = os.cpu_count()
 
     # Parse parameter list
     try:
@@ -232,7 +796,10 @@ def main():
     print(f"Parameter sets: {param_sets}")
     print(f"Start users: {args.start_users}")
     print(f"Step size: {args.step_size}")
+    print(f"Search strategy: {args.search_strategy}")
+    print(f"SLO: P{args.slo_percentile:g} <= {args.slo_ms}ms")
     print(f"Run time per test: {args.run_time}s")
+    print(f"Locust workers: {args.workers or 'single process'}")
 
     # Ensure that the metrics directory exists
     metrics_dir = Path("metrics")
@@ -249,6 +816,14 @@ def main():
             args.start_users,
             args.step_size,
             args.run_time,
+            args.search_strategy,
+            args.slo_percentile,
+            args.slo_ms,
+            args.min_rps_gain,
+            args.max_users,
+            shlex.split(args.locust_args),
+            args.workers,
+            args.cpu_saturation_pct,
         )
         all_results.extend(results)
 
@@ -260,22 +835,40 @@ def main():
                 "docs_per_request",
                 "users",
                 "rps",
+                "p50_latency_ms",
                 "p90_latency_ms",
+                "p99_latency_ms",
+                "p99_9_latency_ms",
+                "max_latency_ms",
+                "within_slo",
+                "docs_per_sec",
+                "doc_p50_latency_ms",
+                "doc_p90_latency_ms",
+                "doc_p99_latency_ms",
+                "steady_start_s",
+                "steady_duration_s",
+                "locust_workers",
+                "client_cpu_pct",
+                "client_cpu_saturated",
+                "timeseries_file",
                 "start_time_utc",
                 "end_time_utc",
             ]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames, restval="")
 
             writer.writeheader()
             for result in all_results:
                 writer.writerow(result)
 
         print(f"\nTests completed! Results saved to: {args.output}")
+        save_timeseries(args.output, all_results)
+        if args.results_db:
+            store_results(args.results_db, args, all_results)
 
         # Print summary information
         print("\nSummary of test results:")
-        print("Params | Best users | Max RPS | P90 latency")
-        print("-" * 50)
+        print("Params | Best users | Max RPS | P90 latency | P99 latency | Client CPU")
+        print("-" * 65)
 
         for size_per_doc, docs_per_request in param_sets:
             param_results = [
@@ -284,10 +877,13 @@ def main():
                 if r["size_per_doc_kb"] == size_per_doc
                 and r["docs_per_request"] == docs_per_request
             ]
+            # prefer the best run within the SLO
+            within_slo = [r for r in param_results if r["within_slo"]]
+            param_results = within_slo or param_results
             if param_results:
                 best_result = max(param_results, key=lambda x: x["rps"])
                 print(
-                    f"({size_per_doc}KB,{docs_per_request}docs) | {best_result['users']} | {best_result['rps']:.1f} | {best_result['p90_latency_ms']:.1f}ms"
+                    f"({size_per_doc}KB,{docs_per_request}docs) | {best_result['users']} | {best_result['rps']:.1f} | {best_result['p90_latency_ms']:.1f}ms | {best_result['p99_latency_ms']:.1f}ms | {best_result['client_cpu_pct']:.0f}%"
                 )
     else:
         print("No successful test results")
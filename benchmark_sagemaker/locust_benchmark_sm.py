@@ -1,22 +1,39 @@
 import boto3
+from botocore import UNSIGNED
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
 from botocore.config import Config
 import os
 import sys
 import json
+from urllib.parse import quote
+from geventhttpclient import HTTPClient
+from geventhttpclient.url import URL
+import gevent
+from gevent.event import AsyncResult
+from gevent.queue import Empty, Queue
 from locust import User, task, between, events, LoadTestShape
+from locust.runners import WorkerRunner
 
-import numpy as np
-from PIL import Image
 from pathlib import Path
 import random
 import time
 from dotenv import load_dotenv
 import logging
 
+from payload_pool import DEFAULT_CORPUS, DOC_LENGTH_DISTRIBUTIONS, get_payload_pool
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from benchmark_common import jsoncodec
+from benchmark_common.profiling import profile_from_env, stage, timer
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# one profile per process, i.e. per worker of a distributed run
+profile_from_env("locust")
+
 # How to use
 # 1. install locust & boto3
 #   pip install locust boto3
@@ -37,64 +54,194 @@ logger = logging.getLogger(__name__)
 #       --size-per-doc 1 \
 #       --request-size 10 \
 #       --endpoint-name your-endpoint-name
+#
+# offline against the local mock endpoint (mock_sagemaker_endpoint.py)
+#   locust -f locust_benchmark_sm.py ... --endpoint-url http://localhost:8080 --unsigned
+#
+# client tuning: all users of a process share one client and its connection pool
+#   locust -f locust_benchmark_sm.py ... --http-mode raw --max-pool-connections 512 --max-retries 0
+#
+# client-side micro-batching: every user submits single documents, coalesced per process
+#   locust -f locust_benchmark_sm.py ... --client-batch-max-docs 32 --client-batch-max-wait-ms 10
 
 content_type = "application/json"
 
+HTTP_MODES = ["boto3", "raw"]
 
-def generate_payload_from_doc(size_per_doc_kb, request_size_kb):
-    """
-    Generate a payload according to the given document size and total request size.
-    """
-    # Read doc.txt
-    doc_path = Path(__file__).parent / "doc.txt"
-    with doc_path.open("r", encoding="utf-8") as f:
-        doc_content = f.read()
+_sagemaker_clients = {}
+_batchers = {}
 
-    # Calculate target byte counts
-    size_per_doc_bytes = size_per_doc_kb * 1024
-    request_size_bytes = request_size_kb * 1024
 
-    # Adjust single document size
-    doc_content_bytes = doc_content.encode("utf-8")
-    current_size = len(doc_content_bytes)
+def payload_pool_from_options(options):
+    """Return the process-wide payload pool for the parsed command line options."""
+    docs_per_request = options.request_size // options.size_per_doc
+    max_docs_per_request = options.max_docs_per_request
+    if options.client_batch_max_docs:
+        # callers submit single documents, the batcher builds the requests
+        docs_per_request, max_docs_per_request = 1, 0
+    return get_payload_pool(
+        corpus_file=options.corpus_file,
+        text_field=options.text_field,
+        size_per_doc_kb=options.size_per_doc,
+        docs_per_request=docs_per_request,
+        max_docs_per_request=max_docs_per_request,
+        doc_length_dist=options.doc_length_dist,
+        doc_length_sigma=options.doc_length_sigma,
+        pool_size=options.payload_pool_size,
+        seed=options.payload_seed,
+    )
 
-    if current_size < size_per_doc_bytes:
-        # Repeat content if needed
-        repeat_count = (size_per_doc_bytes + current_size - 1) // current_size
-        adjusted_doc = doc_content * repeat_count
-        adjusted_doc = adjusted_doc.encode("utf-8")[:size_per_doc_bytes].decode(
-            "utf-8", errors="ignore"
-        )
-    else:
-        # Truncate content if needed
-        adjusted_doc = doc_content_bytes[:size_per_doc_bytes].decode(
-            "utf-8", errors="ignore"
-        )
 
-    # Compute required number of documents
-    doc_count = request_size_kb // size_per_doc_kb
-    if request_size_kb % size_per_doc_kb != 0:
-        raise ValueError(
-            f"request_size ({request_size_kb}KB) must be divisible by size_per_doc ({size_per_doc_kb}KB)"
-        )
+class InvokeEndpointError(Exception):
+    def __init__(self, status_code, body):
+        super().__init__(f"InvokeEndpoint failed with HTTP {status_code}: {body[:200]}")
+        self.status_code = status_code
 
-    # Create the document list
-    payload_list = [adjusted_doc] * doc_count
 
-    return json.dumps(payload_list)
+class RawSigV4Client:
+    """
+    InvokeEndpoint over a gevent HTTP connection pool, signed with SigV4.
+
+    Skips botocore's request pipeline (parameter validation, event hooks, retry
+    handler, urllib3), whose per-request CPU cost limits a gevent process at high
+    user counts. Exposes the subset of the boto3 client used by SageMakerClient.
+    """
+
+    def __init__(
+        self,
+        region,
+        endpoint_url=None,
+        unsigned=False,
+        max_pool_connections=256,
+        connect_timeout=5,
+        read_timeout=60,
+    ):
+        self.region = region
+        self.endpoint_url = (
+            endpoint_url or f"https://runtime.sagemaker.{region}.amazonaws.com"
+        ).rstrip("/")
+        self.http = HTTPClient.from_url(
+            URL(self.endpoint_url),
+            concurrency=max_pool_connections,
+            connection_timeout=connect_timeout,
+            network_timeout=read_timeout,
+        )
+        # resolved once, refreshable credentials are refreshed by botocore when frozen
+        self.credentials = None if unsigned else boto3.Session().get_credentials()
+
+    def invoke_endpoint(self, EndpointName, Body, ContentType):
+        path = f"/endpoints/{quote(EndpointName, safe='')}/invocations"
+        headers = {"Content-Type": ContentType, "Accept": "application/json"}
+        if self.credentials is not None:
+            request = AWSRequest(
+                method="POST", url=self.endpoint_url + path, data=Body, headers=headers
+            )
+            SigV4Auth(
+                self.credentials.get_frozen_credentials(), "sagemaker", self.region
+            ).add_auth(request)
+            headers = dict(request.headers.items())
+        response = self.http.post(path, body=Body, headers=headers)
+        if response.status_code >= 400:
+            raise InvokeEndpointError(response.status_code, response.read())
+        return {"Body": response, "ContentType": ContentType}
+
+
+def create_sagemaker_client(
+    http_mode="boto3",
+    endpoint_url=None,
+    unsigned=False,
+    max_pool_connections=256,
+    max_retries=0,
+    connect_timeout=5,
+    read_timeout=60,
+):
+    """
+    Create a sagemaker-runtime client tuned for load generation.
+
+    Args:
+        http_mode: boto3 (botocore client) or raw (RawSigV4Client)
+        endpoint_url: Override of the sagemaker-runtime URL, e.g. the mock endpoint
+        unsigned: Send requests without SigV4 signing
+        max_pool_connections: Connections kept open to the endpoint, at least the
+            number of users of the process so requests never queue for a connection
+        max_retries: Retries of throttled or failed requests, 0 so errors are counted
+            instead of hidden in the latency
+        connect_timeout: Connection timeout in seconds
+        read_timeout: Response timeout in seconds
+
+    Returns:
+        boto3 sagemaker-runtime client or RawSigV4Client
+    """
+    session = boto3.Session()
+    if http_mode == "raw":
+        return RawSigV4Client(
+            session.region_name,
+            endpoint_url,
+            unsigned,
+            max_pool_connections,
+            connect_timeout,
+            read_timeout,
+        )
+    config = Config(
+        max_pool_connections=max_pool_connections,
+        retries={"total_max_attempts": max_retries + 1, "mode": "standard"},
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        tcp_keepalive=True,
+    )
+    if unsigned:
+        # unsigned requests need no AWS credentials, e.g. for the local mock endpoint
+        config = config.merge(Config(signature_version=UNSIGNED))
+    return session.client("sagemaker-runtime", endpoint_url=endpoint_url, config=config)
+
+
+def sagemaker_client_from_options(options):
+    """Return the process-wide sagemaker-runtime client for the parsed command line options."""
+    settings = dict(
+        http_mode=options.http_mode,
+        endpoint_url=options.endpoint_url,
+        unsigned=options.unsigned,
+        max_pool_connections=options.max_pool_connections,
+        max_retries=options.max_retries,
+        connect_timeout=options.connect_timeout,
+        read_timeout=options.read_timeout,
+    )
+    key = tuple(sorted(settings.items()))
+    if key not in _sagemaker_clients:
+        _sagemaker_clients[key] = create_sagemaker_client(**settings)
+    return _sagemaker_clients[key]
 
 
 class SageMakerClient:
-    def __init__(self):
-        super().__init__()
+    """
+    Sends InvokeEndpoint requests and reports them to Locust.
+
+    The response body is always read, so the InvokeEndpoint latency covers its
+    transfer and response_length its size. Besides the InvokeEndpoint request, each
+    call reports a "TTFB" event (time until the response headers arrived) and, with
+    `decode_response`, a "Decode" event timing the JSON parsing and validation. They
+    are separate rows of the Locust stats and don't count as InvokeEndpoint requests.
+    """
 
-        self.session = boto3.Session()
-        self.payload = globals()["payload"]
+    def __init__(self, client, decode_response=False):
+        super().__init__()
 
-        self.client = self.session.client("sagemaker-runtime")
+        # shared by all users of the process, see sagemaker_client_from_options
+        self.client = client
         self.content_type = content_type
+        self.decode_response = decode_response
+
+    def decode(self, body, doc_count=None):
+        """Parse a response, expecting one result per document when it is a list"""
+        result = jsoncodec.loads(body)
+        if isinstance(result, list) and doc_count not in (None, len(result)):
+            raise ValueError(
+                f"Expected {doc_count} results in the response, got {len(result)}"
+            )
+        return result
 
-    def send(self, endpoint_name):
+    def send(self, endpoint_name, payload, doc_count=None):
+        """Invoke the endpoint, returns the exception of a failed request or None"""
 
         request_meta = {
             "request_type": "InvokeEndpoint",
@@ -107,14 +254,21 @@ class SageMakerClient:
         }
 
         start_perf_counter = time.perf_counter()
+        first_byte_ms = None
+        body = None
 
         try:
-            response = self.client.invoke_endpoint(
-                EndpointName=endpoint_name,
-                Body=self.payload,
-                ContentType=self.content_type,
-            )
-            # print(response)
+            with stage("invoke"):
+                response = self.client.invoke_endpoint(
+                    EndpointName=endpoint_name,
+                    Body=payload,
+                    ContentType=self.content_type,
+                )
+            # the response headers have arrived, the body is still streaming
+            first_byte_ms = (time.perf_counter() - start_perf_counter) * 1000
+            with stage("read_body"):
+                body = response["Body"].read()
+            request_meta["response_length"] = len(body)
         except Exception as e:
             request_meta["exception"] = e
 
@@ -122,11 +276,204 @@ class SageMakerClient:
             time.perf_counter() - start_perf_counter
         ) * 1000
 
-        events.request.fire(**request_meta)
+        with stage("report"):
+            events.request.fire(**request_meta)
         if request_meta["exception"] is not None:
             logger.error(
                 f"Error invoking endpoint {endpoint_name}: {request_meta['exception']}"
             )
+            return request_meta["exception"]
+
+        events.request.fire(
+            request_type="TTFB",
+            name=endpoint_name,
+            start_time=request_meta["start_time"],
+            response_time=first_byte_ms,
+            response_length=0,
+            response=None,
+            context={},
+            exception=None,
+        )
+        if not self.decode_response:
+            return None
+
+        decode_start = time.perf_counter()
+        exception = None
+        try:
+            with stage("decode"):
+                self.decode(body, doc_count)
+        except Exception as e:
+            exception = e
+        events.request.fire(
+            request_type="Decode",
+            name=endpoint_name,
+            start_time=time.time(),
+            response_time=(time.perf_counter() - decode_start) * 1000,
+            response_length=len(body),
+            response=None,
+            context={},
+            exception=exception,
+        )
+        if exception is not None:
+            logger.error(f"Invalid response from endpoint {endpoint_name}: {exception}")
+        return exception
+
+
+class MicroBatcher:
+    """
+    Client-side micro-batching, as an ingestion path coalescing concurrent callers.
+
+    Callers submit single JSON-encoded documents and block until the request carrying
+    their document completed. A greenlet groups queued documents until `max_docs` are
+    pending or `max_wait_ms` passed since the first one, and sends every batch as one
+    InvokeEndpoint request without waiting for the previous ones.
+    """
+
+    def __init__(self, client, endpoint_name, max_docs, max_wait_ms):
+        self.client = client
+        self.endpoint_name = endpoint_name
+        self.max_docs = max_docs
+        self.max_wait = max_wait_ms / 1000
+        self.queue = Queue()
+        gevent.spawn(self._batch_loop)
+
+    def submit(self, document):
+        """
+        Send a document with the next batch.
+
+        Returns:
+            Exception: The exception of the batch request, None if it succeeded
+        """
+        result = AsyncResult()
+        self.queue.put((document, result))
+        return result.get()
+
+    def _batch_loop(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_docs:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except Empty:
+                    break
+            gevent.spawn(self._flush, batch)
+
+    def _flush(self, batch):
+        # the documents are already JSON-encoded, join them without re-serializing
+        payload = b"[" + b",".join(document for document, _ in batch) + b"]"
+        exception = self.client.send(self.endpoint_name, payload, len(batch))
+        for _, result in batch:
+            result.set(exception)
+
+
+def batcher_from_options(client, options):
+    """Return the process-wide micro-batcher, None when client batching is disabled."""
+    if not options.client_batch_max_docs:
+        return None
+    if options.endpoint_name not in _batchers:
+        _batchers[options.endpoint_name] = MicroBatcher(
+            client,
+            options.endpoint_name,
+            options.client_batch_max_docs,
+            options.client_batch_max_wait_ms,
+        )
+    return _batchers[options.endpoint_name]
+
+
+def round_response_time(response_time_ms):
+    """Round like Locust's response time histogram: 2 significant digits above 100ms"""
+    if response_time_ms < 100:
+        return round(response_time_ms)
+    if response_time_ms < 1000:
+        return round(response_time_ms, -1)
+    return round(response_time_ms, -2)
+
+
+class TimeSeriesRecorder:
+    """
+    Per-second InvokeEndpoint request and failure counts and response time histograms.
+
+    Locust only keeps a cumulative histogram of the whole run, per-second histograms
+    allow exact percentiles over any window, e.g. the steady state of a run. Workers
+    send their seconds to the master with every report, the master (or the single
+    process) writes the merged series to --timeseries-file when Locust quits.
+    """
+
+    def __init__(self):
+        self.seconds = {}
+
+    def record(self, response_time_ms, failed):
+        second = self.seconds.setdefault(
+            int(time.time()), {"requests": 0, "failures": 0, "response_times": {}}
+        )
+        second["requests"] += 1
+        if failed:
+            second["failures"] += 1
+            return
+        bucket = round_response_time(response_time_ms)
+        second["response_times"][bucket] = second["response_times"].get(bucket, 0) + 1
+
+    def merge(self, seconds):
+        for key, other in seconds.items():
+            second = self.seconds.setdefault(
+                int(key), {"requests": 0, "failures": 0, "response_times": {}}
+            )
+            second["requests"] += other["requests"]
+            second["failures"] += other["failures"]
+            for bucket, count in other["response_times"].items():
+                bucket = float(bucket)
+                second["response_times"][bucket] = (
+                    second["response_times"].get(bucket, 0) + count
+                )
+
+    def pop(self):
+        seconds, self.seconds = self.seconds, {}
+        return seconds
+
+    def write(self, file_name):
+        with open(file_name, "w") as f:
+            json.dump({str(k): v for k, v in sorted(self.seconds.items())}, f)
+
+
+timeseries = TimeSeriesRecorder()
+
+
+@events.request.add_listener
+def _(request_type, response_time, exception, **kwargs):
+    if request_type == "InvokeEndpoint":
+        timeseries.record(response_time, exception is not None)
+
+
+@events.report_to_master.add_listener
+def _(client_id, data):
+    data["timeseries"] = timeseries.pop()
+
+
+@events.worker_report.add_listener
+def _(client_id, data):
+    timeseries.merge(data.get("timeseries", {}))
+
+
+@events.quitting.add_listener
+def _(environment, **kwargs):
+    # every process reports its own stages, the master runs no users
+    if timer.totals:
+        logger.info(timer.report("Locust client stage breakdown"))
+
+
+@events.quitting.add_listener
+def _(environment, **kwargs):
+    # after the final worker reports, which arrive when the test stops
+    options = environment.parsed_options
+    if options is None or not getattr(options, "timeseries_file", None):
+        return
+    if isinstance(environment.runner, WorkerRunner):
+        return
+    timeseries.write(options.timeseries_file)
 
 
 class SageMakerUser(User):
@@ -146,19 +493,140 @@ class SageMakerUser(User):
         parser.add_argument(
             "--request-size", type=int, help="total request size in KB", required=True
         )
+        parser.add_argument(
+            "--corpus-file",
+            type=str,
+            default=str(DEFAULT_CORPUS),
+            help="corpus JSONL (or plain text document) the payloads are built from",
+        )
+        parser.add_argument(
+            "--text-field", type=str, default="text", help="text field of the corpus"
+        )
+        parser.add_argument(
+            "--doc-length-dist",
+            choices=DOC_LENGTH_DISTRIBUTIONS,
+            default="fixed",
+            help="document sizes: fixed --size-per-doc, natural corpus lengths, "
+            "or lognormal around --size-per-doc",
+        )
+        parser.add_argument(
+            "--doc-length-sigma",
+            type=float,
+            default=0.5,
+            help="sigma of the lognormal document size distribution",
+        )
+        parser.add_argument(
+            "--max-docs-per-request",
+            type=int,
+            default=0,
+            help="vary docs per request up to this number",
+        )
+        parser.add_argument(
+            "--payload-pool-size",
+            type=int,
+            default=256,
+            help="number of distinct pre-built payloads",
+        )
+        parser.add_argument(
+            "--payload-seed", type=int, default=0, help="seed of the payload pool"
+        )
+        parser.add_argument(
+            "--endpoint-url",
+            type=str,
+            default=os.environ.get("SAGEMAKER_ENDPOINT_URL"),
+            help="sagemaker-runtime URL override, e.g. http://localhost:8080 "
+            "for mock_sagemaker_endpoint.py",
+        )
+        parser.add_argument(
+            "--unsigned",
+            action="store_true",
+            help="send requests without SigV4 signing (mock endpoint)",
+        )
+        parser.add_argument(
+            "--client-batch-max-docs",
+            type=int,
+            default=0,
+            help="users submit single documents, batched into requests of up to this "
+            "many documents per process (0 disables client batching)",
+        )
+        parser.add_argument(
+            "--client-batch-max-wait-ms",
+            type=float,
+            default=10,
+            help="send a client batch at the latest this long after its first document",
+        )
+        parser.add_argument(
+            "--decode-response",
+            action="store_true",
+            help="parse and validate every response, timed as a separate Decode event",
+        )
+        parser.add_argument(
+            "--timeseries-file",
+            type=str,
+            default=None,
+            help="JSON file of per-second request counts and response time histograms",
+        )
+        parser.add_argument(
+            "--http-mode",
+            choices=HTTP_MODES,
+            default="boto3",
+            help="boto3 client, or raw SigV4 requests over a gevent connection pool",
+        )
+        parser.add_argument(
+            "--max-pool-connections",
+            type=int,
+            default=256,
+            help="connections per process, at least the users per process",
+        )
+        parser.add_argument(
+            "--max-retries",
+            type=int,
+            default=0,
+            help="retries of failed requests (boto3 mode), 0 to count every error",
+        )
+        parser.add_argument(
+            "--connect-timeout",
+            type=float,
+            default=5,
+            help="connection timeout in seconds",
+        )
+        parser.add_argument(
+            "--read-timeout",
+            type=float,
+            default=60,
+            help="response timeout in seconds",
+        )
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        size_per_doc_kb = self.environment.parsed_options.size_per_doc
-        request_size_kb = self.environment.parsed_options.request_size
+        options = self.environment.parsed_options
+        size_per_doc_kb = options.size_per_doc
+        request_size_kb = options.request_size
 
-        # Generate payload
-        globals()["payload"] = generate_payload_from_doc(
-            size_per_doc_kb, request_size_kb
+        if request_size_kb % size_per_doc_kb != 0:
+            raise ValueError(
+                f"request_size ({request_size_kb}KB) must be divisible by size_per_doc ({size_per_doc_kb}KB)"
+            )
+
+        # Built once per process and shared by all users
+        self.payload_pool = payload_pool_from_options(options)
+
+        self.client = SageMakerClient(
+            sagemaker_client_from_options(options), options.decode_response
         )
+        self.batcher = batcher_from_options(self.client, options)
+
 
-        self.client = SageMakerClient()
+@events.test_start.add_listener
+def _(environment, **kwargs):
+    # Build the pool before users spawn so it is not part of the measured run
+    options = environment.parsed_options
+    if options is None or not hasattr(options, "corpus_file"):
+        return
+    logger.info(f"Payload pool: {payload_pool_from_options(options).describe()}")
+    # resolve credentials and open the client before the measured run as well
+    sagemaker_client_from_options(options)
 
 
 class SimpleSendRequest(SageMakerUser):
@@ -167,8 +635,28 @@ class SimpleSendRequest(SageMakerUser):
     @task
     def send_request(self):
         endpoint_name = self.environment.parsed_options.endpoint_name
+        with stage("sample_payload"):
+            payload, doc_count = self.payload_pool.sample()
 
-        self.client.send(endpoint_name)
+        if self.batcher is None:
+            self.client.send(endpoint_name, payload, doc_count)
+            return
+
+        # a single document: its latency includes the wait for the batch to fill
+        start_time = time.time()
+        start_perf_counter = time.perf_counter()
+        with stage("batch_wait"):
+            exception = self.batcher.submit(payload[1:-1])
+        events.request.fire(
+            request_type="Document",
+            name=endpoint_name,
+            start_time=start_time,
+            response_time=(time.perf_counter() - start_perf_counter) * 1000,
+            response_length=len(payload),
+            response=None,
+            context={},
+            exception=exception,
+        )
 
 
 class StagesShape(LoadTestShape):
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for a SageMaker sparse encoding endpoint.
+
+Implements the InvokeEndpoint HTTP API (POST /endpoints/<name>/invocations), so the
+Locust harness and automated_benchmark.py can run offline through boto3's endpoint_url.
+Requests are batched server side and each batch sleeps according to a latency model:
+
+    batch latency = base_ms + per_token_ms * docs in batch * longest doc in tokens
+
+i.e. documents are padded to the longest one of the batch, as a transformer would.
+At most --workers batches run at the same time, the others wait in the queue.
+
+Usage:
+python mock_sagemaker_endpoint.py --port 8080 --workers 1 --max-batch-docs 32 --max-batch-delay-ms 5
+locust -f locust_benchmark_sm.py ... --endpoint-url http://localhost:8080 --unsigned
+"""
+
+import argparse
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from benchmark_common import jsoncodec
+
+INVOCATIONS_PATH = re.compile(r"^/endpoints/([^/]+)/invocations$")
+
+
+class PendingRequest:
+    """A request waiting for its batch to complete"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.tokens = []
+        self.done = threading.Event()
+        self.result = None
+
+
+class BatchingModel:
+    """
+    Server-side batching with a token-based latency model.
+
+    A batcher thread groups queued requests until --max-batch-docs documents or
+    --max-batch-delay-ms after the first request of the batch, and hands the batch to
+    one of --workers model workers.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.requests = queue.Queue()
+        self.batches = queue.Queue(maxsize=1)
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self._batch_loop, daemon=True).start()
+        for _ in range(args.workers):
+            threading.Thread(target=self._worker_loop, daemon=True).start()
+
+    def count_tokens(self, doc):
+        tokens = max(1, len(doc.encode("utf-8")) // self.args.bytes_per_token)
+        return min(tokens, self.args.max_seq_len)
+
+    def batch_latency_ms(self, batch):
+        docs = sum(len(request.docs) for request in batch)
+        longest = max(max(request.tokens, default=1) for request in batch)
+        return self.args.base_ms + self.args.per_token_ms * docs * longest
+
+    def encode(self, doc):
+        """Fake sparse output: up to --output-tokens distinct words with random weights"""
+        vector = {}
+        for word in doc.split():
+            if len(vector) >= self.args.output_tokens:
+                break
+            vector[word.lower()] = round(random.random() * 3, 4)
+        return vector
+
+    def _batch_loop(self):
+        while True:
+            batch = [self.requests.get()]
+            docs = len(batch[0].docs)
+            deadline = time.perf_counter() + self.args.max_batch_delay_ms / 1000
+            while docs < self.args.max_batch_docs:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                docs += len(request.docs)
+            # blocks while every worker is busy
+            self.batches.put(batch)
+
+    def _worker_loop(self):
+        while True:
+            batch = self.batches.get()
+            time.sleep(self.batch_latency_ms(batch) / 1000)
+            for request in batch:
+                request.result = [self.encode(doc) for doc in request.docs]
+                request.done.set()
+
+    def infer(self, docs):
+        """
+        Run a request through the batching model.
+
+        Returns:
+            list: One sparse vector per document, None if the server is at capacity
+        """
+        with self.lock:
+            if self.args.max_concurrent_requests and (
+                self.in_flight >= self.args.max_concurrent_requests
+            ):
+                return None
+            self.in_flight += 1
+        try:
+            request = PendingRequest(docs)
+            request.tokens = [self.count_tokens(doc) for doc in docs]
+            self.requests.put(request)
+            request.done.wait()
+            return request.result
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class InvocationsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    model = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = jsoncodec.dumpb(body)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, error_type, message):
+        self._send_json(
+            status,
+            {"__type": error_type, "message": message},
+            {"x-amzn-ErrorType": error_type},
+        )
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not INVOCATIONS_PATH.match(self.path):
+            self._send_error(404, "ValidationError", f"Unknown path {self.path}")
+            return
+        try:
+            docs = jsoncodec.loads(body)
+            if isinstance(docs, str):
+                docs = [docs]
+        except ValueError as e:
+            self._send_error(400, "ModelError", f"Invalid JSON payload: {e}")
+            return
+        if not isinstance(docs, list) or not all(isinstance(doc, str) for doc in docs):
+            self._send_error(
+                400, "ModelError", "Payload must be a string or a list of strings"
+            )
+            return
+
+        result = self.model.infer(docs)
+        if result is None:
+            self._send_error(429, "ThrottlingException", "Too many requests")
+            return
+        self._send_json(
+            200, result, {"x-Amzn-Invoked-Production-Variant": "AllTraffic"}
+        )
+
+    def do_GET(self):
+        # health check, like the /ping of a SageMaker container
+        self._send_json(200, {"status": "ok"})
+
+
+class MockEndpointServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # the default listen backlog of 5 resets connections of large Locust runs
+    request_queue_size = 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock SageMaker inference endpoint")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address")
+    parser.add_argument("--port", type=int, default=8080, help="Port (default: 8080)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Batches processed concurrently, e.g. GPUs (default: 1)",
+    )
+    parser.add_argument(
+        "--max-batch-docs",
+        type=int,
+        default=32,
+        help="Flush a batch at this many documents (default: 32)",
+    )
+    parser.add_argument(
+        "--max-batch-delay-ms",
+        type=float,
+        default=5,
+        help="Flush a batch this long after its first request (default: 5)",
+    )
+    parser.add_argument(
+        "--base-ms", type=float, default=10, help="Fixed latency per batch (default: 10)"
+    )
+    parser.add_argument(
+        "--per-token-ms",
+        type=float,
+        default=0.01,
+        help="Latency per padded token in a batch (default: 0.01)",
+    )
+    parser.add_argument(
+        "--bytes-per-token",
+        type=int,
+        default=4,
+        help="Bytes of text per token (default: 4)",
+    )
+    parser.add_argument(
+        "--max-seq-len",
+        type=int,
+        default=512,
+        help="Documents are truncated to this many tokens (default: 512)",
+    )
+    parser.add_argument(
+        "--output-tokens",
+        type=int,
+        default=128,
+        help="Maximum tokens of each returned sparse vector (default: 128)",
+    )
+    parser.add_argument(
+        "--max-concurrent-requests",
+        type=int,
+        default=0,
+        help="Throttle requests beyond this many in flight, 0 for no limit (default: 0)",
+    )
+    args = parser.parse_args()
+    print(args)
+
+    InvocationsHandler.model = BatchingModel(args)
+    server = MockEndpointServer((args.host, args.port), InvocationsHandler)
+    print(f"Mock SageMaker endpoint listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Pre-serialized request payload pools for the Locust SageMaker benchmark.
+
+A pool is built once per process from a real corpus and sampled per request, so
+requests carry documents of realistic, varying content and length without paying
+for payload generation or JSON serialization inside the measured loop.
+"""
+
+import math
+import random
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from benchmark_common import jsoncodec
+
+DOC_LENGTH_DISTRIBUTIONS = ["fixed", "corpus", "lognormal"]
+
+DEFAULT_CORPUS = Path(__file__).parent / "doc.txt"
+
+_pools = {}
+
+
+def load_corpus_texts(corpus_file, text_field="text", max_docs=100000):
+    """
+    Load document texts from a corpus file.
+
+    A .jsonl file is read one document per line from `text_field` (the format written
+    by benchmark_ingestion), any other file is a single plain text document.
+    """
+    corpus_file = Path(corpus_file)
+    if corpus_file.suffix != ".jsonl":
+        return [corpus_file.read_text(encoding="utf-8")]
+
+    texts = []
+    with corpus_file.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            text = jsoncodec.loads(line).get(text_field, "")
+            if text.strip():
+                texts.append(text)
+            if len(texts) >= max_docs:
+                break
+    if not texts:
+        raise ValueError(f"No documents with a '{text_field}' field in {corpus_file}")
+    return texts
+
+
+def build_document(texts, size_bytes, rng):
+    """
+    Build a document of exactly `size_bytes` UTF-8 bytes (or slightly less at a
+    character boundary) by concatenating consecutive corpus texts from a random start.
+    """
+    start = rng.randrange(len(texts))
+    parts = []
+    length = 0
+    i = start
+    while length < size_bytes:
+        text = texts[i % len(texts)]
+        parts.append(text)
+        length += len(text.encode("utf-8")) + 1
+        i += 1
+    document = " ".join(parts).encode("utf-8")[:size_bytes]
+    return document.decode("utf-8", errors="ignore")
+
+
+class PayloadPool:
+    """A fixed set of pre-serialized payloads, sampled uniformly per request"""
+
+    def __init__(self, payloads, doc_counts):
+        self.payloads = payloads
+        self.doc_counts = doc_counts
+
+    @classmethod
+    def build(
+        cls,
+        corpus_file=DEFAULT_CORPUS,
+        text_field="text",
+        size_per_doc_kb=1,
+        docs_per_request=1,
+        max_docs_per_request=0,
+        doc_length_dist="fixed",
+        doc_length_sigma=0.5,
+        pool_size=256,
+        seed=0,
+    ):
+        """
+        Build a payload pool.
+
+        Args:
+            corpus_file: Corpus JSONL file, or a plain text file used as a single document
+            text_field: Field of the document text in the corpus JSONL
+            size_per_doc_kb: Document size in KB, the median for lognormal
+            docs_per_request: Number of documents per request
+            max_docs_per_request: If larger than docs_per_request, the number of documents
+                per request is drawn uniformly from [docs_per_request, max_docs_per_request]
+            doc_length_dist: fixed (every document is size_per_doc_kb), corpus (documents
+                keep their natural length) or lognormal (sizes drawn around size_per_doc_kb)
+            doc_length_sigma: Sigma of the lognormal document size distribution
+            pool_size: Number of distinct payloads
+            seed: Random seed, pools are reproducible
+
+        Returns:
+            PayloadPool
+        """
+        if doc_length_dist not in DOC_LENGTH_DISTRIBUTIONS:
+            raise ValueError(
+                f"doc_length_dist must be one of {', '.join(DOC_LENGTH_DISTRIBUTIONS)}"
+            )
+        rng = random.Random(seed)
+        texts = load_corpus_texts(corpus_file, text_field)
+        size_bytes = int(size_per_doc_kb * 1024)
+        # a fixed size pool of a single document (doc.txt) has only one distinct payload
+        if doc_length_dist == "fixed" and len(texts) == 1:
+            pool_size = 1
+
+        payloads = []
+        doc_counts = []
+        for _ in range(pool_size):
+            doc_count = docs_per_request
+            if max_docs_per_request > docs_per_request:
+                doc_count = rng.randint(docs_per_request, max_docs_per_request)
+            docs = []
+            for _ in range(doc_count):
+                if doc_length_dist == "corpus":
+                    docs.append(rng.choice(texts))
+                    continue
+                doc_size = size_bytes
+                if doc_length_dist == "lognormal":
+                    doc_size = max(
+                        1, int(rng.lognormvariate(math.log(size_bytes), doc_length_sigma))
+                    )
+                docs.append(build_document(texts, doc_size, rng))
+            payloads.append(jsoncodec.dumpb(docs))
+            doc_counts.append(doc_count)
+        return cls(payloads, doc_counts)
+
+    def sample(self, rng=random):
+        """Return a random (payload bytes, number of documents) pair"""
+        i = rng.randrange(len(self.payloads))
+        return self.payloads[i], self.doc_counts[i]
+
+    def describe(self):
+        sizes = [len(payload) for payload in self.payloads]
+        return (
+            f"{len(self.payloads)} payloads, {min(self.doc_counts)}-{max(self.doc_counts)} "
+            f"docs/request, {min(sizes) / 1024:.1f}-{max(sizes) / 1024:.1f}KB "
+            f"(mean {sum(sizes) / len(sizes) / 1024:.1f}KB)"
+        )
+
+
+def get_payload_pool(**kwargs):
+    """Return the pool for these `PayloadPool.build` arguments, built once per process"""
+    key = tuple(sorted((k, str(v)) for k, v in kwargs.items()))
+    if key not in _pools:
+        _pools[key] = PayloadPool.build(**kwargs)
+    return _pools[key]
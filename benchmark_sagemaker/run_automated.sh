@@ -8,5 +8,9 @@ python3 automated_benchmark.py \
     --params "$PARAMS" \
     --start-users 4 \
     --step-size 4 \
+    --search-strategy adaptive \
+    --slo-percentile 90 \
+    --slo-ms 400 \
     --run-time 900 \
+    --workers -1 \
     --output "performance_results_$(date +%Y%m%d_%H%M%S).csv"
\ No newline at end of file
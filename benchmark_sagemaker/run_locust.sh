@@ -9,4 +9,14 @@ locust -f locust_benchmark_sm.py \
     --size-per-doc 50 \
     --request-size 50 \
     --endpoint-name oc-0618-g4dn \
-    --json-file test
\ No newline at end of file
+    --json-file test
+
+# payloads built from a real corpus with lognormal document sizes around --size-per-doc
+# locust -f locust_benchmark_sm.py \
+#     --headless \
+#     --size-per-doc 2 \
+#     --request-size 10 \
+#     --corpus-file ../benchmark_ingestion/nfcorpus.jsonl \
+#     --doc-length-dist lognormal \
+#     --endpoint-name oc-0618-g4dn \
+#     --json-file test
\ No newline at end of file
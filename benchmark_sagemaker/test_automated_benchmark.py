@@ -0,0 +1,91 @@
+import math
+import random
+
+import pytest
+
+import automated_benchmark
+
+
+def percentile(samples, pct):
+    """np.percentile with linear interpolation, on the expanded samples"""
+    samples = sorted(samples)
+    position = pct / 100 * (len(samples) - 1)
+    lower = math.floor(position)
+    upper = min(lower + 1, len(samples) - 1)
+    return samples[lower] + (samples[upper] - samples[lower]) * (position - lower)
+
+
+def test_histogram_percentiles_match_the_expanded_samples():
+    rng = random.Random(0)
+    samples = [rng.choice([5, 10, 12, 40, 41, 300]) for _ in range(997)]
+    histogram = {}
+    for sample in samples:
+        histogram[sample] = histogram.get(sample, 0) + 1
+    percentiles = [0, 50, 90, 99.9, 100]
+    result = automated_benchmark.histogram_percentiles(histogram, percentiles)
+    for pct, value in result.items():
+        assert value == pytest.approx(percentile(samples, pct))
+
+
+def test_histogram_percentiles_of_merged_histograms():
+    merged = automated_benchmark.merge_histograms({"10": 1, "20": 1}, {20: 2, 30: 1})
+    assert merged == {10.0: 1, 20.0: 3, 30.0: 1}
+    assert automated_benchmark.histogram_percentiles(merged, [50]) == {50: 20.0}
+
+
+def test_histogram_percentiles_without_samples():
+    assert automated_benchmark.histogram_percentiles({10: 0}) == {}
+    assert automated_benchmark.latency_summary({}) is None
+
+
+def test_rps_plateaued_is_relative_to_the_user_increase():
+    # linear scaling over a small step is not saturation
+    assert not automated_benchmark.rps_plateaued(
+        {"users": 96, "rps": 960.0}, {"users": 100, "rps": 1000.0}, 0.1
+    )
+    # doubling the users for 5% more RPS is
+    assert automated_benchmark.rps_plateaued(
+        {"users": 32, "rps": 1000.0}, {"users": 64, "rps": 1050.0}, 0.1
+    )
+
+
+def simulated_endpoint(monkeypatch, capacity_users, rps_limit=None):
+    """
+    Endpoint scaling linearly at 10 RPS per user, optionally capped at `rps_limit`,
+    whose P90 latency exceeds a 400ms SLO above `capacity_users` users
+    """
+
+    def run_locust_test(endpoint_name, size_per_doc, request_size, users, *args):
+        rps = 10.0 * users
+        if rps_limit is not None:
+            rps = min(rps, rps_limit)
+        latency = 100.0 if users <= capacity_users else 500.0
+        return rps, {"p90_latency_ms": latency}, None, None
+
+    monkeypatch.setattr(automated_benchmark, "run_locust_test", run_locust_test)
+
+
+def best_users(results):
+    return max(r["users"] for r in results if r["within_slo"])
+
+
+@pytest.mark.parametrize("strategy", ["linear", "adaptive"])
+def test_search_finds_the_slo_limit_of_a_linear_endpoint(
+    monkeypatch, capsys, strategy
+):
+    simulated_endpoint(monkeypatch, capacity_users=100)
+    results = automated_benchmark.test_parameter_set(
+        "endpoint", 1, 1, start_users=4, step_size=4, strategy=strategy, slo_ms=400
+    )
+    assert best_users(results) == 100
+    assert "saturated" not in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("strategy", ["linear", "adaptive"])
+def test_search_stops_when_rps_plateaus(monkeypatch, strategy):
+    simulated_endpoint(monkeypatch, capacity_users=1024, rps_limit=300.0)
+    results = automated_benchmark.test_parameter_set(
+        "endpoint", 1, 1, start_users=4, step_size=4, strategy=strategy, slo_ms=400
+    )
+    assert all(r["within_slo"] for r in results)
+    assert max(r["users"] for r in results) <= 64
@@ -0,0 +1,60 @@
+import http.client
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from mock_sagemaker_endpoint import (
+    BatchingModel,
+    InvocationsHandler,
+    MockEndpointServer,
+)
+
+
+@pytest.fixture(scope="module")
+def endpoint():
+    InvocationsHandler.model = BatchingModel(
+        SimpleNamespace(
+            workers=1,
+            max_batch_docs=32,
+            max_batch_delay_ms=1,
+            base_ms=0,
+            per_token_ms=0,
+            bytes_per_token=4,
+            max_seq_len=512,
+            output_tokens=128,
+            max_concurrent_requests=0,
+        )
+    )
+    server = MockEndpointServer(("127.0.0.1", 0), InvocationsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+def invoke(endpoint, body):
+    connection = http.client.HTTPConnection(*endpoint, timeout=5)
+    try:
+        connection.request("POST", "/endpoints/mock/invocations", body=body)
+        response = connection.getresponse()
+        return response.status, response.getheader("x-amzn-ErrorType"), response.read()
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize(
+    "payload, expected",
+    [("Hello World", [["hello", "world"]]), (["a b", "c"], [["a", "b"], ["c"]])],
+)
+def test_encodes_a_string_or_a_list_of_strings(endpoint, payload, expected):
+    status, _, body = invoke(endpoint, json.dumps(payload))
+    assert status == 200
+    assert [sorted(vector) for vector in json.loads(body)] == expected
+
+
+@pytest.mark.parametrize("body", ["{not json", "1", "[1, 2]", '{"text": "a"}'])
+def test_rejects_invalid_payloads_with_a_model_error(endpoint, body):
+    status, error_type, _ = invoke(endpoint, body)
+    assert (status, error_type) == (400, "ModelError")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Helpers for the results file written by opensearch-benchmark with
+--results-format=csv --results-file=<path>.
+
+Usage:
+python osb_results.py --results-file results.csv --baseline-task search-baseline --task search-under-ingest
+"""
+
+import argparse
+import csv
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from benchmark_common.results_store import record_run
+
+LATENCY_METRICS = [
+    "50th percentile latency",
+    "90th percentile latency",
+    "99th percentile latency",
+]
+THROUGHPUT_METRIC = "Mean Throughput"
+ERROR_RATE_METRIC = "error rate"
+
+
+def load_results(results_file):
+    """
+    Parse an opensearch-benchmark CSV results file.
+
+    Returns:
+        dict: {task: {metric: value}}, task-less metrics are stored under "".
+            Percentages (the error rate) are converted to fractions
+    """
+    results = {}
+    with open(results_file, "r", newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                value = float(row["Value"])
+            except (TypeError, ValueError):
+                continue
+            if row.get("Unit") == "%":
+                value /= 100
+            results.setdefault(row.get("Task") or "", {})[row["Metric"]] = value
+    return results
+
+
+def latency_degradation(results, baseline_task, task):
+    """
+    Compare the latency and throughput of a task against a baseline task.
+
+    Returns:
+        list: [(metric, baseline value, value, relative change)]
+    """
+    if baseline_task not in results or task not in results:
+        raise ValueError(
+            f"Tasks not found in results: {baseline_task}, {task}. "
+            f"Available tasks: {sorted(t for t in results if t)}"
+        )
+    rows = []
+    for metric in LATENCY_METRICS + [THROUGHPUT_METRIC, ERROR_RATE_METRIC]:
+        baseline = results[baseline_task].get(metric)
+        value = results[task].get(metric)
+        if baseline is None or value is None:
+            continue
+        change = (value - baseline) / baseline if baseline else None
+        rows.append((metric, baseline, value, change))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Report the search latency degradation between two tasks"
+    )
+    parser.add_argument(
+        "--results-file", required=True, help="opensearch-benchmark CSV results file"
+    )
+    parser.add_argument(
+        "--baseline-task",
+        default="search-baseline",
+        help="Task measured without write load (default: search-baseline)",
+    )
+    parser.add_argument(
+        "--task",
+        default="search-under-ingest",
+        help="Task measured under write load (default: search-under-ingest)",
+    )
+    parser.add_argument(
+        "--results-db",
+        default=None,
+        help="Also record the metrics of both tasks in this results store (SQLite file)",
+    )
+    args = parser.parse_args()
+
+    results = load_results(args.results_file)
+    rows = latency_degradation(results, args.baseline_task, args.task)
+
+    print(f"{args.task} vs {args.baseline_task}:")
+    print("Metric | Baseline | Under load | Change")
+    print("-" * 60)
+    for metric, baseline, value, change in rows:
+        change = f"{change * 100:+.1f}%" if change is not None else "n/a"
+        print(f"{metric} | {baseline:.2f} | {value:.2f} | {change}")
+
+    if args.results_db:
+        metrics = {
+            f"{task}/{metric}": value
+            for task in (args.baseline_task, args.task)
+            for metric, value in results[task].items()
+        }
+        record_run(args.results_db, "opensearch-benchmark", vars(args), metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+# Search latency under ingestion load, see procedures/mixed-ingest-search.json for the parameters
+RESULTS_FILE="mixed_results_$(date +%Y%m%d_%H%M%S).csv"
+
+opensearch-benchmark execute-test --target-host ${HOSTS} \
+     --workload-path ./query_workload.json  \
+     --test-procedure mixed-ingest-search --pipeline benchmark-only  \
+     --workload-params "search_clients:4,bulk_clients:4,bulk_target_throughput:5,corpus_path:datasets/scifact-corpus.jsonl" \
+     --results-format csv --results-file ${RESULTS_FILE} \
+     --kill-running-processes \
+     --on-error abort
+
+python osb_results.py --results-file ${RESULTS_FILE}
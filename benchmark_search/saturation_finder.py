@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Find the maximum sustainable search throughput under a latency SLO.
+
+Runs the search-saturation procedure with increasing target throughput (doubling until
+the SLO is violated, then bisecting), and writes one CSV row per run.
+
+Usage:
+python saturation_finder.py --slo-p90-ms 50 --slo-p99-ms 100 --start-throughput 10
+"""
+
+import argparse
+import csv
+import math
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from osb_results import ERROR_RATE_METRIC, THROUGHPUT_METRIC, load_results
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from benchmark_common.results_store import record_run
+
+
+def run_search_test(args, target_throughput, clients):
+    """
+    Run a single opensearch-benchmark test at a fixed target throughput.
+
+    Returns:
+        dict: The task metrics, None if the test failed
+    """
+    timestamp = int(time.time())
+    results_file = Path(args.results_dir) / (
+        f"saturation_{target_throughput:g}qps_{clients}clients_{timestamp}.csv"
+    )
+    workload_params = [
+        f"search_clients:{clients}",
+        f"target_throughput:{target_throughput:g}",
+        f"task_name:{args.task_name}",
+        f"warmup_time_period:{args.warmup_time_period}",
+        f"time_period:{args.time_period}",
+    ]
+    if args.workload_params:
+        workload_params.append(args.workload_params)
+
+    cmd = [
+        "opensearch-benchmark",
+        "execute-test",
+        "--target-host",
+        args.target_host,
+        "--workload-path",
+        args.workload_path,
+        "--test-procedure",
+        args.test_procedure,
+        "--pipeline",
+        "benchmark-only",
+        "--workload-params",
+        ",".join(workload_params),
+        "--results-format",
+        "csv",
+        "--results-file",
+        str(results_file),
+        "--kill-running-processes",
+        "--on-error",
+        "abort",
+    ]
+    if args.client_options:
+        cmd.extend(["--client-options", args.client_options])
+
+    print(f"Running test: {target_throughput:g} ops/s, {clients} clients")
+    print(f"Command: {' '.join(cmd)}")
+
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0 or not results_file.exists():
+        print(f"Benchmark test failed: {result.stderr}")
+        return None
+
+    metrics = load_results(str(results_file)).get(args.task_name)
+    if metrics is None:
+        print(f"Task {args.task_name} not found in {results_file}")
+    return metrics
+
+
+def evaluate_run(args, target_throughput, metrics):
+    """Whether a run sustained the target throughput within the latency SLO"""
+    p90 = metrics.get("90th percentile latency")
+    p99 = metrics.get("99th percentile latency")
+    throughput = metrics.get(THROUGHPUT_METRIC, 0.0)
+    error_rate = metrics.get(ERROR_RATE_METRIC, 0.0)
+
+    reasons = []
+    if p90 is None or p90 > args.slo_p90_ms:
+        reasons.append(f"p90 {p90}ms > {args.slo_p90_ms}ms")
+    if args.slo_p99_ms is not None and (p99 is None or p99 > args.slo_p99_ms):
+        reasons.append(f"p99 {p99}ms > {args.slo_p99_ms}ms")
+    if throughput < target_throughput * (1 - args.throughput_tolerance):
+        reasons.append(f"throughput {throughput:.1f} < {target_throughput:g} ops/s")
+    if error_rate > args.max_error_rate:
+        reasons.append(f"error rate {error_rate:.4f} > {args.max_error_rate}")
+    return not reasons, "; ".join(reasons)
+
+
+def clients_for(args, target_throughput):
+    if not args.throughput_per_client:
+        return args.clients
+    return max(args.clients, math.ceil(target_throughput / args.throughput_per_client))
+
+
+def find_saturation(args):
+    """
+    Exponential ramp from --start-throughput until the SLO is violated, then bisection
+    between the last passing and the first failing throughput.
+
+    Returns:
+        list: One result dict per run
+    """
+    results = []
+
+    def measure(target_throughput):
+        clients = clients_for(args, target_throughput)
+        start_utc = datetime.utcnow().isoformat() + "Z"
+        metrics = run_search_test(args, target_throughput, clients)
+        end_utc = datetime.utcnow().isoformat() + "Z"
+        if metrics is None:
+            passed, reason = False, "test failed"
+            metrics = {}
+        else:
+            passed, reason = evaluate_run(args, target_throughput, metrics)
+        results.append(
+            {
+                "target_throughput": target_throughput,
+                "clients": clients,
+                "throughput": metrics.get(THROUGHPUT_METRIC),
+                "p50_latency_ms": metrics.get("50th percentile latency"),
+                "p90_latency_ms": metrics.get("90th percentile latency"),
+                "p99_latency_ms": metrics.get("99th percentile latency"),
+                "error_rate": metrics.get(ERROR_RATE_METRIC),
+                "passed": passed,
+                "reason": reason,
+                "start_time_utc": start_utc,
+                "end_time_utc": end_utc,
+            }
+        )
+        print(f"Result: {'PASS' if passed else 'FAIL'} {reason}".rstrip())
+        return passed
+
+    low, high = None, None
+    current = args.start_throughput
+    while current <= args.max_throughput:
+        if measure(current):
+            low = current
+            current *= 2
+        else:
+            high = current
+            break
+
+    if low is None:
+        print("The SLO is violated at the start throughput, lower --start-throughput")
+        return results
+    if high is None:
+        print(f"The SLO holds up to --max-throughput {args.max_throughput:g} ops/s")
+        return results
+
+    while (high - low) / low > args.precision and len(results) < args.max_runs:
+        middle = round((low + high) / 2, 1)
+        if measure(middle):
+            low = middle
+        else:
+            high = middle
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find the maximum search throughput under a latency SLO"
+    )
+    parser.add_argument(
+        "--target-host",
+        default=os.environ.get("HOSTS", "localhost:9200"),
+        help="OpenSearch endpoint (default: $HOSTS)",
+    )
+    parser.add_argument(
+        "--workload-path",
+        default="./query_workload.json",
+        help="Workload path (default: ./query_workload.json)",
+    )
+    parser.add_argument(
+        "--test-procedure",
+        default="search-saturation",
+        help="Test procedure (default: search-saturation)",
+    )
+    parser.add_argument(
+        "--task-name",
+        default="neural search",
+        help="Name of the search task in the procedure (default: neural search)",
+    )
+    parser.add_argument(
+        "--workload-params",
+        default="",
+        help='Extra workload params, e.g. "index_name:scifact,query_data_set_path:x.jsonl"',
+    )
+    parser.add_argument(
+        "--client-options", default="", help="opensearch-benchmark client options"
+    )
+    parser.add_argument(
+        "--slo-p90-ms", type=float, required=True, help="P90 latency SLO in ms"
+    )
+    parser.add_argument(
+        "--slo-p99-ms", type=float, default=None, help="P99 latency SLO in ms"
+    )
+    parser.add_argument(
+        "--max-error-rate",
+        type=float,
+        default=0.0,
+        help="Maximum error rate of a passing run as a fraction, e.g. 0.01 for 1%% "
+        "(default: 0)",
+    )
+    parser.add_argument(
+        "--throughput-tolerance",
+        type=float,
+        default=0.05,
+        help="Allowed shortfall of the achieved vs target throughput (default: 0.05)",
+    )
+    parser.add_argument(
+        "--start-throughput",
+        type=float,
+        default=10,
+        help="First target throughput in ops/s (default: 10)",
+    )
+    parser.add_argument(
+        "--max-throughput",
+        type=float,
+        default=10000,
+        help="Upper bound of the search in ops/s (default: 10000)",
+    )
+    parser.add_argument(
+        "--clients", type=int, default=1, help="Minimum number of clients (default: 1)"
+    )
+    parser.add_argument(
+        "--throughput-per-client",
+        type=float,
+        default=0,
+        help="Add a client per this many ops/s of target throughput (default: fixed clients)",
+    )
+    parser.add_argument(
+        "--precision",
+        type=float,
+        default=0.05,
+        help="Stop bisecting when the bounds are within this ratio (default: 0.05)",
+    )
+    parser.add_argument(
+        "--max-runs", type=int, default=20, help="Maximum number of runs (default: 20)"
+    )
+    parser.add_argument(
+        "--warmup-time-period",
+        type=int,
+        default=30,
+        help="Warm-up of each run in seconds (default: 30)",
+    )
+    parser.add_argument(
+        "--time-period",
+        type=int,
+        default=120,
+        help="Measurement of each run in seconds (default: 120)",
+    )
+    parser.add_argument(
+        "--results-dir",
+        default="results",
+        help="Directory of the per-run results files (default: results)",
+    )
+    parser.add_argument(
+        "--output",
+        default="saturation_results.csv",
+        help="Output CSV file name (default: saturation_results.csv)",
+    )
+    parser.add_argument(
+        "--results-db",
+        default=None,
+        help="Also record the run in this results store (SQLite file)",
+    )
+    args = parser.parse_args()
+    print(args)
+
+    Path(args.results_dir).mkdir(exist_ok=True)
+    results = find_saturation(args)
+
+    if not results:
+        print("No test results")
+        return
+
+    with open(args.output, "w", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        for result in results:
+            writer.writerow(result)
+    print(f"\nTests completed! Results saved to: {args.output}")
+
+    passed = [r for r in results if r["passed"]]
+    if passed:
+        best = max(passed, key=lambda r: r["throughput"])
+        # OSB leaves out the percentiles a short run has too few samples for
+        latencies = ", ".join(
+            f"{name} {best[key]:.1f}ms"
+            for name, key in [("p90", "p90_latency_ms"), ("p99", "p99_latency_ms")]
+            if best[key] is not None
+        )
+        print(
+            f"Max sustainable throughput: {best['throughput']:.1f} ops/s "
+            f"(target {best['target_throughput']:g}, {best['clients']} clients, "
+            f"{latencies})"
+        )
+
+    if args.results_db:
+        metrics = {}
+        for result in results:
+            run = f"{result['target_throughput']:g}qps_{result['clients']}clients"
+            for key in [
+                "throughput",
+                "p50_latency_ms",
+                "p90_latency_ms",
+                "p99_latency_ms",
+                "error_rate",
+            ]:
+                if result[key] is not None:
+                    metrics[f"{run}/{key}"] = result[key]
+        if passed:
+            metrics["max_sustainable_throughput"] = best["throughput"]
+        record_run(args.results_db, "saturation_finder", vars(args), metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import os
+import pickle
+import random
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+from workload import (
+    ConfigurationError,
+    QueryDataSet,
+    QueryNeuralSearchParamsSource,
+    ReplayScheduler,
+    ZipfSampler,
+)
+
+
+def write_lines(path, lines, trailing_newline=True):
+    path.write_text("\n".join(lines) + ("\n" if trailing_newline else ""))
+    return str(path)
+
+
+@pytest.mark.parametrize("trailing_newline", [True, False])
+def test_query_data_set_reads_every_line(tmp_path, trailing_newline):
+    lines = ['{"text": "a"}', '{"text": "bb"}', '{"text": "ccc"}']
+    data_set = QueryDataSet(
+        write_lines(tmp_path / "queries.jsonl", lines, trailing_newline)
+    )
+    assert data_set.total_lines == 3
+    assert [data_set.read_line(n).rstrip("\n") for n in (1, 2, 3)] == lines
+    with pytest.raises(Exception):
+        data_set.read_line(4)
+
+
+def test_query_data_set_reuses_and_rebuilds_its_index(tmp_path):
+    file_name = write_lines(tmp_path / "queries.jsonl", ["a", "b"])
+    QueryDataSet(file_name)
+    index_file = file_name + QueryDataSet.INDEX_SUFFIX
+    assert os.path.getsize(index_file) == 3 * QueryDataSet.OFFSET_SIZE
+
+    # a data file that changed after the index was written gets a new index
+    write_lines(tmp_path / "queries.jsonl", ["a", "b", "c", "d"])
+    os.utime(index_file, (0, 0))
+    data_set = QueryDataSet(file_name)
+    assert data_set.total_lines == 4
+    assert data_set.read_line(4) == "d\n"
+
+
+def test_query_data_set_reopens_its_mappings_after_pickling(tmp_path):
+    data_set = QueryDataSet(write_lines(tmp_path / "queries.jsonl", ["a", "b"]))
+    assert data_set.read_line(2) == "b\n"
+    copy = pickle.loads(pickle.dumps(data_set))
+    assert copy.read_line(1) == "a\n"
+
+
+def param_source(tmp_path, total_queries=10, **params):
+    lines = [
+        '{"text": "q%d", "sparse_embedding": {"q%d": 1.0}}' % (n, n)
+        for n in range(total_queries)
+    ]
+    data_set_path = write_lines(tmp_path / "queries.jsonl", lines)
+    return QueryNeuralSearchParamsSource(
+        None,
+        {
+            "index": "test-index",
+            "fields_to_excluded": [],
+            "model_id": "test-model",
+            "method": "neural_sparse",
+            "data_set_path": data_set_path,
+            **params,
+        },
+    )
+
+
+@pytest.mark.parametrize("total_queries, clients", [(10, 3), (7, 7), (100, 8)])
+def test_sequential_partitions_cover_every_query_once(
+    tmp_path, total_queries, clients
+):
+    source = param_source(tmp_path, total_queries)
+    lines = []
+    for client in range(clients):
+        partition = source.partition(client, clients)
+        assert abs(partition.queries_per_client - total_queries // clients) <= 1
+        lines.extend(
+            partition.next_line_number() + n
+            for n in range(partition.queries_per_client)
+        )
+    assert sorted(lines) == list(range(1, total_queries + 1))
+
+
+def test_more_clients_than_queries_is_a_configuration_error(tmp_path):
+    source = param_source(tmp_path, 2)
+    with pytest.raises(ConfigurationError):
+        source.partition(0, 3)
+
+
+@pytest.mark.parametrize("skew", [0.0, 0.5, 1.0, 1.5])
+def test_zipf_sampler_follows_the_power_law(skew):
+    n = 50
+    sampler = ZipfSampler(n, skew)
+    rng = random.Random(0)
+    counts = Counter(sampler.sample(rng) for _ in range(100000))
+    assert set(counts) <= set(range(1, n + 1))
+    norm = sum(k**-skew for k in range(1, n + 1))
+    for rank in (1, 2, 10):
+        expected = 100000 * rank**-skew / norm
+        assert counts[rank] == pytest.approx(expected, rel=0.1)
+
+
+def test_zipf_partitions_agree_on_the_hot_queries(tmp_path):
+    source = param_source(tmp_path, 20, access_pattern="zipf", zipf_skew=2.0)
+    hottest = []
+    for client in range(2):
+        partition = source.partition(client, 2)
+        counts = Counter(partition.next_line_number() for _ in range(2000))
+        hottest.append(counts.most_common(1)[0][0])
+    assert hottest[0] == hottest[1]
+
+
+def test_negative_zipf_skew_is_a_configuration_error(tmp_path):
+    with pytest.raises(ConfigurationError):
+        param_source(tmp_path, access_pattern="zipf", zipf_skew=-1.0)
+
+
+def write_query_log(tmp_path, timestamps):
+    path = tmp_path / "query_log.jsonl"
+    path.write_text(
+        "".join(
+            '{"timestamp": %s, "line": %d}\n' % (timestamp, n % 10 + 1)
+            for n, timestamp in enumerate(timestamps)
+        )
+    )
+    return str(path)
+
+
+def replay_schedules(tmp_path, timestamps, clients, replay_speed=1.0, requests=0):
+    log = write_query_log(tmp_path, timestamps)
+    source = param_source(tmp_path, access_pattern="replay", query_log_path=log)
+    task = SimpleNamespace(params={"replay_speed": replay_speed}, clients=clients)
+    schedules = []
+    for client in range(clients):
+        scheduler = ReplayScheduler(task)
+        scheduler.parameter_source = source.partition(client, clients)
+        count = requests or scheduler.parameter_source.queries_per_client
+        schedule, current = [], 0
+        for _ in range(count):
+            current = scheduler.next(current)
+            schedule.append(current)
+        schedules.append(schedule)
+    return schedules
+
+
+def test_replay_clients_keep_their_phase_in_the_log(tmp_path):
+    # a burst at 100s: the clients share its entries and send them together
+    timestamps = [100.0, 100.5, 101.0, 101.5, 110.0, 110.5, 111.0, 111.5]
+    schedules = replay_schedules(tmp_path, timestamps, clients=2)
+    assert schedules == [[0.0, 1.0, 10.0, 11.0], [0.5, 1.5, 10.5, 11.5]]
+    merged = sorted(time for schedule in schedules for time in schedule)
+    assert merged == [timestamp - 100.0 for timestamp in timestamps]
+
+
+def test_replay_speed_and_wrap_around(tmp_path):
+    # 4 entries 1s apart: a replay lasts 4s, at double speed 2s
+    schedules = replay_schedules(
+        tmp_path, [0, 1, 2, 3], clients=1, replay_speed=2.0, requests=6
+    )
+    assert schedules == [[0.0, 0.5, 1.0, 1.5, 2.0, 2.5]]
+
+
+@pytest.mark.parametrize("replay_speed", [0, -1.0])
+def test_non_positive_replay_speed_is_a_configuration_error(replay_speed):
+    with pytest.raises(ConfigurationError):
+        ReplayScheduler(SimpleNamespace(params={"replay_speed": replay_speed}))
+
+
+def test_replay_schedule_requires_the_replay_access_pattern(tmp_path):
+    scheduler = ReplayScheduler(SimpleNamespace(params={}))
+    scheduler.parameter_source = param_source(tmp_path).partition(0, 1)
+    with pytest.raises(ConfigurationError):
+        scheduler.next(0)
@@ -11,6 +11,12 @@ import os
 import sys
 import copy
 import json
+import math
+import mmap
+import random
+from array import array
+from collections import OrderedDict
+from pathlib import Path
 
 
 class ConfigurationError(Exception):
@@ -39,7 +45,7 @@ def parse_string_parameter(key: str, params: dict, default: str = None) -> str:
 
 def parse_int_parameter(key: str, params: dict, default: int = None) -> int:
     if key not in params:
-        if default:
+        if default is not None:
             return default
         raise ConfigurationError("Value cannot be None for param {}".format(key))
 
@@ -49,6 +55,30 @@ def parse_int_parameter(key: str, params: dict, default: int = None) -> int:
     raise ConfigurationError("Value must be a int for param {}".format(key))
 
 
+def parse_float_parameter(key: str, params: dict, default: float = None) -> float:
+    if key not in params:
+        if default is not None:
+            return default
+        raise ConfigurationError("Value cannot be None for param {}".format(key))
+
+    if type(params[key]) in (int, float):
+        return float(params[key])
+
+    raise ConfigurationError("Value must be a float for param {}".format(key))
+
+
+def parse_bool_parameter(key: str, params: dict, default: bool = None) -> bool:
+    if key not in params:
+        if default is not None:
+            return default
+        raise ConfigurationError("Value cannot be None for param {}".format(key))
+
+    if type(params[key]) is bool:
+        return params[key]
+
+    raise ConfigurationError("Value must be a bool for param {}".format(key))
+
+
 def parse_list_parameter(key: str, params: dict, default=None):
 
     if default is None:
@@ -65,6 +95,225 @@ def parse_list_parameter(key: str, params: dict, default=None):
 
 
 sys.path.append(os.path.abspath(os.getcwd()))
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from benchmark_common.jsoncodec import loads as json_loads
+from benchmark_common.pruning import PRUNE_TYPES, prune_query_tokens
+
+
+ACCESS_PATTERNS = ["sequential", "uniform", "zipf", "replay"]
+METHODS = ["neural_sparse", "neural_sparse_text", "bm25", "knn", "hybrid"]
+
+
+class ZipfSampler:
+    """
+    Bounded Zipf sampler over ranks [1, n] using rejection-inversion
+    (Hormann and Derflinger), O(1) memory and time per sample for any skew >= 0.
+    """
+
+    def __init__(self, n: int, skew: float):
+        self.n = n
+        self.skew = skew
+        self.h_integral_x1 = self.h_integral(1.5) - 1.0
+        self.h_integral_n = self.h_integral(n + 0.5)
+        self.threshold = 2.0 - self.h_integral_inverse(
+            self.h_integral(2.5) - self.h(2.0)
+        )
+
+    @staticmethod
+    def _log1p_div(x: float) -> float:
+        if abs(x) > 1e-8:
+            return math.log1p(x) / x
+        return 1.0 - x * (0.5 - x * (1.0 / 3.0 - 0.25 * x))
+
+    @staticmethod
+    def _expm1_div(x: float) -> float:
+        if abs(x) > 1e-8:
+            return math.expm1(x) / x
+        return 1.0 + x * 0.5 * (1.0 + x / 3.0 * (1.0 + 0.25 * x))
+
+    def h(self, x: float) -> float:
+        return math.exp(-self.skew * math.log(x))
+
+    def h_integral(self, x: float) -> float:
+        log_x = math.log(x)
+        return self._expm1_div((1.0 - self.skew) * log_x) * log_x
+
+    def h_integral_inverse(self, x: float) -> float:
+        t = max(x * (1.0 - self.skew), -1.0)
+        return math.exp(self._log1p_div(t) * x)
+
+    def sample(self, rng: random.Random) -> int:
+        while True:
+            u = self.h_integral_n + rng.random() * (
+                self.h_integral_x1 - self.h_integral_n
+            )
+            x = self.h_integral_inverse(u)
+            k = min(max(int(x + 0.5), 1), self.n)
+            if k - x <= self.threshold or u >= self.h_integral(k + 0.5) - self.h(k):
+                return k
+
+
+def load_query_log(path: str, start: int = 0, step: int = 1):
+    """
+    Load every `step`-th entry of a recorded query log starting at `start`.
+
+    The log is a JSONL file in replay order, one {"timestamp": <seconds>, "line": <1-based
+    line of the query data set>} object per line.
+
+    :return: (timestamps, line numbers) arrays
+    """
+    timestamps = array("d")
+    lines = array("q")
+    with open(path) as file:
+        for i, entry in enumerate(file):
+            if i % step != start or not entry.strip():
+                continue
+            record = json_loads(entry)
+            timestamps.append(float(record["timestamp"]))
+            lines.append(int(record["line"]))
+    return timestamps, lines
+
+
+def query_log_cycle(path: str):
+    """
+    First timestamp of a recorded query log and the length of one replay of it.
+
+    A replay of the log lasts from its first to its last entry plus one average gap,
+    so that a replay starting over keeps the recorded rate.
+
+    :return: (first timestamp, cycle length) in seconds
+    """
+    first = last = None
+    count = 0
+    with open(path) as file:
+        for entry in file:
+            if not entry.strip():
+                continue
+            timestamp = float(json_loads(entry)["timestamp"])
+            if first is None:
+                first = timestamp
+            last = timestamp
+            count += 1
+    if count < 2:
+        return first, 0.0
+    return first, (last - first) * count / (count - 1)
+
+
+class ReplayScheduler:
+    """
+    Schedules requests at the timestamps of a recorded query log.
+
+    Use it with `"schedule": "replay"` on a task of a query param source with the
+    `replay` access pattern. OpenSearch Benchmark hands every client its partition of
+    the param source (`parameter_source`), and each client sends its own log entries
+    at their recorded time since the start of the log, so clients keep their phase
+    and bursts are replayed as recorded. `replay_speed` > 1 replays faster than
+    recorded. Once a client has sent all its entries the log starts over.
+    """
+
+    def __init__(self, task, target_throughput=None):
+        self.speed = parse_float_parameter("replay_speed", task.params, 1.0)
+        if self.speed <= 0:
+            raise ConfigurationError("replay_speed must be greater than 0")
+        # set by OpenSearch Benchmark to the partition of this client
+        self.parameter_source = None
+        self.times = None
+        self.cycle = 0.0
+        self.position = 0
+        self.cycles = 0
+
+    def schedule(self):
+        source = self.parameter_source
+        if getattr(source, "replay_timestamps", None) is None:
+            raise ConfigurationError(
+                'schedule "replay" requires a query param source with the replay '
+                "access pattern"
+            )
+        times = [
+            max(0.0, (timestamp - source.replay_start) / self.speed)
+            for timestamp in source.replay_timestamps
+        ]
+        return times, source.replay_cycle / self.speed
+
+    def next(self, current):
+        if self.times is None:
+            self.times, self.cycle = self.schedule()
+        scheduled = self.times[self.position] + self.cycles * self.cycle
+        self.position += 1
+        if self.position == len(self.times):
+            self.position = 0
+            self.cycles += 1
+        return scheduled
+
+
+def parse_profile(profile: dict, took_ms: float) -> dict:
+    """
+    Reduce a search `profile` section to per-phase timings in milliseconds.
+
+    Shards run in parallel, so each phase reports its slowest shard. Whatever `took` spends
+    outside of the slowest shard is coordinator time: model inference of neural queries,
+    which runs while the query is rewritten on the coordinating node, and the fetch phase.
+    """
+    query_ns = rewrite_ns = collector_ns = shard_ns = 0
+    for shard in profile.get("shards", []):
+        shard_query = shard_rewrite = shard_collector = 0
+        for search in shard.get("searches", []):
+            shard_query += sum(
+                q.get("time_in_nanos", 0) for q in search.get("query", [])
+            )
+            shard_rewrite += search.get("rewrite_time", 0)
+            shard_collector += sum(
+                c.get("time_in_nanos", 0) for c in search.get("collector", [])
+            )
+        query_ns = max(query_ns, shard_query)
+        rewrite_ns = max(rewrite_ns, shard_rewrite)
+        collector_ns = max(collector_ns, shard_collector)
+        shard_ns = max(shard_ns, shard_query + shard_rewrite + shard_collector)
+    return {
+        "profile_query_ms": query_ns / 1e6,
+        "profile_rewrite_ms": rewrite_ns / 1e6,
+        "profile_collector_ms": collector_ns / 1e6,
+        "profile_shard_ms": shard_ns / 1e6,
+        "profile_coordinator_ms": max(0.0, took_ms - shard_ns / 1e6),
+    }
+
+
+class SemanticSearchRunner:
+    """
+    Search runner recording the server-side view of each request.
+
+    Adds the response `took` to every sample and, for a `profile_sample_rate` fraction of
+    the requests, runs the query with `profile: true` and adds the per-phase timings of
+    `parse_profile`. OpenSearch Benchmark stores the extra keys as meta-data of the
+    latency and service time samples, use an OpenSearch metrics store to aggregate them.
+    """
+
+    async def __call__(self, opensearch, params):
+        body = params["body"]
+        profiled = random.random() < params.get("profile_sample_rate", 0.0)
+        if profiled:
+            # the body is cached by the param source, never modify it in place
+            body = dict(body, profile=True)
+        response = await opensearch.search(
+            index=params["index"], body=body, params=params.get("request-params", {})
+        )
+        took = response.get("took", 0)
+        total = response.get("hits", {}).get("total", 0)
+        result = {
+            "weight": 1,
+            "unit": "ops",
+            "success": True,
+            "took": took,
+            "timed_out": response.get("timed_out", False),
+            "hits": total.get("value", 0) if isinstance(total, dict) else total,
+            "profiled": profiled,
+        }
+        if profiled:
+            result.update(parse_profile(response.get("profile", {}), took))
+        return result
+
+    def __repr__(self, *args, **kwargs):
+        return "semantic-search"
 
 
 # This is the entry point for the workloads
@@ -76,6 +325,19 @@ def register_workload_extensions(registry):
     registry.register_param_source(
         "neural-search-query-params-source", QueryNeuralSearchParamsSource
     )
+    registry.register_param_source(
+        "neural-sparse-text-query-params-source", QueryNeuralSparseTextParamsSource
+    )
+    registry.register_param_source("bm25-query-params-source", QueryBM25ParamsSource)
+    registry.register_param_source("knn-query-params-source", QueryKNNParamsSource)
+    registry.register_param_source(
+        "hybrid-query-params-source", QueryHybridParamsSource
+    )
+    registry.register_param_source("corpus-bulk-params-source", BulkCorpusParamsSource)
+    registry.register_scheduler("replay", ReplayScheduler)
+    registry.register_runner(
+        "semantic-search", SemanticSearchRunner(), async_runner=True
+    )
 
 
 class QueryNeuralSearchParamsSource:
@@ -84,8 +346,16 @@ class QueryNeuralSearchParamsSource:
      Benchmark will create one global ParamSource for each operation and will then
      invoke `#partition()` to get a `ParamSource` instance for each client. During the benchmark, `#params()` will be called repeatedly
      before Benchmark invokes the corresponding runner (that will actually execute the operation against OpenSearch).
+
+    The query is built from the same data set line for every retrieval `method`:
+     neural_sparse (pre-computed `query_tokens`), neural_sparse_text (`query_text` with model
+     inference in the loop), bm25 (`match`), knn (dense vector) and hybrid (a `hybrid` query
+     of `hybrid_methods` normalized by `search_pipeline`).
     """
 
+    # subclasses registered for a single retrieval method set this
+    METHOD = None
+
     def __init__(self, workload, params, **kwargs):
 
         self.index_name: str = parse_string_parameter("index", params)
@@ -93,19 +363,112 @@ class QueryNeuralSearchParamsSource:
             "fields_to_excluded", params
         )
         self.query_data_set_path: str = parse_string_parameter("data_set_path", params)
-        self.model_id = parse_string_parameter("model_id", params)
-        self.method = parse_string_parameter("method", params)
+        self.method = self.METHOD or parse_string_parameter(
+            "method", params, "neural_sparse"
+        )
+        if self.method not in METHODS:
+            raise ConfigurationError(
+                "method must be one of {}".format(", ".join(METHODS))
+            )
+        self.hybrid_methods = []
+        self.request_params = {"_source": False}
+        if self.method == "hybrid":
+            self.hybrid_methods = parse_list_parameter(
+                "hybrid_methods", params, ["bm25", "neural_sparse"]
+            )
+            if not set(self.hybrid_methods) <= set(METHODS) - {"hybrid"}:
+                raise ConfigurationError(
+                    "hybrid_methods must be a list of {}".format(
+                        ", ".join(METHODS[:-1])
+                    )
+                )
+            self.request_params["search_pipeline"] = parse_string_parameter(
+                "search_pipeline", params
+            )
+        methods = self.hybrid_methods or [self.method]
+        self.model_id = None
+        if "neural_sparse_text" in methods:
+            self.model_id = parse_string_parameter("model_id", params)
+            # an unset workload param renders as an empty string in the procedures
+            if not self.model_id:
+                raise ConfigurationError(
+                    "model_id is required for method neural_sparse_text"
+                )
+        # index fields queried by each method
+        self.sparse_field = parse_string_parameter(
+            "sparse_field", params, "text_sparse"
+        )
+        self.text_field = parse_string_parameter("text_field", params, "text")
+        self.vector_field = parse_string_parameter(
+            "vector_field", params, "dense_embedding"
+        )
+        self.k = parse_int_parameter("k", params, 10)
+        # fraction of requests the semantic-search runner profiles
+        self.profile_sample_rate = parse_float_parameter(
+            "profile_sample_rate", params, 0.0
+        )
+        # keys of the query text and vectors in the data set lines
+        self.query_text_key = parse_string_parameter("query_text_key", params, "text")
+        self.sparse_embedding_key = parse_string_parameter(
+            "sparse_embedding_key", params, "sparse_embedding"
+        )
+        self.dense_embedding_key = parse_string_parameter(
+            "dense_embedding_key", params, "dense_embedding"
+        )
+        self.prune_type = parse_string_parameter("prune_type", params, "none")
+        if self.prune_type not in PRUNE_TYPES:
+            raise ConfigurationError(
+                "prune_type must be one of {}".format(", ".join(PRUNE_TYPES))
+            )
+        self.prune_value = 0.0
+        if self.prune_type != "none":
+            # no default, 0 would prune top_k queries to nothing
+            self.prune_value = parse_float_parameter("prune_value", params)
+        # sequential clients build this many of their next request bodies at once
+        self.body_chunk_size = parse_int_parameter("body_chunk_size", params, 100)
+        # per-client LRU of built bodies, sized by the data set lines they were built from
+        self.body_cache_bytes = int(
+            parse_float_parameter("body_cache_mb", params, 16.0) * 1024 * 1024
+        )
+        self.access_pattern = parse_string_parameter(
+            "access_pattern", params, "sequential"
+        )
+        if self.access_pattern not in ACCESS_PATTERNS:
+            raise ConfigurationError(
+                "access_pattern must be one of {}".format(", ".join(ACCESS_PATTERNS))
+            )
+        self.seed = parse_int_parameter("seed", params, 0)
+        self.zipf_skew = parse_float_parameter("zipf_skew", params, 1.0)
+        if self.zipf_skew < 0:
+            raise ConfigurationError("zipf_skew must be greater than or equal to 0")
+        if self.access_pattern == "replay":
+            self.query_log_path = parse_string_parameter("query_log_path", params)
+            self.replay_start, self.replay_cycle = query_log_cycle(
+                self.query_log_path
+            )
         self.query_data_file = QueryDataSet(self.query_data_set_path)
 
         # total number of queries in the file
         self.total_queries = self.query_data_file.total_lines
-        self.infinite = False
+        if self.total_queries == 0:
+            raise ConfigurationError(
+                "No queries in data set {}".format(self.query_data_set_path)
+            )
+        # random patterns never run out of queries, the task's iterations or time
+        # period end them and OpenSearch Benchmark reports progress from those
+        self.infinite = self.access_pattern in ("uniform", "zipf")
         self.percent_completed = 0
 
         self.offset = 0
         self.current = 0
         self.queries_per_client = 0
         self.query_count_of_client = 0
+        self.body_cache = OrderedDict()
+        self.body_cache_used = 0
+        self.rng = None
+        self.zipf_sampler = None
+        self.replay_lines = None
+        self.replay_timestamps = None
 
     """
     partition_index : client which is getting hit
@@ -135,12 +498,152 @@ class QueryNeuralSearchParamsSource:
 
         partition_x = copy.copy(self)
 
-        partition_x.queries_per_client = self.total_queries // total_partitions
-        partition_x.offset = (partition_index * partition_x.queries_per_client) + 1
+        # contiguous slices whose sizes differ by at most one, covering every query
+        start = partition_index * self.total_queries // total_partitions
+        end = (partition_index + 1) * self.total_queries // total_partitions
+        partition_x.queries_per_client = end - start
+        partition_x.offset = start + 1
         partition_x.current = partition_index
 
+        # every client draws its own reproducible sequence over the full data set
+        partition_x.rng = random.Random(
+            "{}-{}".format(self.seed, partition_index)
+        )
+        if self.access_pattern == "zipf":
+            partition_x.zipf_sampler = ZipfSampler(self.total_queries, self.zipf_skew)
+            # map popularity ranks to lines with a bijection shared by all clients, so
+            # they agree on the hot queries without them being the head of the file
+            mapping_rng = random.Random(self.seed)
+            partition_x.rank_shift = mapping_rng.randrange(self.total_queries)
+            partition_x.rank_stride = 1
+            if self.total_queries > 1:
+                partition_x.rank_stride = mapping_rng.randrange(1, self.total_queries)
+                while math.gcd(partition_x.rank_stride, self.total_queries) != 1:
+                    partition_x.rank_stride = mapping_rng.randrange(
+                        1, self.total_queries
+                    )
+        elif self.access_pattern == "replay":
+            # round-robin over the log keeps its global order across clients
+            (
+                partition_x.replay_timestamps,
+                partition_x.replay_lines,
+            ) = load_query_log(self.query_log_path, partition_index, total_partitions)
+            partition_x.queries_per_client = len(partition_x.replay_lines)
+        if partition_x.queries_per_client == 0 and not self.infinite:
+            raise ConfigurationError(
+                "Client {} of {} has nothing to run with the {} access pattern, "
+                "use fewer clients than {}".format(
+                    partition_index,
+                    total_partitions,
+                    self.access_pattern,
+                    "log entries" if self.access_pattern == "replay" else "queries",
+                )
+            )
+
+        # pre-build the first chunk of this client's bodies outside of the measured loop
+        partition_x.body_cache = OrderedDict()
+        partition_x.body_cache_used = 0
+        if partition_x.queries_per_client > 0 and self.access_pattern == "sequential":
+            partition_x.get_body(partition_x.offset)
+
         return partition_x
 
+    def build_query(self, method: str, query_raw: dict) -> dict:
+        if method == "neural_sparse":
+            return {
+                "neural_sparse": {
+                    self.sparse_field: {
+                        "query_tokens": prune_query_tokens(
+                            query_raw[self.sparse_embedding_key],
+                            self.prune_type,
+                            self.prune_value,
+                        ),
+                    }
+                }
+            }
+        if method == "neural_sparse_text":
+            return {
+                "neural_sparse": {
+                    self.sparse_field: {
+                        "query_text": query_raw[self.query_text_key],
+                        "model_id": self.model_id,
+                    }
+                }
+            }
+        if method == "bm25":
+            return {"match": {self.text_field: query_raw[self.query_text_key]}}
+        if method == "knn":
+            return {
+                "knn": {
+                    self.vector_field: {
+                        "vector": query_raw[self.dense_embedding_key],
+                        "k": self.k,
+                    }
+                }
+            }
+        return {
+            "hybrid": {
+                "queries": [
+                    self.build_query(sub_method, query_raw)
+                    for sub_method in self.hybrid_methods
+                ]
+            }
+        }
+
+    def build_body(self, line: str) -> dict:
+        query_raw = json_loads(line)
+        return {"query": self.build_query(self.method, query_raw)}
+
+    def cache_body(self, line_number: int, body: dict):
+        size = self.query_data_file.line_size(line_number)
+        if size > self.body_cache_bytes:
+            return
+        self.body_cache[line_number] = (body, size)
+        self.body_cache_used += size
+        while self.body_cache_used > self.body_cache_bytes:
+            _, (_, evicted_size) = self.body_cache.popitem(last=False)
+            self.body_cache_used -= evicted_size
+
+    def get_body(self, line_number: int) -> dict:
+        """
+        Return the request body for a 1-based line of the data set.
+
+        Built bodies are kept in a per-client LRU of at most `body_cache_mb` of data set
+        lines, so params() is a dict lookup for hot queries while memory stays bounded.
+        On a miss, sequential clients build the next `body_chunk_size` bodies of their
+        slice at once; the random access patterns build only the requested body.
+        """
+        cached = self.body_cache.get(line_number)
+        if cached is not None:
+            self.body_cache.move_to_end(line_number)
+            return cached[0]
+
+        last = line_number + 1
+        if self.access_pattern == "sequential":
+            last = min(
+                line_number + self.body_chunk_size,
+                self.offset + self.queries_per_client,
+            )
+        body = None
+        for n in range(line_number, last):
+            built = self.build_body(self.query_data_file.read_line(n))
+            self.cache_body(n, built)
+            if body is None:
+                body = built
+        return body
+
+    def next_line_number(self) -> int:
+        if self.access_pattern == "uniform":
+            return self.rng.randint(1, self.total_queries)
+        if self.access_pattern == "zipf":
+            rank = self.zipf_sampler.sample(self.rng)
+            return (
+                (rank - 1) * self.rank_stride + self.rank_shift
+            ) % self.total_queries + 1
+        if self.access_pattern == "replay":
+            return self.replay_lines[self.query_count_of_client]
+        return self.offset + self.query_count_of_client
+
     # This will be called per client
     def params(self):
 
@@ -149,53 +652,203 @@ class QueryNeuralSearchParamsSource:
             # raise StopIteration
             self.query_count_of_client = 0
 
-        query_raw = json.loads(
-            self.query_data_file.read_line(
-                self.offset + self.query_count_of_client
-            ).strip()
-        )
-        query = {
-            "query": {
-                "neural_sparse": {
-                    "text_sparse": {
-                        "query_tokens": query_raw["sparse_embedding"],
-                    }
-                }
-            }
-        }
+        body = self.get_body(self.next_line_number())
         self.query_count_of_client += 1
-        self.percent_completed = self.query_count_of_client / self.queries_per_client
+        if not self.infinite:
+            self.percent_completed = (
+                self.query_count_of_client / self.queries_per_client
+            )
         q = {
             "index": self.index_name,
-            "request-params": {"_source": False},
-            "body": query,
+            "request-params": dict(self.request_params),
+            "body": body,
+            "profile_sample_rate": self.profile_sample_rate,
         }
 
         return q
 
 
+class QueryNeuralSparseTextParamsSource(QueryNeuralSearchParamsSource):
+    METHOD = "neural_sparse_text"
+
+
+class QueryBM25ParamsSource(QueryNeuralSearchParamsSource):
+    METHOD = "bm25"
+
+
+class QueryKNNParamsSource(QueryNeuralSearchParamsSource):
+    METHOD = "knn"
+
+
+class QueryHybridParamsSource(QueryNeuralSearchParamsSource):
+    METHOD = "hybrid"
+
+
+class BulkCorpusParamsSource:
+    """
+    Bulk `ParamSource` reading documents from a corpus JSONL file, one document per line.
+
+    Client `i` of `n` ingests lines i, i + n, i + 2n, ... like benchmark_ingestion/bulk.py,
+    so parallel clients never send the same document. Lines are sent as they are, without
+    parsing, and the task ends when the client's share of the corpus is exhausted unless
+    `loop` is set. Run it next to the search tasks in a `parallel` block to measure search
+    latency under write load, see procedures/mixed-ingest-search.json.
+    """
+
+    def __init__(self, workload, params, **kwargs):
+        self.index_name: str = parse_string_parameter("index", params)
+        self.corpus_path: str = parse_string_parameter("corpus_path", params)
+        self.bulk_size = parse_int_parameter("bulk_size", params, 100)
+        self.pipeline = parse_string_parameter("pipeline", params, "")
+        self.loop = parse_bool_parameter("loop", params, False)
+        self.corpus = QueryDataSet(self.corpus_path)
+        self.total_docs = self.corpus.total_lines
+        self.action_line = json.dumps({"index": {"_index": self.index_name}}) + "\n"
+
+        self.infinite = self.loop
+        self.percent_completed = 0
+        self.partition_index = 0
+        self.total_partitions = 1
+        self.docs_of_client = self.total_docs
+        self.doc_count_of_client = 0
+
+    def partition(self, partition_index, total_partitions):
+        partition_x = copy.copy(self)
+        partition_x.partition_index = partition_index
+        partition_x.total_partitions = total_partitions
+        partition_x.docs_of_client = len(
+            range(partition_index, self.total_docs, total_partitions)
+        )
+        return partition_x
+
+    def params(self):
+        if self.doc_count_of_client >= self.docs_of_client:
+            if not self.loop or self.docs_of_client == 0:
+                raise StopIteration
+            self.doc_count_of_client = 0
+
+        end = min(self.doc_count_of_client + self.bulk_size, self.docs_of_client)
+        lines = []
+        for n in range(self.doc_count_of_client, end):
+            line_number = self.partition_index + n * self.total_partitions + 1
+            lines.append(self.action_line)
+            lines.append(self.corpus.read_line(line_number).rstrip("\n") + "\n")
+        size = end - self.doc_count_of_client
+        self.doc_count_of_client = end
+        if not self.loop:
+            self.percent_completed = self.doc_count_of_client / self.docs_of_client
+
+        q = {
+            "index": self.index_name,
+            "body": "".join(lines),
+            "action-metadata-present": True,
+            "bulk-size": size,
+            "unit": "docs",
+        }
+        if self.pipeline:
+            q["pipeline"] = self.pipeline
+        return q
+
+
 class QueryDataSet:
+    """
+    Memory-mapped view of a line-delimited query file.
+
+    The start offset of every line (plus the file size as a sentinel) is stored as a
+    binary int64 index next to the data file (`<file>.idx`) and built only once, so
+    startup does not scan the file. Both files are memory-mapped lazily. The shallow
+    copies made by `partition()` share one instance and its mappings within a process;
+    the mappings are not pickled, so a param source sent to another client process
+    reopens them there, and all processes share the OS page cache instead of holding
+    private copies.
+    """
+
+    INDEX_SUFFIX = ".idx"
+    OFFSET_SIZE = 8
+
     def __init__(self, file_name):
         self.file_name = file_name
-        self.lines = []
+        self.index_file_name = file_name + self.INDEX_SUFFIX
+        self._data = None
+        self._index = None
         self.total_lines = self.count_lines()
 
+    def __getstate__(self):
+        # mmap objects can't be pickled, the receiving process reopens them lazily
+        state = self.__dict__.copy()
+        if state["_index"] is not None and not isinstance(state["_index"], array):
+            state["_index"] = None
+        state["_data"] = None
+        return state
+
+    def _index_is_valid(self):
+        if not os.path.exists(self.index_file_name):
+            return False
+        if os.path.getmtime(self.index_file_name) < os.path.getmtime(self.file_name):
+            return False
+        index_size = os.path.getsize(self.index_file_name)
+        if index_size < self.OFFSET_SIZE or index_size % self.OFFSET_SIZE:
+            return False
+        with open(self.index_file_name, "rb") as file:
+            file.seek(-self.OFFSET_SIZE, os.SEEK_END)
+            sentinel = array("q")
+            sentinel.frombytes(file.read(self.OFFSET_SIZE))
+        return sentinel[0] == os.path.getsize(self.file_name)
+
+    def build_index(self):
+        offsets = array("q", [0])
+        file_size = os.path.getsize(self.file_name)
+        if file_size > 0:
+            with open(self.file_name, "rb") as file, mmap.mmap(
+                file.fileno(), 0, access=mmap.ACCESS_READ
+            ) as data:
+                position = data.find(b"\n")
+                while position != -1 and position + 1 < file_size:
+                    offsets.append(position + 1)
+                    position = data.find(b"\n", position + 1)
+            offsets.append(file_size)
+        return offsets
+
     def count_lines(self):
-        count = 0
-        with open(self.file_name) as file:
-            for line in file:
-                self.lines.append(line)
-                count = count + 1
-            file.close()
-        # print("Lines count is {}".format(count))
-        return count
+        if self._index_is_valid():
+            return os.path.getsize(self.index_file_name) // self.OFFSET_SIZE - 1
+
+        offsets = self.build_index()
+        # write to a temporary file and rename, concurrent runs never see a partial index
+        tmp_file_name = "{}.{}.tmp".format(self.index_file_name, os.getpid())
+        try:
+            with open(tmp_file_name, "wb") as file:
+                offsets.tofile(file)
+            os.replace(tmp_file_name, self.index_file_name)
+        except OSError:
+            # read-only dataset directory, keep the index in memory
+            self._index = offsets
+        return len(offsets) - 1
+
+    def _open(self):
+        with open(self.file_name, "rb") as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._index is None:
+            with open(self.index_file_name, "rb") as file:
+                index_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._index = memoryview(index_map).cast("q")
+
+    def line_size(self, line_number):
+        """Size in bytes of a 1-based line, including its line break"""
+        if self._data is None:
+            self._open()
+        return self._index[line_number] - self._index[line_number - 1]
 
     def read_line(self, line_number):
-        if line_number > self.total_lines or line_number < 0:
+        if line_number > self.total_lines or line_number < 1:
             raise Exception(
                 "Line number provided is not valid. Line Number: {} ".format(
                     line_number
                 )
             )
-        # print("\n Line number is : {}\n".format(line_number))
-        return self.lines[int(line_number) - 1]
+        if self._data is None:
+            self._open()
+        line_number = int(line_number)
+        start = self._index[line_number - 1]
+        end = self._index[line_number]
+        return self._data[start:end].decode("utf-8")